@@ -1,3 +1,4 @@
+import tempfile
 from pathlib import Path
 
 class Config(object):
@@ -24,8 +25,6 @@ class Config(object):
         REPORTING=Path('data', '08_reporting'),
     )
 
-    for file, file_path in FILES.items():
-        Path(file_path).mkdir(parents=True, exist_ok=True)  
 
     # ================================================================================
     # MLFLOW details
@@ -33,7 +32,43 @@ class Config(object):
     MLFLOW = dict(
         TRACKING_URI="./mlruns/",  # Location where mlflow artifacts will be stored, can also be AWS S3 or Azure Bucket
         EXPERIMENT_NAME= "Experiment-1",
-        TEMP_ARTIFACT_DIR="./tmp/",  # Temporary directory for storing artifacts, will be automatically deleted.
+        BACKGROUND=True,  # log runs from a background thread, so that optimisations never wait for mlflow
+        QUEUE_SIZE=16,  # runs waiting to be logged, further runs are dropped with a warning
+        FLUSH_TIMEOUT=30,  # seconds to wait for the queued runs at exit
+    )
+
+    # ================================================================================
+    # Logging
+    # ================================================================================
+    LOGGING = dict(
+        LEVEL=20,  # INFO and above, 10 for DEBUG with the per-pair details, 7 for START and above; messages below the level are never formatted
+    )
+
+    # ================================================================================
+    # Stage metrics
+    # ================================================================================
+    STAGE_METRICS = dict(
+        ENABLED=True,  # time and measure each pipeline stage, returned with the results and served on /metrics
+        MODEL_SIZE=False,  # also count the variables, constraints and nonzeros of built Pyomo models, one pass over them (matrix models know their size)
+    )
+
+    # ================================================================================
+    # Solver progress
+    # ================================================================================
+    SOLVER_PROGRESS = dict(
+        ENABLED=True,  # parse the solver output of API jobs into progress events, streamed on /jobs/{job_id}/progress
+        MIN_INTERVAL=1.0,  # seconds between events without a new incumbent or bound
+    )
+
+    # ================================================================================
+    # Solver scheduler
+    # ================================================================================
+    SOLVER_SCHEDULER = dict(
+        ENABLED=True,  # solves of all the processes on the host share the solver slots
+        SLOTS=None,  # solver threads running at once on the host, defaults to the number of CPUs
+        MAX_THREADS=2,  # slots (CBC threads) a MIP solve takes when they are free, LPs take one
+        SLOT_DIR=Path(tempfile.gettempdir(), 'marketing_optim_solver_slots'),  # slot lock files, shared by the processes
+        TIMEOUT=600,  # seconds a solve waits for a free slot before it fails
     )
 
     # ================================================================================
@@ -45,8 +80,16 @@ class Config(object):
             "csv": {
                 "import_filepath": FILES["RAW_DATA"],
                 "import_table": ['cluster_data', 'customer_data', 'product_data', 'product_cost', 'product_profit'],
+                "customer_chunksize": None,  # rows per chunk to stream customer_data in, None reads it at once
+                "customer_float_dtype": "float32",  # cost and profit dtype of the streamed customer data
             }
         },
+        cache_settings={
+            "enabled": True,  # reuse the preprocessed data of unchanged csv inputs
+            "cache_dir": FILES["INTERMEDIATE_DATA"] / "preprocessed",
+            "format": "feather",  # or parquet, both require pyarrow
+            "fingerprint": "mtime",  # or content, which hashes the input files instead of their size and mtime
+        },
         export_to="csv",
         export_settings={
             "csv": {
@@ -61,6 +104,18 @@ class Config(object):
     # ================================================================================
     OPTIMISATION_MODELLING_CONFIG = dict(
         solver_type='cbc', # or cbc
+        model_builder='pyomo', # or matrix, which assembles the sparse constraint matrix directly (solver_type cbc or highs)
+        solver_backend='shell', # or persistent, which keeps an in-process HiGHS instance loaded with each model between its solves (highs options), or race, which runs the solver_race racers at once
+        warm_start=False, # start the operational solve from a greedy incumbent built from the tactical allocation
+        sweep_solver_backend='persistent', # solver backend of budget/ROI sweeps, persistent re-solves from the previous point
+        operational_engine='mip', # or network, which solves the operational assignment as per-cluster transportation LPs (highspy) with a Lagrangian budget
+        operational_mode='monolithic', # or decomposed, which solves the operational model per cluster in parallel
+        decomposition_workers=None, # worker processes of the decomposed mode, defaults to the number of CPUs
+        decomposition_bound=True, # compare the decomposed solution with the monolithic LP relaxation bound, it is only reported optimal within the MIP gap of the solver
+        operational_presolve=False, # build the operational model without the offers of zero tactical quotas or over the whole budget
+        presolve_drop_unprofitable=False, # also drop non-positive profit offers where the quota allows, not exact
+        operational_model_cache=1, # built operational models kept per process and re-targeted to new tactical results, 0 to rebuild every run
+        min_time_limit=1, # seconds a solve still gets once the deadline of its request (time_limit input) has passed, to find an incumbent
         solver_loc={
             'cbc':'src\optimisation_model\cbc'
         },
@@ -75,8 +130,50 @@ class Config(object):
                 'tmlim': 600,
                 'mipgap': 0.02,
                 'seed': 999,
+            },
+            highs={
+                'mip_rel_gap': 0.01,
+                'time_limit': 600,
+                'random_seed': 999,
+            },
+            network={
+                'gap': 0.0001,  # relative gap to the Lagrangian bound at which the budget multiplier search stops
+                'max_iterations': 40,  # assignment solves of the multiplier search
             }
         ),
+        solver_race=dict(
+            deadline=600,  # seconds each racer may run, it then stops and reports its best incumbent
+            racers=[  # solver types (cbc, glpk or highs) with options over their solver_option
+                dict(solver_type='cbc'),
+                dict(solver_type='cbc', options={'randomCbcSeed': 7, 'nodeStrategy': 'depth'}),
+                dict(solver_type='glpk'),
+            ],
+        ),
+    )
+
+    # ================================================================================
+    # API Settings
+    # ================================================================================
+    API_SETTINGS = dict(
+        job_queue={
+            'max_workers': 2,  # optimisation worker processes per API process
+            'max_pending_jobs': 20,  # queued and running jobs per API process, further jobs are rejected
+            'job_dir': Path('data', '09_jobs'),  # job status and results, shared by the API processes
+            'retention_seconds': 24 * 3600,  # job files older than this are deleted
+            'purge_seconds': 3600,  # how often the API deletes the expired job files
+            'max_queued_seconds': 600,  # estimated wait for a worker beyond which new jobs are rejected
+            'seconds_per_pair': 1e-4,  # initial job seconds per customer-product pair, then learnt from the finished jobs
+        },
+        progress_stream={
+            'poll_seconds': 0.5,  # how often a progress stream checks for new events of its job
+            'keepalive_seconds': 15,  # comment sent to idle streams, so that proxies keep them open
+        },
+        result_cache={
+            'enabled': True,  # answer repeated requests with the job of the first identical request
+            'max_entries': 256,  # least recently used entries beyond this are evicted
+            'ttl_seconds': 3600,  # entries older than this are not reused
+            'cache_dir': Path('data', '09_jobs', 'cache'),  # request hash to job ID index, shared by the API processes
+        },
     )
 
     # ================================================================================
@@ -85,4 +182,10 @@ class Config(object):
     OPT_PARAMS = dict(
         budget = 200,
         roi = 120
-    )
\ No newline at end of file
+    )
+
+    @classmethod
+    def init_directories(cls):
+        """Create the project data folders. Called by the entry points rather than on import."""
+        for file_path in cls.FILES.values():
+            Path(file_path).mkdir(parents=True, exist_ok=True)
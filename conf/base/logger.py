@@ -12,15 +12,20 @@ START    7
 NOTSET 	 0
 """
 
+import os
 import sys
+import queue
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
+from conf.base.config import Config
 
 current_time = datetime.now()
 
-Path("logs").mkdir(parents=True, exist_ok=True)
 DEFAULT_LOG_FILEPATH = "./logs/py_logs.log"
 
 logging.config.dictConfig({
@@ -93,46 +98,98 @@ class ErrorCounter(object):
 
 class ShutdownHandler(logging.Handler):
     def emit(self, record):
+        _stop_listener()  # write out the queued records, this one included
         logging.shutdown()
         sys.exit(1)
 
 
-class Logger(object):
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread, which formats and writes them. Only the
+    message arguments are merged in the calling thread, so that later changes to
+    them do not show in the record.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
-    def __init__(self, log_filepath=None):
 
-        # Initialisation
-        if log_filepath is None:
-            log_filepath = DEFAULT_LOG_FILEPATH
+# process-wide logging setup, made by the first Logger()
+_setup_lock = threading.Lock()
+_queue_handler = None
+_listener = None
 
-        self.logger = logging.getLogger(__name__)
-        self.logger.propagate = False
 
-        # Clearing existing handlers if it already exists
-        if self.logger.hasHandlers():
-            self.logger.handlers.clear()
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
-        # add standard output stream
-        stream_handler = logging.StreamHandler(sys.stderr)
-        stream_handler.setFormatter(formatter['brief'])
-        self.logger.addHandler(stream_handler)
 
-        # add output file
-        file_handler = logging.handlers.RotatingFileHandler(
-            filename=log_filepath,
-            maxBytes=10485760,  # 10MB
-            backupCount=20,
-            encoding='utf8',
-            delay=True
-        )
-        file_handler.setFormatter(formatter['precise'])
-        self.logger.addHandler(file_handler)
+def _stop_listener():
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
 
-        self.logger.setLevel(7)
 
-        self.logger.error = ErrorCounter(self.logger.error)
+def _restart_listener():
+    """In a forked child, where the listener thread of the parent does not exist."""
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def _setup(logger, log_filepath):
+    global _queue_handler
+    # add standard output stream
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter['brief'])
+
+    # add output file, its folder is created on first use rather than on import
+    Path(log_filepath).parent.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename=log_filepath,
+        maxBytes=10485760,  # 10MB
+        backupCount=20,
+        encoding='utf8',
+        delay=True
+    )
+    file_handler.setFormatter(formatter['precise'])
+
+    # records are queued by the calling thread and written by a listener thread
+    _queue_handler = RecordQueueHandler(queue.SimpleQueue())
+    _start_listener([stream_handler, file_handler])
+    logger.addHandler(_queue_handler)
+    logger.addHandler(ShutdownHandler(level=50))
 
-        self.logger.addHandler(ShutdownHandler(level=50))
+    logger.setLevel(Config.LOGGING['LEVEL'])
+    logger.error = ErrorCounter(logger.error)
+    atexit.register(_stop_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+class Logger(object):
+    """
+    Access to the process-wide logger. The handlers are set up once, by the first
+    instance, and `log_filepath` only applies to that one.
+    """
+    def __init__(self, log_filepath=None):
+
+        # Initialisation
+        if log_filepath is None:
+            log_filepath = DEFAULT_LOG_FILEPATH
+
+        self.logger = logging.getLogger(__name__)
+        if _queue_handler is None:
+            with _setup_lock:
+                if _queue_handler is None:
+                    self.logger.propagate = False
+                    self.logger.handlers.clear()
+                    _setup(self.logger, log_filepath)
 
     def start(self, message):
         global current_time
@@ -2,50 +2,117 @@
 from src.optimisation_model.preprocessing import Preprocessing
 from src.optimisation_model.tactical_model import TacticalOptimisationModel
 from src.optimisation_model.operation_model import OperationalOptimisationModel
-from src.optimisation_model.solver import ModelSolver
+from src.optimisation_model.matrix_model import TacticalMatrixModel, OperationalMatrixModel
+from src.optimisation_model.solver import ModelSolver, solve_deadline
+from src.optimisation_model.warm_start import GreedyWarmStart
+from src.optimisation_model.decomposition import ClusterDecomposition
+from src.optimisation_model.network_solver import NetworkAssignmentSolver
+from src.optimisation_model.model_cache import OperationalModelCache
+from src.optimisation_model.presolve import OperationalPresolve
 from src.optimisation_model.postprocessing import Postprocessing
 from src.optimisation_model.mlflow_logger import MLFlowLogger
+from src.optimisation_model.stage_metrics import profile, span
 from conf import Logger
+from conf import Config
 _logger = Logger().logger
 
+MODEL_BUILDERS = {
+    'pyomo': (TacticalOptimisationModel, OperationalOptimisationModel),
+    'matrix': (TacticalMatrixModel, OperationalMatrixModel),
+}
+
+def solve_operational(tactical_opt_model, processData):
+    """
+    Build and solve the operational model from the solved tactical model,
+    with the configured engine, and return its solver and model.
+    """
+    warm_start = Config.OPTIMISATION_MODELLING_CONFIG['warm_start']
+    _, OperationalModel = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+    presolve = None
+    if Config.OPTIMISATION_MODELLING_CONFIG['operational_presolve']:
+        # the operational model is built on the offers the tactical results leave selectable
+        with span('presolve') as stage:
+            presolve = OperationalPresolve(tactical_opt_model, processData)
+            stage.annotate(**presolve.summary)
+        processData = presolve.processed_data
+    if Config.OPTIMISATION_MODELLING_CONFIG['operational_engine'] == 'network':
+        # assignment solved as a transportation problem, held in an operational matrix model
+        with span('operational_solve') as stage:
+            operational_model_solver = NetworkAssignmentSolver(tactical_opt_model, processData)
+            operation_opt_model = operational_model_solver.model
+            stage.set_model(operation_opt_model)
+    elif Config.OPTIMISATION_MODELLING_CONFIG['operational_mode'] == 'decomposed':
+        # clusters solved in parallel, the merged solution is held in an operational matrix model
+        with span('operational_solve') as stage:
+            operational_model_solver = ClusterDecomposition(tactical_opt_model, processData, warmstart=warm_start)
+            operation_opt_model = operational_model_solver.model
+            stage.set_model(operation_opt_model)
+    else:
+        # built once per campaign data (the reduced data with the presolve), later runs only update the tactical right-hand sides
+        with span('operational_build') as stage:
+            operation_model = OperationalModelCache.get(OperationalModel, tactical_opt_model, processData)
+            operation_opt_model = operation_model.model
+            stage.set_model(operation_opt_model)
+
+            if warm_start:
+                GreedyWarmStart(tactical_opt_model, processData).load(operation_opt_model)
+        with span('operational_solve'):
+            operational_model_solver = ModelSolver(operation_opt_model, warmstart=warm_start)
+    if presolve is not None:
+        operation_opt_model = presolve.restore(operation_opt_model)
+    return operational_model_solver, operation_opt_model
+
 # main function
 def main(input=None):
     """
     This function represents the main entry-point function,
     which does the processing, creates the optimsiation model,
-    and does the post-processing.
+    and does the post-processing. A `time_limit` in the input is the
+    deadline in seconds of the solves, in place of the configured limits.
     """
-    # process the data using Preprocessing class
-    _logger.debug("[MainPreprocessing] initiated...")
-    processData = Preprocessing(input)
-    _logger.debug("[MainPreprocessing] completed successfully.")
-
-    # build the optimisation model, where objectives and constraints are defined.
-    _logger.debug("[TacticalOptModel] initiated...")
-
-    tactical_model = TacticalOptimisationModel(processData)
-    # get the created model
-    tactical_opt_model = tactical_model.model
-    #solver the optimisation model
-    tactical_model_solver = ModelSolver(tactical_opt_model)
-    _logger.debug("[TacticalOptModel] completed successfully.")
-
-    _logger.debug("[OperationalOptModel] initiated...")
-    operation_model = OperationalOptimisationModel(tactical_opt_model, processData)
-    operation_opt_model = operation_model.model
-
-    operational_model_solver = ModelSolver(operation_opt_model)
-    
-    _logger.debug("[OperationalOptModel] completed successfully.")
-    
-    _logger.debug("[PostProcessing] OperationalOptModel initiated...")
-    post_process_output = Postprocessing(tactical_model_solver, operational_model_solver, tactical_opt_model, operation_opt_model, export=True)
-    _logger.debug("[PostProcessing] OperationalOptModel completed successfully.")
+    Config.init_directories()
+
+    with profile() as stage_profile, solve_deadline((input or {}).get('time_limit')):
+        # process the data using Preprocessing class
+        _logger.debug("[MainPreprocessing] initiated...")
+        with span('preprocessing'):
+            processData = Preprocessing(input)
+        _logger.debug("[MainPreprocessing] completed successfully.")
+
+        # build the optimisation model, where objectives and constraints are defined.
+        _logger.debug("[TacticalOptModel] initiated...")
+        TacticalModel, _ = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+
+        with span('tactical_build') as stage:
+            tactical_model = TacticalModel(processData)
+            # get the created model
+            tactical_opt_model = tactical_model.model
+            stage.set_model(tactical_opt_model)
+        #solver the optimisation model
+        with span('tactical_solve'):
+            tactical_model_solver = ModelSolver(tactical_opt_model)
+        _logger.debug("[TacticalOptModel] completed successfully.")
+
+        _logger.debug("[OperationalOptModel] initiated...")
+        operational_model_solver, operation_opt_model = solve_operational(tactical_opt_model, processData)
+
+        _logger.debug("[OperationalOptModel] completed successfully.")
+
+        _logger.debug("[PostProcessing] OperationalOptModel initiated...")
+        with span('postprocessing'):
+            post_process_output = Postprocessing(tactical_model_solver, operational_model_solver, tactical_opt_model, operation_opt_model)
+        with span('export'):
+            post_process_output.export()
+        _logger.debug("[PostProcessing] OperationalOptModel completed successfully.")
 
-    _logger.debug("[MLFlow Logging] initiated...")
-    MLFlowLogger.log(post_process_output)
-    _logger.debug("[MLFlow Logging] completed successfully.")
+        _logger.debug("[MLFlow Logging] initiated...")
+        with span('mlflow'):
+            MLFlowLogger.log(post_process_output)
+        _logger.debug("[MLFlow Logging] completed successfully.")
 
+    post_process_output.stage_metrics = stage_profile.as_list() if stage_profile is not None else []
+    if stage_profile is not None:
+        _logger.info("[Main] Stage times: %s.", stage_profile.summary())
     return post_process_output
 
 if __name__ == "__main__":
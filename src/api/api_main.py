@@ -1,11 +1,13 @@
 import orjson
 import typing
+import asyncio
 import traceback
-from fastapi import FastAPI, Request, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Body, Query, Header, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from conf import Logger
-from main import main
 from conf import Config
+from src.api.job_queue import JobQueue, JobQueueFull, QUEUED, RUNNING, COMPLETED, FAILED
+from src.api.metrics import CONTENT_TYPE, server_timing
 from src.api.api_pydantic_models import * # pydantic Models for Swagger API Docs
 import pandas as pd
 import collections
@@ -21,6 +23,28 @@ class ORJSONResponse(JSONResponse):
 
 app = FastAPI(default_response_class=ORJSONResponse)
 app.logger = Logger().logger
+app.job_queue = None  # started with each API worker, see start_job_queue
+
+@app.on_event("startup")
+def init_directories():
+    Config.init_directories()
+
+@app.on_event("startup")
+async def start_job_queue():
+    app.job_queue = JobQueue()
+    app.purge_task = asyncio.ensure_future(purge_jobs(app.job_queue))
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    app.purge_task.cancel()
+    app.job_queue.shutdown()
+
+async def purge_jobs(job_queue: JobQueue):
+    """Delete the expired job files every `purge_seconds`, in a thread so as not to block the event loop."""
+    loop = asyncio.get_event_loop()
+    while True:
+        await loop.run_in_executor(None, job_queue.purge)
+        await asyncio.sleep(Config.API_SETTINGS['job_queue']['purge_seconds'])
 
 @app.get("/")
 async def home(request: Request):
@@ -34,20 +58,131 @@ async def run_optimisation(
     request: Request,
     inputs: OptimiseModelInput = Body(
         ..., example=EXAMPLE_JSON["OptimiseModelInput"]
-    )
+    ),
+    sync: bool = Query(False, description="wait for the results instead of returning a job ID, for small requests"),
 ):
-    """POST request, which calles the optimisation main.py function based on config settings or
-    user-defined settings and returns the post-processed data as a JSON object.
+    """POST request, which queues a run of the optimisation main.py function based on config settings or
+    user-defined settings and returns its job ID. With `sync`, waits for the run and returns the
+    post-processed data as a JSON object.
     """
     user_ip = request.client.host
     inputs = inputs.dict()
     request.app.logger.info(f"[{user_ip}] /run_optimisation/ is called.")
     assert inputs is not None, "`data` was not provided for model run"
 
-    # Run optimisation
-    optimisation_results = main(inputs)
-    request.app.logger.info(f"[{user_ip}] /run_optimisation complete.")
-    return JSONResponse(content=optimisation_results.compiled_json_results)
+    # Run optimisation in the job queue
+    return await run_job(request, 'optimisation', inputs, sync)
+
+@app.post('/run_sweep/', tags=['optimisation'])
+async def run_sweep(
+    request: Request,
+    inputs: SweepInput = Body(
+        ..., example=EXAMPLE_JSON["SweepInput"]
+    ),
+    sync: bool = Query(False, description="wait for the results instead of returning a job ID"),
+):
+    """POST request, which queues a sweep of the optimisation over the given budgets and ROIs, with
+    the tactical model built once, and returns its job ID. The results hold the profit against
+    budget curve, with the operational figures of each point if `operational` is set.
+    """
+    user_ip = request.client.host
+    inputs = inputs.dict()
+    request.app.logger.info("[%s] /run_sweep/ is called with %s budgets.", user_ip, len(inputs['budgets']))
+    return await run_job(request, 'sweep', inputs, sync)
+
+async def run_job(request: Request, task: str, inputs: dict, sync: bool):
+    """Queue a job and return its ID, or with `sync` wait for it and return its results."""
+    user_ip = request.client.host
+    try:
+        if not sync:
+            job_id = request.app.job_queue.submit(inputs, task)
+            request.app.logger.info("[%s] %s job %s queued.", user_ip, task, job_id)
+            return JSONResponse(status_code=202, content={
+                "job_id": job_id,
+                "status": request.app.job_queue.status(job_id)['status'],
+                "status_url": f"/jobs/{job_id}",
+                "result_url": f"/jobs/{job_id}/result",
+                "progress_url": f"/jobs/{job_id}/progress",
+            })
+        job_id = await request.app.job_queue.run(inputs, task)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(e.retry_after)})
+    status = request.app.job_queue.status(job_id)
+    if status['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Optimisation job {job_id} failed: {status.get('error')}")
+    request.app.logger.info("[%s] %s job %s complete.", user_ip, task, job_id)
+    return result_response(request, job_id, status)
+
+def result_response(request: Request, job_id: str, status: dict):
+    """Results of a completed job, with the durations of its stages in the Server-Timing header."""
+    timing = server_timing(status.get('stage_metrics'))
+    return JSONResponse(content=request.app.job_queue.result(job_id), headers={'Server-Timing': timing} if timing else None)
+
+@app.get('/jobs/{job_id}', tags=['optimisation'])
+async def job_status(request: Request, job_id: str):
+    """GET request, which returns the status of an optimisation job, with the metrics of its stages once finished."""
+    status = request.app.job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown optimisation job {job_id}.")
+    return status
+
+@app.get('/jobs/{job_id}/result', tags=['optimisation'])
+async def job_result(request: Request, job_id: str):
+    """GET request, which returns the post-processed data of a completed optimisation job."""
+    status = request.app.job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown optimisation job {job_id}.")
+    if status['status'] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Optimisation job {job_id} failed: {status.get('error')}")
+    if status['status'] != COMPLETED:
+        return JSONResponse(status_code=202, content=status)
+    return result_response(request, job_id, status)
+    
+@app.get('/jobs/{job_id}/progress', tags=['optimisation'])
+async def job_progress(request: Request, job_id: str, last_event_id: typing.Optional[int] = Header(None)):
+    """GET request, which streams the solver progress of an optimisation job as server-sent events
+    (incumbent objective, best bound, gap, nodes and elapsed seconds of each solve), then its final
+    status once it finishes. A reconnecting client resumes after its `Last-Event-ID`.
+    """
+    if request.app.job_queue.status(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown optimisation job {job_id}.")
+    return StreamingResponse(progress_events(request, job_id, last_event_id or 0), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def progress_events(request: Request, job_id: str, offset: int = 0):
+    """Server-sent events of the progress file of a job, with its byte offsets as event IDs, until the job finishes."""
+    settings = Config.API_SETTINGS['progress_stream']
+    job_queue = request.app.job_queue
+    idle = 0.0
+    while True:
+        # the status is read before the events, so that the events of a job that just finished are all sent
+        status = job_queue.status(job_id) or {}
+        events = job_queue.progress(job_id, offset)
+        for offset, event in events:
+            yield f"id: {offset}\nevent: progress\ndata: {orjson.dumps(event).decode()}\n\n"
+        if status.get('status') not in (QUEUED, RUNNING):
+            final = {key: status.get(key) for key in ('job_id', 'status', 'error') if key in status}
+            yield f"event: status\ndata: {orjson.dumps(final).decode()}\n\n"
+            return
+        if await request.is_disconnected():
+            return
+        idle = 0.0 if events else idle + settings['poll_seconds']
+        if idle >= settings['keepalive_seconds']:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        await asyncio.sleep(settings['poll_seconds'])
+
+@app.get('/cache/stats', tags=['optimisation'])
+async def cache_stats(request: Request):
+    """GET request, which returns the result cache counters of this API process."""
+    if request.app.job_queue.cache is None:
+        raise HTTPException(status_code=404, detail="The result cache is disabled.")
+    return request.app.job_queue.cache.info()
+
+@app.get('/metrics', tags=['monitoring'])
+async def metrics(request: Request):
+    """GET request, which returns the job and pipeline stage metrics of this API process for Prometheus."""
+    return Response(content=request.app.job_queue.metrics.render(), media_type=CONTENT_TYPE)
     
 
 if __name__ == "__main__":
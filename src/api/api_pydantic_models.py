@@ -166,6 +166,8 @@ EXAMPLE_JSON = {
 }
 
 
+EXAMPLE_JSON['SweepInput'] = dict(EXAMPLE_JSON['OptimiseModelInput'], budgets=[200, 400, 600], rois=[120, 150], operational=False)
+
 # ================================================================================
 # OPTIMISATION MODEL INPUTS
 # ================================================================================
@@ -177,4 +179,12 @@ class OptimiseModelInput(BaseModel):
     product: List[dict]
     cost: List[dict]
     profit: List[dict]
-    cust_cost_profit: List[dict]
\ No newline at end of file
+    cust_cost_profit: List[dict]
+    time_limit: Optional[float] = None  # seconds for the solves of the request, in place of the configured solver time limits
+
+
+class SweepInput(OptimiseModelInput):
+    """Budget and ROI sweep input, on top of the optimisation model input"""
+    budgets: List[float]
+    rois: Optional[List[float]]
+    operational: bool = False
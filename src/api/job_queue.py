@@ -0,0 +1,326 @@
+"""
+OPTIMISATION JOB QUEUE
+
+Runs optimisation requests in a bounded pool of worker processes, so that a solve
+never blocks the API event loop. The status and the results of each job are kept as
+JSON files in the job directory, which makes them visible to every API worker
+process, whichever of them accepted the job.
+
+Jobs wait in the API process rather than in the pool, so that the next free worker
+takes the job with the shortest estimated run time, its customer-product pairs times
+the seconds per pair learnt from the finished jobs. Each second a job waits counts as
+a second less, so that large jobs are not starved. A job whose estimated wait for a
+worker is too long is rejected at once, with an estimate of when to retry.
+
+The solver progress events of a running job are appended to its progress file, see
+solver_progress, and streamed to its clients by the API.
+
+The status file of a job is updated by the API process and by the worker running the
+job, each update under an exclusive lock (flock) of the job, so that no update is lost.
+The jobs still queued when the API process shuts down are recorded as failed, so that
+their status does not stay queued after a restart.
+"""
+import os
+import math
+import time
+import uuid
+import asyncio
+import orjson
+import threading
+import traceback
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, Future
+from conf import Logger
+from conf import Config
+from main import main
+from src.optimisation_model.sweep import run_sweep
+from src.optimisation_model.mlflow_logger import MLFlowLogger
+from src.api.result_cache import ResultCache
+from src.api.metrics import StageMetricsRegistry
+from src.optimisation_model.stage_metrics import profile
+from src.optimisation_model.solver_progress import ProgressLog, progress_log
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+QUEUED, RUNNING, COMPLETED, FAILED, REJECTED = 'queued', 'running', 'completed', 'failed', 'rejected'
+
+# job tasks, from the request inputs to the compiled JSON results
+TASKS = {
+    'optimisation': lambda inputs: main(inputs).compiled_json_results,
+    'sweep': run_sweep,
+}
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when the API process is at its number of pending jobs or at its estimated
+    wait, with the seconds after which a retry may be accepted.
+    """
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_size(inputs, task='optimisation'):
+    """Customer-product pairs of a job, for a sweep with operational solves times its points."""
+    pairs = max(len(inputs.get('cust_cost_profit') or []), 1)
+    if task == 'sweep' and inputs.get('operational'):
+        pairs *= max(len(inputs.get('budgets') or []), 1) * max(len(inputs.get('rois') or []), 1)
+    return pairs
+
+
+def _write_json(path, content):
+    """Write atomically, so that readers never see a partial file."""
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        return orjson.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Exclusive lock of `path` across processes and threads, where file locks are available."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _update_status(job_dir, job_id, **fields):
+    path = Path(job_dir, f"{job_id}.status.json")
+    with _locked(path):
+        status = _read_json(path) or {'job_id': job_id}
+        status.update(fields)
+        _write_json(path, status)
+    return status
+
+
+def _progress_path(job_dir, job_id):
+    return Path(job_dir, f"{job_id}.progress.jsonl")
+
+
+def run_job(job_id, inputs, job_dir, task='optimisation'):
+    """Worker function: run the task of one job and store its results."""
+    _update_status(job_dir, job_id, status=RUNNING, started_at=time.time(), worker_pid=os.getpid())
+    with profile() as stage_profile, progress_log(_progress_path(job_dir, job_id)):
+        try:
+            results = TASKS[task](inputs)
+        except Exception as e:
+            Logger().logger.error("[JobQueue] Job %s failed: %s", job_id, traceback.format_exc())
+            error = str(e)
+        else:
+            error = None
+    # stages measured up to the end or the failure of the job
+    stage_metrics = stage_profile.as_list() if stage_profile is not None else []
+    if error is not None:
+        _update_status(job_dir, job_id, status=FAILED, finished_at=time.time(), error=error, stage_metrics=stage_metrics)
+    else:
+        _write_json(Path(job_dir, f"{job_id}.result.json"), results)
+        _update_status(job_dir, job_id, status=COMPLETED, finished_at=time.time(), stage_metrics=stage_metrics)
+    # the pool tears its workers down without the at-exit hooks, so the MLflow runs of the job are sent before its end
+    MLFlowLogger.flush()
+    return FAILED if error is not None else COMPLETED
+
+
+class JobQueue(object):
+    """
+    Bounded pool of optimisation worker processes.
+
+    The pool is started on first use, i.e. after the API workers have been forked.
+    At most `max_workers` jobs run at once and at most `max_pending_jobs` jobs may be
+    queued or running in this process. Submissions beyond these, or with an estimated
+    wait for a worker over `max_queued_seconds`, raise JobQueueFull.
+    """
+    JOB_OVERHEAD_SECONDS = 1.0  # run time of a job apart from its pairs
+    LEARN_MIN_PAIRS = 1000  # smaller jobs are dominated by the overhead, the seconds per pair are not learnt from them
+
+    def __init__(self, max_workers=None, max_pending_jobs=None, job_dir=None, retention_seconds=None):
+        self._logger = Logger().logger
+        settings = Config.API_SETTINGS['job_queue']
+        self.max_workers = max_workers or settings['max_workers']
+        self.max_pending_jobs = max_pending_jobs or settings['max_pending_jobs']
+        self.retention_seconds = retention_seconds or settings['retention_seconds']
+        self.max_queued_seconds = settings['max_queued_seconds']
+        self.seconds_per_pair = settings['seconds_per_pair']
+        self.job_dir = Path(job_dir or settings['job_dir'])
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = None
+        self._lock = threading.RLock()
+        self._pending = {}  # job ID -> future done when the job finishes, for the queued and running jobs
+        self._queued = {}  # job ID -> (queued at, pairs, estimated seconds, inputs, task)
+        self._running = {}  # job ID -> (started at, pairs, estimated seconds)
+        self.metrics = StageMetricsRegistry()
+        self.cache = ResultCache(self) if Config.API_SETTINGS['result_cache']['enabled'] else None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def submit(self, inputs, task='optimisation'):
+        """
+        Queue an optimisation run and return its job ID at once. With the result cache,
+        the ID of a completed or in-flight job for the same request is returned instead.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(inputs, task)
+            job_id = self.cache.lookup(key)
+            if job_id is not None:
+                return job_id
+        size = estimate_size(inputs, task)
+        with self._lock:
+            self.__admit(task)
+            job_id = uuid.uuid4().hex
+            estimate = self.estimated_seconds(size)
+            _update_status(self.job_dir, job_id, status=QUEUED, task=task, submitted_at=time.time(),
+                           estimated_pairs=size, estimated_seconds=round(estimate, 3))
+            if key is not None:
+                claimed = self.cache.claim(key, job_id)
+                if claimed != job_id:
+                    # an identical request, e.g. of another API process, was queued since the lookup
+                    Path(self.job_dir, f"{job_id}.status.json").unlink()
+                    return claimed
+            self._pending[job_id] = Future()
+            self._queued[job_id] = (time.monotonic(), size, estimate, inputs, task)
+            self.__dispatch()
+        self._logger.info("[JobQueue] Job %s of %s pairs queued (%s pending).", job_id, size, len(self._pending))
+        return job_id
+
+    def estimated_seconds(self, size):
+        return self.JOB_OVERHEAD_SECONDS + self.seconds_per_pair * size
+
+    def estimated_wait(self):
+        """Estimated seconds until a worker is free for a new job, behind the running and queued jobs."""
+        with self._lock:
+            if len(self._running) + len(self._queued) < self.max_workers:
+                return 0.0
+            now = time.monotonic()
+            remaining = sum(max(estimate - (now - started), 0) for started, _, estimate in self._running.values())
+            queued = sum(estimate for _, _, estimate, _, _ in self._queued.values())
+            return (remaining + queued) / self.max_workers
+
+    def __admit(self, task):
+        """Reject the job at once if this process is over capacity, with a hint of when to retry."""
+        wait = self.estimated_wait()
+        if len(self._pending) < self.max_pending_jobs and wait <= self.max_queued_seconds:
+            return
+        # until the first running job is expected to end, or the wait is expected back under its limit
+        now = time.monotonic()
+        first_end = min((max(estimate - (now - started), 0) for started, _, estimate in self._running.values()), default=0)
+        retry_after = min(max(math.ceil(max(first_end, wait - self.max_queued_seconds)), 1), 3600)
+        self.metrics.observe(task, REJECTED)
+        self._logger.warning("[JobQueue] %s job rejected with %s pending jobs and an estimated wait of %.1fs, "
+                             "retry after %ss.", task, len(self._pending), wait, retry_after)
+        raise JobQueueFull(f"{len(self._pending)} optimisation jobs are already pending, with an estimated wait of "
+                           f"{wait:.0f}s for a worker.", retry_after)
+
+    def __dispatch(self):
+        """Hand queued jobs to the free workers, the shortest estimated job first, each second waited counting as one less."""
+        with self._lock:
+            now = time.monotonic()
+            while self._queued and len(self._running) < self.max_workers:
+                job_id = min(self._queued, key=lambda j: self._queued[j][2] - (now - self._queued[j][0]))
+                _, size, estimate, inputs, task = self._queued.pop(job_id)
+                self._running[job_id] = (now, size, estimate)
+                future = self.pool.submit(run_job, job_id, inputs, str(self.job_dir), task)
+                future.add_done_callback(lambda f, job_id=job_id: self.__on_done(job_id, f))
+
+    async def run(self, inputs, task='optimisation'):
+        """Queue an optimisation run and wait for it without blocking the event loop."""
+        job_id = self.submit(inputs, task)
+        await self.wait(job_id)
+        return job_id
+
+    async def wait(self, job_id, poll_seconds=0.2):
+        """Wait for a job to finish, also when it was queued by another API process."""
+        future = self._pending.get(job_id)
+        if future is not None:
+            await asyncio.wrap_future(future)
+            return
+        while (self.status(job_id) or {}).get('status') in (QUEUED, RUNNING):
+            await asyncio.sleep(poll_seconds)
+
+    def __on_done(self, job_id, future):
+        with self._lock:
+            started, size, _ = self._running.pop(job_id)
+            if size >= self.LEARN_MIN_PAIRS and not future.cancelled():
+                seconds = max(time.monotonic() - started - self.JOB_OVERHEAD_SECONDS, 0)
+                self.seconds_per_pair = 0.8 * self.seconds_per_pair + 0.2 * seconds / size
+            job_done = self._pending.pop(job_id, None)
+            if self._pool is not None:
+                self.__dispatch()
+        if future.cancelled() or future.exception() is not None:
+            # the worker process died or the job was cancelled before it could record its status
+            error = 'cancelled' if future.cancelled() else repr(future.exception())
+            status = _update_status(self.job_dir, job_id, status=FAILED, finished_at=time.time(), error=error)
+            self._logger.error("[JobQueue] Job %s failed: %s", job_id, error)
+        else:
+            status = self.status(job_id) or {}
+            self._logger.info("[JobQueue] Job %s %s.", job_id, future.result())
+        self.metrics.observe(status.get('task'), status.get('status', FAILED), status.get('stage_metrics'))
+        if job_done is not None:
+            job_done.set_result(status.get('status', FAILED))
+
+    def status(self, job_id):
+        """Status record of a job, or None for an unknown job ID."""
+        return _read_json(Path(self.job_dir, f"{job_id}.status.json"))
+
+    def result(self, job_id):
+        """Compiled JSON results of a completed job, or None."""
+        return _read_json(Path(self.job_dir, f"{job_id}.result.json"))
+
+    def progress(self, job_id, offset=0):
+        """Solver progress events of a job past the byte `offset` of its progress file, as (offset after, event) pairs."""
+        return ProgressLog.read(_progress_path(self.job_dir, job_id), offset)
+
+    def purge(self):
+        """
+        Delete the files of the jobs older than the retention period. Scans the whole job
+        directory, so the API runs it periodically in the background rather than per request.
+        """
+        expiry = time.time() - self.retention_seconds
+        purged = 0
+        for path in self.job_dir.glob('*.json*'):
+            try:
+                if path.stat().st_mtime < expiry:
+                    path.unlink()
+                    purged += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self._logger.warning("[JobQueue] Could not purge %s: %s", path.name, e)
+        if purged:
+            self._logger.info("[JobQueue] Purged %s expired job files.", purged)
+        return purged
+
+    def shutdown(self):
+        """Stop the pool. The jobs still queued in this process are recorded as failed, as no worker will run them."""
+        with self._lock:
+            if self._queued:
+                self._logger.warning("[JobQueue] Shutting down with %s queued jobs, recorded as failed.", len(self._queued))
+            for job_id in list(self._queued):
+                task = self._queued.pop(job_id)[4]
+                _update_status(self.job_dir, job_id, status=FAILED, finished_at=time.time(),
+                               error='cancelled at the shutdown of the API process')
+                self.metrics.observe(task, FAILED)
+                self._pending.pop(job_id).set_result(FAILED)
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
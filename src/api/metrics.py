@@ -0,0 +1,73 @@
+"""
+STAGE METRICS REGISTRY
+
+Aggregates the stage spans of the jobs run by this API process and renders them in
+the Prometheus text exposition format for the /metrics endpoint. Times and job counts
+are cumulative counters, memory and model sizes are gauges of the latest job. Each API
+worker process keeps its own registry, so scrape them per process.
+"""
+import threading
+import collections
+
+PREFIX = 'marketing_optimisation'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SIZES = ('variables', 'constraints', 'nonzeros')
+
+
+def server_timing(stage_metrics):
+    """Server-Timing header value of the top-level stages, durations in milliseconds."""
+    return ', '.join(f"{span['stage']};dur={1000 * span['wall_seconds']:.1f}"
+                     for span in stage_metrics or [] if span['parent'] is None)
+
+
+class StageMetricsRegistry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = collections.Counter()  # (task, status) -> jobs
+        self.stage_runs = collections.Counter()  # (stage, parent) -> spans
+        self.wall_seconds = collections.Counter()
+        self.cpu_seconds = collections.Counter()
+        self.last = {}  # (stage, parent) -> latest span
+
+    def observe(self, task, status, stage_metrics=None):
+        """Count a finished job and add up the spans of its stages."""
+        with self._lock:
+            self.jobs[task, status] += 1
+            for span in stage_metrics or []:
+                key = span['stage'], span['parent'] or ''
+                self.stage_runs[key] += 1
+                self.wall_seconds[key] += span['wall_seconds']
+                self.cpu_seconds[key] += span['cpu_seconds']
+                self.last[key] = span
+
+    def render(self):
+        with self._lock:
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+                for labels, value in samples:
+                    label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                    lines.append(f"{PREFIX}_{name}{{{label_text}}} {value!r}")
+
+            def stage_labels(key):
+                return {'stage': key[0], 'parent': key[1]}
+
+            metric('jobs_total', 'counter', "Finished jobs by task and status.",
+                   [({'task': task, 'status': status}, float(n)) for (task, status), n in sorted(self.jobs.items())])
+            metric('stage_runs_total', 'counter', "Runs of each pipeline stage.",
+                   [(stage_labels(key), float(n)) for key, n in sorted(self.stage_runs.items())])
+            metric('stage_wall_seconds_total', 'counter', "Wall time spent in each pipeline stage.",
+                   [(stage_labels(key), round(s, 6)) for key, s in sorted(self.wall_seconds.items())])
+            metric('stage_cpu_seconds_total', 'counter', "CPU time of each pipeline stage, solver subprocesses included.",
+                   [(stage_labels(key), round(s, 6)) for key, s in sorted(self.cpu_seconds.items())])
+            metric('stage_last_wall_seconds', 'gauge', "Wall time of the latest run of each pipeline stage.",
+                   [(stage_labels(key), span['wall_seconds']) for key, span in sorted(self.last.items())])
+            metric('stage_peak_rss_bytes', 'gauge', "Peak resident memory of the latest run of each pipeline stage.",
+                   [(stage_labels(key), float(round(span['peak_rss_mib'] * 2 ** 20)))
+                    for key, span in sorted(self.last.items()) if span.get('peak_rss_mib') is not None])
+            for size in SIZES:
+                metric(f"model_{size}", 'gauge', f"Model {size} of the latest run of each build stage.",
+                       [(stage_labels(key), float(span[size])) for key, span in sorted(self.last.items()) if size in span])
+            return '\n'.join(lines) + '\n'
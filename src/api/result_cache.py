@@ -0,0 +1,142 @@
+"""
+OPTIMISATION RESULT CACHE
+
+Content-addressed index from optimisation requests to their jobs. The key is a hash of
+the canonical JSON of the validated input and of the optimisation configuration, so a
+resubmitted payload is answered by the completed job of the first submission, and
+identical requests submitted while that job is queued or running coalesce onto it.
+
+The index is a directory of small files named by key, shared by the API processes like
+the job files. Each entry holds its job ID and its creation time, and is created
+exclusively (O_EXCL), so that of identical requests submitted at once by several API
+processes only the first queues a job. Entries expire `ttl_seconds` after their creation,
+however often they are read. The modification time of an entry marks its last use, and
+the least recently used entries are evicted beyond `max_entries`.
+"""
+import os
+import time
+import hashlib
+import threading
+import orjson
+from pathlib import Path
+from conf import Logger
+from conf import Config
+
+
+class ResultCache(object):
+    def __init__(self, job_queue, max_entries=None, ttl_seconds=None, cache_dir=None):
+        self._logger = Logger().logger
+        settings = Config.API_SETTINGS['result_cache']
+        self.job_queue = job_queue
+        self.max_entries = max_entries or settings['max_entries']
+        self.ttl_seconds = ttl_seconds or settings['ttl_seconds']
+        self.cache_dir = Path(cache_dir or settings['cache_dir'])
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = dict(hits=0, misses=0, coalesced=0, evictions=0)
+
+    @staticmethod
+    def key(inputs, task='optimisation'):
+        """Hash of the canonical JSON of the task, its input and the configuration the results depend on."""
+        content = {
+            'task': task,
+            'inputs': inputs,
+            'optimisation_config': Config.OPTIMISATION_MODELLING_CONFIG,
+            'opt_params': Config.OPT_PARAMS,
+        }
+        canonical = orjson.dumps(content, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str)
+        return hashlib.sha256(canonical).hexdigest()
+
+    def lookup(self, key):
+        """
+        Job ID of a completed (hit) or queued/running (coalesced) job for this key, else None (miss).
+        """
+        path = Path(self.cache_dir, key)
+        with self._lock:
+            entry = self.__read(path)
+            job_id = entry['job_id'] if entry else None
+            status = self.job_queue.status(job_id) if job_id else None
+            if status is None or status['status'] == 'failed' or time.time() - entry['created_at'] > self.ttl_seconds:
+                if path.exists():
+                    self.__remove(path)
+                    self.stats['evictions'] += 1
+                self.stats['misses'] += 1
+                return None
+            if status['status'] == 'completed':
+                self.__touch(path)  # most recently used
+                self.stats['hits'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        self._logger.info("[ResultCache] Request %s answered by %s job %s.", key[:12], status['status'], job_id)
+        return job_id
+
+    def claim(self, key, job_id):
+        """
+        Make `job_id` the job of this key, unless another request, possibly of another API
+        process, claimed the key first. Returns the job ID the key is answered by.
+        """
+        path = Path(self.cache_dir, key)
+        with self._lock:
+            while True:
+                try:
+                    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                    break
+                except FileExistsError:
+                    entry = self.__read(path)
+                    if entry is not None:
+                        self.stats['coalesced'] += 1
+                        self._logger.info("[ResultCache] Request %s coalesced onto job %s.",
+                                          key[:12], entry['job_id'])
+                        return entry['job_id']
+                    self.__remove(path)  # an unreadable entry is replaced, as if it had expired
+            with os.fdopen(fd, 'wb') as file:
+                file.write(orjson.dumps({'job_id': job_id, 'created_at': time.time()}))
+            self.__evict()
+        return job_id
+
+    @staticmethod
+    def __read(path, retries=10):
+        """Entry at `path`, or None. An empty entry is being written by its creator and read again shortly."""
+        for _ in range(retries):
+            try:
+                content = path.read_bytes()
+            except FileNotFoundError:
+                return None
+            if content:
+                try:
+                    return orjson.loads(content)
+                except orjson.JSONDecodeError:
+                    return None
+            time.sleep(0.01)
+        return None
+
+    @staticmethod
+    def __touch(path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def __evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        entries = []
+        for path in self.cache_dir.glob('[!.]*'):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass
+        for _, path in sorted(entries)[:max(len(entries) - self.max_entries, 0)]:
+            self.__remove(path)
+            self.stats['evictions'] += 1
+
+    @staticmethod
+    def __remove(path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def info(self):
+        """Counters of this API process and the number of entries in the shared index."""
+        return dict(self.stats, entries=sum(1 for _ in self.cache_dir.glob('[!.]*')), max_entries=self.max_entries,
+                    ttl_seconds=self.ttl_seconds)
@@ -0,0 +1,84 @@
+"""
+IMPORT TIME BENCHMARK
+
+Imports the entry-point modules in fresh interpreters with `python -X importtime` and
+reports the total import time, the slowest direct imports of the module and which of the heavy
+optional dependencies were loaded. Those should only be imported once their feature
+is used, so any listed under 'heavy imports' is a cold start regression.
+
+Usage:
+    python -m src.benchmark.import_time_benchmark
+    python -m src.benchmark.import_time_benchmark --modules main --repeat 5 --output import_times.json
+"""
+import re
+import sys
+import argparse
+import subprocess
+import statistics
+import orjson
+from pathlib import Path
+
+ENTRY_MODULES = ['main', 'src.api.api_main']
+HEAVY_MODULES = ['mlflow', 'sqlalchemy', 'boto3', 'azure', 'scipy', 'highspy']
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def import_times(module):
+    """
+    (total microseconds, cumulative microseconds of each direct import of the module,
+    names of every imported module) of one cold import.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                             cwd=Path(__file__).resolve().parents[2], capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr.strip().splitlines()[-1]}")
+    total, direct, imported = 0, {}, set()
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            imported.add(name)
+            if not indent:
+                total += int(cumulative)  # interpreter start-up and the module
+                if name != module:
+                    direct = {}  # the indented imports so far belonged to a start-up import
+            elif len(indent) == 2:
+                direct[name] = int(cumulative)  # the module's imports are listed before it, one level in
+    return total, direct, imported
+
+
+def run(modules=ENTRY_MODULES, repeat=3, top=5):
+    rows = []
+    for module in modules:
+        totals, direct, imported = [], {}, set()
+        for _ in range(repeat):
+            total, direct, imported = import_times(module)
+            totals.append(total / 1000)
+        heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+        slowest = sorted(direct.items(), key=lambda item: -item[1])[:top]
+        rows.append({
+            'module': module,
+            'total_ms': round(statistics.median(totals), 1),
+            'slowest': {name: round(us / 1000, 1) for name, us in slowest},
+            'heavy_imports': heavy,
+        })
+
+    print(f"{'module':<20} {'total (ms)':>10}  {'heavy imports':<24} slowest direct imports (ms)")
+    for row in rows:
+        slowest = ', '.join(f"{name} {ms:.0f}" for name, ms in row['slowest'].items())
+        print(f"{row['module']:<20} {row['total_ms']:>10.1f}  {', '.join(row['heavy_imports']) or '-':<24} {slowest}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the entry-point modules.")
+    parser.add_argument('--modules', nargs='+', default=ENTRY_MODULES, help="modules to import")
+    parser.add_argument('--repeat', type=int, default=3, help="cold imports per module, the median is reported")
+    parser.add_argument('--top', type=int, default=5, help="slowest top-level imports to list")
+    parser.add_argument('--output', help="JSON file for the results")
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat, args.top)
+    if args.output:
+        with open(args.output, 'wb') as file:
+            file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
@@ -0,0 +1,153 @@
+"""
+SYNTHETIC INSTANCE GENERATOR
+
+Generates campaign datasets of any size: clusters, products with their minimum offers,
+the expected product cost and profit of each cluster and the customer level cost and
+profit of every eligible (customer, product) pair. An instance is written either in the
+CSV layout read by the InputHandler or as the JSON input of the API.
+
+Each cluster has a preferred product, which all of its customers are eligible for and
+which is the most profitable product of the cluster. The other products are offered to
+a `density` share of the customers. The budget is a `budget_share` of the cost of
+offering every customer their preferred product, so with the default share above one
+the tactical allocation is integral and the operational model is feasible. A smaller
+share makes the budget binding, and the tactical allocation may then be fractional.
+
+Usage:
+    python -m src.benchmark.instance_generator --customers 10000 --csv data/01_raw
+    python -m src.benchmark.instance_generator --customers 1000 --products 8 --density 0.3 --json payload.json
+"""
+import argparse
+import orjson
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from src.optimisation_model.campaign_data import CUSTOMER_COLUMNS
+
+N_CLUSTERS = 10
+N_PRODUCTS = 5
+PREFERRED_MARGIN = 2.0  # expected profit of the preferred product of a cluster over its best other product
+
+
+class SyntheticInstance(object):
+    """
+    Synthetic campaign of `n_customers` customers spread over `n_clusters` clusters,
+    reproducible from its seed.
+    """
+    def __init__(self, n_customers, n_clusters=N_CLUSTERS, n_products=N_PRODUCTS, density=1.0,
+                 budget_share=1.05, min_offer_share=0.01, roi=120, seed=999):
+        if not 0 <= density <= 1:
+            raise ValueError(f"The density must be between 0 and 1, not {density}.")
+        self.n_customers = n_customers
+        self.density = density
+        self.roi = roi
+        self.seed = seed
+        self.clusters = [f"k{k + 1}" for k in range(n_clusters)]
+        self.products = [f"p{j + 1}" for j in range(n_products)]
+        self.__generate(np.random.default_rng(seed), budget_share, min_offer_share)
+
+    def __str__(self):
+        return f"SyntheticInstance with {len(self.clusters)} clusters, {len(self.products)} products, " \
+               f"{self.n_customers} customers and {len(self.customer_df)} customer-product pairs"
+
+    def __generate(self, rng, budget_share, min_offer_share):
+        n_clusters, n_products = len(self.clusters), len(self.products)
+        customer_cluster = rng.integers(n_clusters, size=self.n_customers)
+        preferred = np.arange(n_clusters) % n_products
+
+        # eligible pairs: the preferred product of the cluster and a density share of the others
+        eligible = rng.random((self.n_customers, n_products)) < self.density
+        eligible[np.arange(self.n_customers), preferred[customer_cluster]] = True
+        customer, product = np.nonzero(eligible)
+        cluster = customer_cluster[customer]
+
+        # expected cost and profit of each (cluster, product), the preferred product of a cluster
+        # with PREFERRED_MARGIN times the best expected profit of its other products
+        clusters, is_preferred = np.arange(n_clusters), np.arange(n_products) == preferred[:, None]
+        expected_cost = rng.uniform(50, 300, size=n_products) * rng.uniform(0.8, 1.2, size=(n_clusters, n_products))
+        expected_profit = expected_cost * rng.uniform(5, 15, size=(n_clusters, n_products))
+        expected_profit[clusters, preferred] = PREFERRED_MARGIN * np.where(is_preferred, 0, expected_profit).max(axis=1)
+
+        # customer cost and profit drawn around the expected values, with a mean of one
+        cost = expected_cost[cluster, product] * rng.lognormal(-0.25 ** 2 / 2, 0.25, size=len(product))
+        profit = expected_profit[cluster, product] / expected_cost[cluster, product] * cost * rng.uniform(0.8, 1.2, size=len(product))
+        self.customer_df = pd.DataFrame({
+            'Cluster': np.asarray(self.clusters, dtype=object)[cluster],
+            'Customer': pd.Index(customer + 1).astype(str).map('c{}'.format),
+            'Product': np.asarray(self.products, dtype=object)[product],
+            'Cost': cost.round(2),
+            'Profit': profit.round(2),
+        }, columns=CUSTOMER_COLUMNS)
+
+        # no expected profit for a product without eligible customers in the cluster
+        has_customers = np.zeros((n_clusters, n_products), dtype=bool)
+        has_customers[cluster, product] = True
+        self.cost_df = pd.DataFrame(expected_cost.round(2), index=self.clusters, columns=self.products)
+        self.profit_df = pd.DataFrame(np.where(has_customers, expected_profit, 0).round(2),
+                                      index=self.clusters, columns=self.products)
+
+        cluster_size = np.bincount(customer_cluster, minlength=n_clusters)
+        self.cluster_df = pd.DataFrame({'Cluster': self.clusters, 'Count': cluster_size})
+        min_offers = int(np.ceil(min_offer_share * self.n_customers / n_products))
+        self.product_df = pd.DataFrame({'Product_Type': self.products, 'Count': min_offers})
+        # cost of offering every customer the preferred product, expected (tactical) and actual (operational)
+        preferred_cost = max(self.cost_df.to_numpy()[clusters, preferred] @ cluster_size,
+                             self.customer_df['Cost'].to_numpy()[product == preferred[cluster]].sum())
+        self.budget = int(np.ceil(budget_share * preferred_cost))
+
+    def to_api_json(self):
+        """Input of the optimisation API endpoints."""
+        cost, profit = self.cost_df.T, self.profit_df.T
+        return {
+            "budget": self.budget,
+            "roi": self.roi,
+            "cluster": self.cluster_df.to_dict(orient='records'),
+            "product": self.product_df.to_dict(orient='records'),
+            "cost": cost.rename_axis('Product_Type_Cost').reset_index().to_dict(orient='records'),
+            "profit": profit.rename_axis('Product_Type_Profit').reset_index().to_dict(orient='records'),
+            "cust_cost_profit": self.customer_df.to_dict(orient='records'),
+        }
+
+    def write_json(self, path):
+        with open(path, 'wb') as file:
+            file.write(orjson.dumps(self.to_api_json(), option=orjson.OPT_SERIALIZE_NUMPY))
+
+    def write_csv(self, directory):
+        """
+        Write the input files read by the InputHandler: cluster_data, product_data,
+        product_cost and product_profit (indexed by cluster) and customer_data. The
+        budget and ROI are not part of the files, they come from Config.OPT_PARAMS.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.cluster_df.to_csv(directory / 'cluster_data.csv', index=False)
+        self.product_df.to_csv(directory / 'product_data.csv', index=False)
+        self.cost_df.rename_axis(None).to_csv(directory / 'product_cost.csv')
+        self.profit_df.rename_axis(None).to_csv(directory / 'product_profit.csv')
+        self.customer_df.to_csv(directory / 'customer_data.csv', index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic campaign instance.")
+    parser.add_argument('--customers', type=int, required=True, help="number of customers")
+    parser.add_argument('--clusters', type=int, default=N_CLUSTERS, help="number of clusters")
+    parser.add_argument('--products', type=int, default=N_PRODUCTS, help="number of products")
+    parser.add_argument('--density', type=float, default=1.0,
+                        help="share of the customers eligible for each product other than their cluster's preferred one")
+    parser.add_argument('--budget-share', type=float, default=1.05,
+                        help="budget as a share of the cost of offering every customer their preferred product")
+    parser.add_argument('--roi', type=int, default=120, help="minimum ROI, in percent")
+    parser.add_argument('--seed', type=int, default=999, help="random seed")
+    parser.add_argument('--csv', help="directory for the CSV input files")
+    parser.add_argument('--json', help="file for the API JSON input")
+    args = parser.parse_args()
+    if not (args.csv or args.json):
+        parser.error("give a --csv directory or a --json file")
+
+    instance = SyntheticInstance(args.customers, args.clusters, args.products, args.density,
+                                 args.budget_share, roi=args.roi, seed=args.seed)
+    if args.csv:
+        instance.write_csv(args.csv)
+    if args.json:
+        instance.write_json(args.json)
+    print(f"{instance}, budget {instance.budget} and ROI {instance.roi}.")
@@ -0,0 +1,101 @@
+"""
+OPERATIONAL MODEL BUILD BENCHMARK
+
+Times the construction of the operational model, for both the Pyomo and the matrix builder,
+on synthetic instances of growing size and checks that the build time grows linearly
+in the number of (customer, product) pairs.
+
+Usage:
+    python -m src.benchmark.operation_model_benchmark
+"""
+import math
+import random
+import time
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.tactical_model import TacticalOptimisationModel
+from src.optimisation_model.operation_model import OperationalOptimisationModel
+from src.optimisation_model.matrix_model import OperationalMatrixModel
+
+BUILDERS = {
+    'pyomo': OperationalOptimisationModel,
+    'matrix': OperationalMatrixModel,
+}
+
+CUSTOMER_LADDER = [1000, 2000, 4000, 8000, 16000]
+N_CLUSTERS = 10
+N_PRODUCTS = 5
+MAX_SCALING_EXPONENT = 1.25
+
+
+def synthetic_input(n_customers, n_clusters=N_CLUSTERS, n_products=N_PRODUCTS, seed=999):
+    """Build a synthetic API-style input with every customer eligible for every product."""
+    rng = random.Random(seed)
+    clusters = [f"k{k + 1}" for k in range(n_clusters)]
+    products = [f"p{j + 1}" for j in range(n_products)]
+    cluster_size = {k: 0 for k in clusters}
+    cust_cost_profit = []
+    for i in range(n_customers):
+        cluster = clusters[i % n_clusters]
+        cluster_size[cluster] += 1
+        for product in products:
+            cost = rng.uniform(50, 300)
+            cust_cost_profit.append({
+                "Cluster": cluster,
+                "Customer": f"c{i + 1}",
+                "Product": product,
+                "Cost": cost,
+                "Profit": cost * rng.uniform(5, 15),
+            })
+    return {
+        "budget": 175 * (n_customers // 2),
+        "roi": 120,
+        "cluster": [{"Cluster": k, "Count": cluster_size[k]} for k in clusters],
+        "product": [{"Product_Type": j, "Count": 1} for j in products],
+        "cost": [dict({"Product_Type_Cost": j}, **{k: 175 for k in clusters}) for j in products],
+        "profit": [dict({"Product_Type_Profit": j}, **{k: 1750 for k in clusters}) for j in products],
+        "cust_cost_profit": cust_cost_profit,
+    }
+
+
+def time_operational_build(n_customers, builder='pyomo'):
+    """Return (number of ccp pairs, seconds spent building the operational model)."""
+    processed_data = Preprocessing(synthetic_input(n_customers))
+    tactical_model = TacticalOptimisationModel(processed_data).model
+    # a feasible tactical allocation, so that no solver is needed for the benchmark
+    for k, j in tactical_model.cp:
+        tactical_model.y[k, j].value = float(n_customers // (N_CLUSTERS * N_PRODUCTS * 2))
+    tactical_model.z.value = 0.0
+
+    start = time.perf_counter()
+    BUILDERS[builder](tactical_model, processed_data)
+    elapsed = time.perf_counter() - start
+    return processed_data.data.n_pairs, elapsed
+
+
+def scaling_exponent(sizes, timings):
+    """Least-squares slope of log(time) against log(size)."""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(t) for t in timings]
+    x_mean, y_mean = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sum((x - x_mean) ** 2 for x in xs)
+
+
+def run(customer_ladder=CUSTOMER_LADDER, builders=tuple(BUILDERS)):
+    exponents = {}
+    for builder in builders:
+        sizes, timings = [], []
+        print(f"\n[{builder}] {'customers':>10} {'ccp pairs':>10} {'build (s)':>10} {'us/pair':>8}")
+        for n_customers in customer_ladder:
+            n_pairs, elapsed = time_operational_build(n_customers, builder)
+            sizes.append(n_pairs)
+            timings.append(elapsed)
+            print(f"[{builder}] {n_customers:>10} {n_pairs:>10} {elapsed:>10.3f} {1e6 * elapsed / n_pairs:>8.1f}")
+        exponents[builder] = scaling_exponent(sizes, timings)
+        print(f"[{builder}] Build time scales as O(n^{exponents[builder]:.2f}) in customers x products.")
+        assert exponents[builder] <= MAX_SCALING_EXPONENT, \
+            f"Operational {builder} model build is super-linear (exponent {exponents[builder]:.2f} > {MAX_SCALING_EXPONENT})."
+    return exponents
+
+
+if __name__ == "__main__":
+    run()
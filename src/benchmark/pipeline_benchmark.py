@@ -0,0 +1,225 @@
+"""
+PIPELINE BENCHMARK
+
+Runs the stages of `main()` on synthetic instances of growing size and records the stage
+spans of each: wall and CPU time, peak RSS and model sizes, and in a second, traced run
+the peak Python heap (tracemalloc), which leaves out the memory the solvers allocate
+outside of Python. The results of a run are stored as JSON under
+data/08_reporting/benchmarks, one file per commit, so that a later run can be compared
+with them.
+
+Usage:
+    python -m src.benchmark.pipeline_benchmark
+    python -m src.benchmark.pipeline_benchmark --customers 1000 10000 --density 0.3 --source csv --compare 1a2b3c4
+"""
+import time
+import tempfile
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+import orjson
+from pathlib import Path
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.solver import ModelSolver
+from src.optimisation_model.model_cache import OperationalModelCache
+from src.optimisation_model.postprocessing import Postprocessing
+from src.optimisation_model.mlflow_logger import MLFlowLogger
+from src.optimisation_model.stage_metrics import profile, span
+from src.benchmark.instance_generator import SyntheticInstance
+from main import MODEL_BUILDERS, solve_operational
+
+CUSTOMER_LADDER = [1000, 4000, 16000, 64000]
+WARM_UP_CUSTOMERS = 100  # untimed first run, so that one-off imports are not charged to the first size
+STAGES = ['preprocessing', 'tactical_build', 'tactical_solve', 'presolve', 'operational_build', 'operational_solve',
+          'postprocessing', 'export', 'mlflow']
+MODEL_SIZES = ('variables', 'constraints', 'nonzeros')
+RESULTS_DIR = Path(Config.FILES['REPORTING'], 'benchmarks')
+
+
+@contextlib.contextmanager
+def patched(settings, **values):
+    """Temporarily set entries of a Config dict."""
+    previous = {key: settings[key] for key in values if key in settings}
+    settings.update(values)
+    try:
+        yield
+    finally:
+        for key in values:
+            if key in previous:
+                settings[key] = previous[key]
+            else:
+                del settings[key]
+
+
+def git_commit():
+    """Short hash of HEAD, with a -dirty suffix for uncommitted changes, or 'unknown'."""
+    root = Path(__file__).resolve().parents[2]
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_stages(api_data=None, memory=False, mlflow=False):
+    """
+    Run the stages of main() once in a stage profile. Returns the spans of the top-level
+    stages, by stage, up to the failed stage and the error message of the failed stage, if
+    any. With `memory` the spans hold the peak of the traced Python heap instead of the RSS.
+    """
+    TacticalModel, _ = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+    OperationalModelCache.clear()  # every run builds its operational model
+    error = None
+    with patched(Config.STAGE_METRICS, ENABLED=True, MODEL_SIZE=True), profile('tracemalloc' if memory else 'rss') as stage_profile:
+        try:
+            with span('preprocessing'):
+                processed_data = Preprocessing(api_data)
+            with span('tactical_build') as stage:
+                tactical_model = TacticalModel(processed_data).model
+                stage.set_model(tactical_model)
+            with span('tactical_solve'):
+                tactical_solver = ModelSolver(tactical_model)
+            operational_solver, operational_model = solve_operational(tactical_model, processed_data)
+            with span('postprocessing'):
+                post_process_output = Postprocessing(tactical_solver, operational_solver, tactical_model, operational_model)
+            with span('export'):
+                post_process_output.export()
+            if mlflow:
+                with span('mlflow'):
+                    MLFlowLogger.log(post_process_output)
+                    MLFlowLogger.flush()
+        except Exception as e:
+            error = str(e).splitlines()[0]
+    return {s['stage']: s for s in stage_profile.as_list() if s['parent'] is None}, error
+
+
+def benchmark_size(n_customers, density=1.0, source='json', repeat=1, memory=True, mlflow=False, seed=999):
+    """
+    Median stage wall and CPU times over `repeat` runs, with the peak RSS and the model
+    sizes of the last one and, with `memory`, the stage peak heap memory of a traced run.
+    """
+    instance = SyntheticInstance(n_customers, density=density, seed=seed)
+    row = {'customers': n_customers, 'pairs': len(instance.customer_df), 'density': density}
+    with contextlib.ExitStack() as stack:
+        if source == 'csv':
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            instance.write_csv(directory)
+            stack.enter_context(patched(Config.MODEL_INPUTOUTPUT['import_settings']['csv'], import_filepath=Path(directory)))
+            stack.enter_context(patched(Config.MODEL_INPUTOUTPUT['cache_settings'], enabled=False))
+            stack.enter_context(patched(Config.OPT_PARAMS, budget=instance.budget, roi=instance.roi))
+            api_data = None
+        else:
+            api_data = instance.to_api_json()
+
+        runs = []
+        for _ in range(repeat):
+            spans, error = run_stages(api_data, mlflow=mlflow)
+            runs.append(spans)
+            if error:
+                break
+        stages = [name for name in STAGES if name in runs[-1]]
+        for key, field in (('seconds', 'wall_seconds'), ('cpu_seconds', 'cpu_seconds')):
+            row[key] = {name: round(statistics.median(run[name][field] for run in runs if name in run), 4) for name in stages}
+        row['total_seconds'] = round(sum(row['seconds'].values()), 4)
+        row['peak_rss_mib'] = {name: runs[-1][name]['peak_rss_mib'] for name in stages}
+        row['model_size'] = {name: {size: runs[-1][name][size] for size in MODEL_SIZES}
+                             for name in stages if 'nonzeros' in runs[-1][name]}
+        if memory and not error:
+            spans, _ = run_stages(api_data, memory=True, mlflow=mlflow)
+            row['peak_heap_mib'] = {name: spans[name]['peak_tracemalloc_mib'] for name in stages if name in spans}
+        row['error'] = error
+    return row
+
+
+def results_path(commit, results_dir=RESULTS_DIR):
+    return Path(results_dir, f"pipeline_{commit}.json")
+
+
+def run(customer_ladder=CUSTOMER_LADDER, density=1.0, source='json', repeat=1, memory=True, mlflow=False,
+        compare=None, results_dir=RESULTS_DIR):
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'source': source,
+        'settings': {key: config[key] for key in ('solver_type', 'model_builder', 'solver_backend',
+                                                   'operational_engine', 'operational_mode', 'warm_start')},
+        'rows': [],
+    }
+    baseline = load_baseline(compare, results_dir) if compare else None
+    benchmark_size(WARM_UP_CUSTOMERS, density, source, memory=False, mlflow=mlflow)
+    stages = [name for name in STAGES if mlflow or name != 'mlflow']
+    print(f"{'customers':>10} {'pairs':>10} " + ' '.join(f"{name:>17}" for name in stages) + f" {'total (s)':>10}")
+    for n_customers in customer_ladder:
+        row = benchmark_size(n_customers, density, source, repeat, memory, mlflow)
+        report['rows'].append(row)
+        print(f"{row['customers']:>10} {row['pairs']:>10} " + format_stages(row['seconds'], stages, '.3f')
+              + f" {row['total_seconds']:>10.3f}")
+        print(f"{'peak RSS MiB':>21} " + format_stages(row['peak_rss_mib'], stages, '.1f'))
+        if 'peak_heap_mib' in row:
+            print(f"{'peak heap MiB':>21} " + format_stages(row['peak_heap_mib'], stages, '.1f'))
+        if row['error']:
+            print(f"{'':>21} failed: {row['error']}")
+        if baseline is not None:
+            print_comparison(row, baseline, stages)
+
+    path = results_path(report['commit'], results_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"Results stored in {path}.")
+    return report
+
+
+def format_stages(values, stages, number_format):
+    return ' '.join(f"{values[name]:>17{number_format}}" if values.get(name) is not None else f"{'-':>17}" for name in stages)
+
+
+def load_baseline(compare, results_dir=RESULTS_DIR):
+    """Stored report of a commit (or a report file), as {(customers, density): row}."""
+    path = Path(compare) if Path(compare).is_file() else results_path(compare, results_dir)
+    if not path.is_file():
+        raise FileNotFoundError(f"No stored benchmark results of {compare} in {results_dir}.")
+    report = orjson.loads(path.read_bytes())
+    print(f"Compared with commit {report['commit']} of {report['timestamp']}.")
+    return {(row['customers'], row['density']): row for row in report['rows']}
+
+
+def print_comparison(row, baseline, stages):
+    """Stage times of the row relative to the same size in the baseline, > 1 is slower."""
+    base = baseline.get((row['customers'], row['density']))
+    if base is None:
+        return
+    ratios = {name: row['seconds'][name] / base['seconds'][name]
+              for name in stages if base['seconds'].get(name) and name in row['seconds']}
+    total = row['total_seconds'] / base['total_seconds'] if base['total_seconds'] else None
+    print(f"{'vs baseline (x)':>21} " + format_stages(ratios, stages, '.2f') + (f" {total:>10.2f}" if total else ''))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the stages of main() across a size ladder.")
+    parser.add_argument('--customers', type=int, nargs='+', default=CUSTOMER_LADDER, help="customer ladder")
+    parser.add_argument('--density', type=float, default=1.0, help="share of the customers eligible for the non-preferred products")
+    parser.add_argument('--source', choices=['json', 'csv'], default='json',
+                        help="pass the instances as API JSON or write them as the CSV input files")
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per size, the median is reported")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip the traced run of each size")
+    parser.add_argument('--mlflow', action='store_true', help="also log the runs to MLflow")
+    parser.add_argument('--solver', help="solver_type to use instead of the configured one")
+    parser.add_argument('--builder', choices=sorted(MODEL_BUILDERS), help="model_builder to use instead of the configured one")
+    parser.add_argument('--compare', help="commit (or results file) to compare the stage times with")
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help="directory of the stored results")
+    args = parser.parse_args()
+
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    overrides = {key: value for key, value in (('solver_type', args.solver), ('model_builder', args.builder)) if value}
+    Config.init_directories()
+    with patched(config, **overrides):
+        config['solver_option'].setdefault(config['solver_type'], {})
+        run(args.customers, args.density, args.source, args.repeat, args.memory, args.mlflow, args.compare, args.results_dir)
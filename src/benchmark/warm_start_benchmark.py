@@ -0,0 +1,56 @@
+"""
+OPERATIONAL WARM START BENCHMARK
+
+Solves the operational model of synthetic instances with and without the greedy
+warm start and reports the incumbent, the final objective and the solve time of both.
+
+Usage:
+    python -m src.benchmark.warm_start_benchmark
+"""
+import time
+from conf import Config
+from src.benchmark.operation_model_benchmark import synthetic_input
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.solver import ModelSolver
+from src.optimisation_model.warm_start import GreedyWarmStart
+from main import MODEL_BUILDERS
+
+CUSTOMER_LADDER = [500, 1000, 2000]
+
+
+def solve_operational(tactical_model, processed_data, warmstart):
+    """Return (greedy incumbent objective or None, final objective, solve seconds)."""
+    _, OperationalModel = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+    operation_model = OperationalModel(tactical_model, processed_data).model
+    incumbent = None
+    if warmstart:
+        greedy = GreedyWarmStart(tactical_model, processed_data)
+        greedy.load(operation_model)
+        incumbent = greedy.objective_value
+    start = time.perf_counter()
+    solver = ModelSolver(operation_model, warmstart=warmstart)
+    elapsed = time.perf_counter() - start
+    return incumbent, solver.results.problem.lower_bound, elapsed
+
+
+def run(customer_ladder=CUSTOMER_LADDER):
+    TacticalModel, _ = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+    rows = []
+    for n_customers in customer_ladder:
+        processed_data = Preprocessing(synthetic_input(n_customers))
+        tactical_model = TacticalModel(processed_data).model
+        ModelSolver(tactical_model)
+        for warmstart in (False, True):
+            incumbent, objective, elapsed = solve_operational(tactical_model, processed_data, warmstart)
+            rows.append((n_customers, warmstart, incumbent, objective, elapsed))
+
+    print(f"{'customers':>10} {'warm start':>10} {'incumbent':>14} {'objective':>14} {'solve (s)':>10}")
+    for n_customers, warmstart, incumbent, objective, elapsed in rows:
+        incumbent = f"{incumbent:,.2f}" if incumbent is not None else "-"
+        objective = f"{objective:,.2f}" if objective is not None else "-"
+        print(f"{n_customers:>10} {str(warmstart):>10} {incumbent:>14} {objective:>14} {elapsed:>10.3f}")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
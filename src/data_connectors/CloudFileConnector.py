@@ -41,7 +41,7 @@ class AzureBlobStorage:
                 )
             my_blobs = container_client.list_blobs(blob_name) # reloading the blob
             for blob in my_blobs:
-                self._logger.debug(f"[AzureBlobStorage] Loading blob {blob.name}.")
+                self._logger.debug("[AzureBlobStorage] Loading blob %s.", blob.name)
                 downloaded_blob = container_client.download_blob(blob)
                 azure_df = PandasFileConnector.load(StringIO(downloaded_blob.content_as_text()),
                                                     file_type=PandasFileConnector._check_filetype(blob.name))
@@ -143,7 +143,7 @@ class AWSS3Bucket:
             for obj in self.s3_resource.Bucket(bucket_name).objects.filter(Prefix=filepath_aws):
                 if obj.key.endswith('/'):
                     continue
-                self._logger.debug(f"[AWSS3Bucket] Loading file {obj.key}.")
+                self._logger.debug("[AWSS3Bucket] Loading file %s.", obj.key)
                 aws_df = PandasFileConnector.load(obj.get()['Body'],
                                                   file_type=PandasFileConnector._check_filetype(obj.key))
                 compiled_aws_df = pd.concat([compiled_aws_df, aws_df], axis=0)
@@ -172,7 +172,7 @@ class DatabaseConnector:
                                       chunksize=int(2100 / subset_data_df.shape[1]) - 1)
 
         end_time = datetime.now()
-        self._logger.debug(f"[DatabaseConnector] update_table() completed in {end_time - start_time}.")
+        self._logger.debug("[DatabaseConnector] update_table() completed in %s.", end_time - start_time)
 
     def _create_engine(self):
         """Establishes connection with database."""
@@ -204,7 +204,7 @@ class DatabaseConnector:
         self._logger.debug("[DatabaseConnector] execute_statement() initiated.")
         engine = self._create_engine()
         with engine.connect() as con:
-            self._logger.debug(f"[DatabaseConnector] Running {sql_statement}...")
+            self._logger.debug("[DatabaseConnector] Running %s...", sql_statement)
             if expect_output:
                 rs = con.execute(sql_statement).fetchall()
             else:
@@ -27,7 +27,7 @@ class PandasFileConnector:
         """
 
         try:
-            cls._logger.debug(f"[PandasFileConnector] Data loading ({filepath}) initiated...")
+            cls._logger.debug("[PandasFileConnector] Data loading (%s) initiated...", filepath)
             file_type = file_type or cls._check_filetype(filepath)
             file_type = file_type if file_type.startswith('.') else '.' + file_type
             pd_connector = cls._get_connector(file_type)
@@ -51,7 +51,7 @@ class PandasFileConnector:
         """
 
         try:
-            cls._logger.debug(f"[PandasFileConnector] Data saving ({filepath}) initiated...")
+            cls._logger.debug("[PandasFileConnector] Data saving (%s) initiated...", filepath)
             file_type = file_type or cls._check_filetype(filepath)
             pd_connector = cls._get_connector(file_type)
             pd_connector.save(data_df, filepath, **kwargs)
@@ -77,7 +77,7 @@ class PandasFileConnector:
     @classmethod
     def _check_filetype(cls, filepath):
         file_extension = Path(filepath).suffix
-        cls._logger.debug(f"[_check_filetype] File extension detected as {file_extension}")
+        cls._logger.debug("[_check_filetype] File extension detected as %s", file_extension)
         file_connectors = cls._connector_list()
         assert file_extension in file_connectors.keys(), \
             f"File extension ({file_extension}) not recognised. Only accept .csv, .xlsx, .txt, .json, " \
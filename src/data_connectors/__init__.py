@@ -1,9 +1,4 @@
-# from src.data_connectors.CloudFileConnector import (
-#     AzureBlobStorage, AWSS3Bucket
-# )
-from src.data_connectors.DatabaseFileConnector import (
-    DatabaseConnector
-)
+import importlib
 from src.data_connectors.PandasFileConnector import (
     PandasFileConnector, pd
 )
@@ -11,5 +6,19 @@ from src.data_connectors.YAMLFileConnector import (
     YAMLFileConnector
 )
 
+# connectors with heavy optional dependencies (sqlalchemy, boto3, azure) are imported on first use
+_LAZY_CONNECTORS = {
+    'DatabaseConnector': 'src.data_connectors.DatabaseFileConnector',
+    'AzureBlobStorage': 'src.data_connectors.CloudFileConnector',
+    'AWSS3Bucket': 'src.data_connectors.CloudFileConnector',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_CONNECTORS:
+        return getattr(importlib.import_module(_LAZY_CONNECTORS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 pd.set_option("max.columns", 20)
 pd.set_option("display.width", 2000)
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+CAMPAIGN DATA CLASS
+
+Compact, array-backed representation of the preprocessed campaign data.
+Clusters, customers and products are stored once as label arrays and every
+(cluster, customer, product) pair is stored as integer codes into those labels,
+with its cost and profit held in float arrays.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+CUSTOMER_COLUMNS = ['Cluster', 'Customer', 'Product', 'Cost', 'Profit']
+
+
+class CampaignData:
+    """
+    Array-backed campaign data.
+
+    Cluster level (K clusters) and product level (P products):
+        clusters, cluster_size, products, product_min_offers,
+        product_cost and product_profit as (K, P) matrices.
+    Pair level (N customer-product pairs):
+        pair_cluster, pair_customer and pair_product are integer codes into
+        clusters, customers and products, pair_cost and pair_profit are floats,
+        kept in the floating dtype they are given (e.g. float32 when read with a
+        compact customer_float_dtype), the model builders convert them to float64.
+    """
+    def __init__(self, clusters, cluster_size, products, product_min_offers, product_cost, product_profit,
+                 customers, pair_cluster, pair_customer, pair_product, pair_cost, pair_profit):
+        self.clusters = np.asarray(clusters, dtype=object)
+        self.cluster_size = np.asarray(cluster_size, dtype=np.float64)
+        self.products = np.asarray(products, dtype=object)
+        self.product_min_offers = np.asarray(product_min_offers, dtype=np.float64)
+        self.product_cost = np.asarray(product_cost, dtype=np.float64)
+        self.product_profit = np.asarray(product_profit, dtype=np.float64)
+        self.customers = np.asarray(customers, dtype=object)
+        self.pair_cluster = np.asarray(pair_cluster, dtype=np.int32)
+        self.pair_customer = np.asarray(pair_customer, dtype=np.int32)
+        self.pair_product = np.asarray(pair_product, dtype=np.int32)
+        self.pair_cost = self.__floats(pair_cost)
+        self.pair_profit = self.__floats(pair_profit)
+
+    def __str__(self):
+        return f"CampaignData with {len(self.clusters)} clusters, {len(self.products)} products, " \
+               f"{len(self.customers)} customers and {self.n_pairs} customer-product pairs"
+
+    @classmethod
+    def from_frames(cls, cluster_df, product_df, cost_df, profit_df, customer_df):
+        """
+        Build the campaign data from dataframes.
+
+        Args:
+            cluster_df ([dataframe]): [cluster label and customer count columns]
+            product_df ([dataframe]): [product label and minimum offer count columns]
+            cost_df ([dataframe]): [expected cost, indexed by cluster with one column per product]
+            profit_df ([dataframe]): [expected profit, indexed by cluster with one column per product]
+            customer_df ([dataframe]): [long table with the CUSTOMER_COLUMNS columns]
+        Returns:
+            campaign_data ([CampaignData]): [compact campaign data]
+        """
+        clusters = cluster_df.iloc[:, 0].to_numpy(dtype=object)
+        products = product_df.iloc[:, 0].to_numpy(dtype=object)
+        customer_codes, customers = pd.factorize(customer_df['Customer'])
+        return cls(
+            clusters=clusters,
+            cluster_size=cluster_df.iloc[:, 1].to_numpy(dtype=np.float64),
+            products=products,
+            product_min_offers=product_df.iloc[:, 1].to_numpy(dtype=np.float64),
+            product_cost=cls.__expected(cost_df, clusters, products, 'cost'),
+            product_profit=cls.__expected(profit_df, clusters, products, 'profit'),
+            customers=np.asarray(customers, dtype=object),
+            pair_cluster=cls.encode(customer_df['Cluster'], clusters, 'Cluster'),
+            pair_customer=customer_codes,
+            pair_product=cls.encode(customer_df['Product'], products, 'Product'),
+            pair_cost=customer_df['Cost'].to_numpy(dtype=np.float64),
+            pair_profit=customer_df['Profit'].to_numpy(dtype=np.float64),
+        )
+
+    @classmethod
+    def from_chunks(cls, cluster_df, product_df, cost_df, profit_df, customer_chunks):
+        """
+        Build the campaign data from the customer table read in chunks, e.g. with
+        `pd.read_csv(..., chunksize=...)`. Only the integer codes and the cost and profit
+        values of each chunk are kept, so the raw customer table is never held in memory.
+
+        Args:
+            cluster_df, product_df, cost_df, profit_df ([dataframe]): [as in from_frames]
+            customer_chunks ([iterable]): [dataframes with the CUSTOMER_COLUMNS columns, Cluster and
+                Product as categoricals of the cluster and product labels, Customer as strings]
+        Returns:
+            campaign_data ([CampaignData]): [compact campaign data, pairs ordered like from the sorted table]
+        """
+        clusters = cluster_df.iloc[:, 0].to_numpy(dtype=object)
+        products = product_df.iloc[:, 0].to_numpy(dtype=object)
+        customer_index = {}  # customer label to code, in order of appearance in the file
+        parts = {column: [] for column in CUSTOMER_COLUMNS}
+        for n_chunk, chunk in enumerate(customer_chunks):
+            for column, labels in (('Cluster', clusters), ('Product', products)):
+                codes = pd.Categorical(chunk[column], categories=labels).codes
+                if (codes < 0).any():
+                    raise ValueError(f"Customer data chunk {n_chunk} has {int((codes < 0).sum())} rows with "
+                                     f"missing or unknown {column} values.")
+                parts[column].append(codes.astype(np.int32))
+            codes, uniques = pd.factorize(chunk['Customer'])
+            if (codes < 0).any():
+                raise ValueError(f"Customer data chunk {n_chunk} has rows without a Customer value.")
+            chunk_codes = np.fromiter((customer_index.setdefault(c, len(customer_index)) for c in uniques),
+                                      dtype=np.int32, count=len(uniques))
+            parts['Customer'].append(chunk_codes[codes])
+            parts['Cost'].append(chunk['Cost'].to_numpy())
+            parts['Profit'].append(chunk['Profit'].to_numpy())
+        pair_cluster, pair_customer, pair_product, pair_cost, pair_profit = (
+            np.concatenate(parts[column]) if parts[column] else np.empty(0, dtype=np.int32) for column in CUSTOMER_COLUMNS)
+
+        # same (cluster, customer, product) ordering as sorting the whole table by its label values
+        customers = cls.__parse_labels(list(customer_index))
+        order = np.lexsort((cls.__ranks(products)[pair_product], cls.__ranks(customers)[pair_customer],
+                            cls.__ranks(clusters)[pair_cluster]))
+        pair_customer = pair_customer[order]
+        # customer codes by order of first appearance, as factorized from the sorted table
+        _, first_pair = np.unique(pair_customer, return_index=True)
+        appearance = np.argsort(first_pair, kind='stable')
+        recode = np.empty(len(appearance), dtype=np.int32)
+        recode[appearance] = np.arange(len(appearance), dtype=np.int32)
+        return cls(
+            clusters=clusters,
+            cluster_size=cluster_df.iloc[:, 1].to_numpy(dtype=np.float64),
+            products=products,
+            product_min_offers=product_df.iloc[:, 1].to_numpy(dtype=np.float64),
+            product_cost=cls.__expected(cost_df, clusters, products, 'cost'),
+            product_profit=cls.__expected(profit_df, clusters, products, 'profit'),
+            customers=customers[appearance],
+            pair_cluster=pair_cluster[order],
+            pair_customer=recode[pair_customer],
+            pair_product=pair_product[order],
+            pair_cost=pair_cost[order],
+            pair_profit=pair_profit[order],
+        )
+
+    @staticmethod
+    def __parse_labels(labels):
+        """Customer labels read as strings, parsed as numbers when they all are, as read_csv would."""
+        try:
+            return pd.to_numeric(pd.Series(labels, dtype=object)).to_numpy(dtype=object)
+        except (ValueError, TypeError):
+            return np.asarray(labels, dtype=object)
+
+    @staticmethod
+    def __floats(values):
+        """Values as an array, in their dtype when it is floating and as float64 otherwise."""
+        values = np.asarray(values)
+        return values if np.issubdtype(values.dtype, np.floating) else values.astype(np.float64)
+
+    @staticmethod
+    def __expected(df, clusters, products, name):
+        """(K, P) matrix of the expected cost or profit, rejecting (cluster, product) pairs without a value."""
+        matrix = df.reindex(index=clusters, columns=products).to_numpy(dtype=np.float64)
+        missing = np.argwhere(np.isnan(matrix))
+        if len(missing):
+            pairs = [(clusters[k], products[j]) for k, j in missing[:5].tolist()]
+            raise ValueError(f"Product {name} data has no value for {len(missing)} (cluster, product) pairs, "
+                             f"e.g. {pairs}.")
+        return matrix
+
+    @staticmethod
+    def __ranks(labels):
+        """Position of each label in the sorted labels."""
+        ranks = np.empty(len(labels), dtype=np.int64)
+        ranks[np.argsort(labels, kind='stable')] = np.arange(len(labels))
+        return ranks
+
+    @staticmethod
+    def encode(values, labels, name):
+        """Integer codes of values into labels, rejecting values that are not in labels."""
+        codes = pd.Categorical(values, categories=labels).codes
+        if (codes < 0).any():
+            unknown = sorted(set(pd.Series(values)[codes < 0].astype(str)))[:5]
+            raise ValueError(f"Customer data refers to unknown {name} values {unknown}.")
+        return codes
+
+    @property
+    def n_pairs(self):
+        return len(self.pair_cost)
+
+    def ccp_keys(self):
+        """(cluster, customer, product) label tuples of every pair, in pair order."""
+        return list(zip(self.clusters[self.pair_cluster].tolist(),
+                        self.customers[self.pair_customer].tolist(),
+                        self.products[self.pair_product].tolist()))
+
+    def fingerprint(self):
+        """
+        Hash of the customer/product structure and of the pair costs and profits, i.e. of
+        everything an operational model is built from apart from the tactical results.
+        """
+        digest = hashlib.sha256()
+        for labels in (self.clusters, self.customers, self.products):
+            digest.update(repr(labels.tolist()).encode())
+        for array in (self.pair_cluster, self.pair_customer, self.pair_product, self.pair_cost, self.pair_profit):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def cp_keys(self):
+        """(cluster, product) label tuples in row-major order of the (K, P) matrices."""
+        return [(k, j) for k in self.clusters.tolist() for j in self.products.tolist()]
+
+    def subset(self, pairs, clusters=None):
+        """
+        Campaign data restricted to the given pair positions and, optionally, to the given
+        cluster codes. Cluster and customer codes are re-encoded for the subset.
+        """
+        pairs = np.asarray(pairs)
+        clusters = np.arange(len(self.clusters)) if clusters is None else np.asarray(clusters)
+        cluster_codes = np.full(len(self.clusters), -1, dtype=np.int64)
+        cluster_codes[clusters] = np.arange(len(clusters))
+        customer_codes, pair_customer = np.unique(self.pair_customer[pairs], return_inverse=True)
+        return CampaignData(
+            clusters=self.clusters[clusters],
+            cluster_size=self.cluster_size[clusters],
+            products=self.products,
+            product_min_offers=self.product_min_offers,
+            product_cost=self.product_cost[clusters],
+            product_profit=self.product_profit[clusters],
+            customers=self.customers[customer_codes],
+            pair_cluster=cluster_codes[self.pair_cluster[pairs]],
+            pair_customer=pair_customer,
+            pair_product=self.pair_product[pairs],
+            pair_cost=self.pair_cost[pairs],
+            pair_profit=self.pair_profit[pairs],
+        )
+
+    def group_pairs(self, by: str) -> Dict[tuple, np.ndarray]:
+        """
+        Positions of the pairs grouped by 'cluster_product' or 'cluster_customer',
+        keyed by the label tuple of the group. Pairs keep their order within a group.
+        """
+        if by == 'cluster_product':
+            codes, labels = self.pair_product, self.products
+        elif by == 'cluster_customer':
+            codes, labels = self.pair_customer, self.customers
+        else:
+            raise ValueError(f"Unknown pair grouping {by}.")
+        group_key = self.pair_cluster.astype(np.int64) * len(labels) + codes
+        order = np.argsort(group_key, kind='stable')
+        sorted_key = group_key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]]) if len(order) else []
+        group_clusters, group_codes = np.divmod(sorted_key[starts], len(labels))
+        return dict(zip(zip(self.clusters[group_clusters].tolist(), labels[group_codes].tolist()),
+                        np.split(order, starts[1:])))
@@ -0,0 +1,178 @@
+"""
+CLUSTER DECOMPOSITION CLASS
+
+The operational model only couples clusters through the budget constraint: the product
+offer quotas and the offer limits are per cluster. The budget is split across clusters
+in proportion to their tactical cost, and each cluster is solved as an independent,
+much smaller MIP in a pool of worker processes. Clusters that are infeasible with their
+share are retried with the budget left over by the others.
+
+The merged assignment is loaded into an operational MatrixModel, so that it can be
+post-processed like a monolithic solve, and is compared with the LP relaxation bound
+of the monolithic model. As the budget split is a heuristic, the merged solution is only
+reported optimal when its gap to that bound is within the configured MIP gap of the
+solver, and feasible otherwise.
+"""
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pyomo.opt import TerminationCondition, SolverResults
+from conf import Logger
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.operation_model import OperationalOptimisationModel
+from src.optimisation_model.matrix_model import MatrixModel, OperationalMatrixModel
+from src.optimisation_model.solver import ModelSolver, matrix_results, current_deadline, solve_deadline, GAP_OPTIONS
+from src.optimisation_model.solver_progress import relative_gap
+from src.optimisation_model.warm_start import GreedyWarmStart, cluster_budgets
+
+OPERATIONAL_BUILDERS = {
+    'pyomo': OperationalOptimisationModel,
+    'matrix': OperationalMatrixModel,
+}
+
+
+def _cluster_tactical_model(data, quotas, budget):
+    """Solved tactical model of a single cluster, as read by the operational model builders."""
+    model = MatrixModel('tactical')
+    model.add_param('budget', budget)
+    model.add_variables('y', len(quotas), index=data.cp_keys).values = quotas
+    model.add_variables('z', 1).values = [0.0]
+    return model
+
+
+def _solve_cluster(data, quotas, budget, warm_start, deadline=None):
+    """
+    Worker function: build and solve the operational model of one cluster, by the
+    `deadline` of the request if given, counted from when the cluster starts.
+
+    Returns:
+        termination ([str]): [termination condition of the solve, or the error message]
+        selected ([array]): [0/1 value of each offer of the cluster, None if not solved]
+    """
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    processed_data = Preprocessing(data=data)
+    tactical_model = _cluster_tactical_model(data, quotas, budget)
+    model = OPERATIONAL_BUILDERS[config['model_builder']](tactical_model, processed_data).model
+    model.name = f"operational_{data.clusters[0]}"
+    if warm_start:
+        GreedyWarmStart(tactical_model, processed_data).load(model)
+    try:
+        with solve_deadline(deadline=deadline):
+            results = ModelSolver(model, warmstart=warm_start).results
+    except Exception as e:
+        return str(e), None
+    termination = results.solver.termination_condition
+    if termination not in (TerminationCondition.optimal, TerminationCondition.maxTimeLimit):
+        return str(termination), None
+    if isinstance(model, MatrixModel):
+        selected = np.rint(model.x.values)
+    else:
+        selected = np.rint([model.x[key].value or 0.0 for key in data.ccp_keys()])
+    return str(termination), selected
+
+
+class ClusterDecomposition(object):
+    """
+    Solves the operational model cluster by cluster in parallel, from a solved tactical
+    model (Pyomo or matrix). Exposes `model` and `results` like a ModelSolver, so that
+    it can be passed on to Postprocessing in place of the operational solver.
+    """
+    TOLERANCE = 1e-9
+
+    def __init__(self, tactical_model, processed_data: Preprocessing, warmstart=False, max_workers=None):
+        self._logger = Logger().logger
+        self.tactical_model = tactical_model
+        self.processed_data = processed_data
+        self.warmstart = warmstart
+        self.max_workers = max_workers or Config.OPTIMISATION_MODELLING_CONFIG['decomposition_workers'] or os.cpu_count()
+        self.model = OperationalMatrixModel(tactical_model, processed_data).model
+        self.results = None
+        self.bound = None
+        self.gap = None
+        self.solve_time = None
+        start = time.perf_counter()
+        terminations = self.__solve()
+        self.solve_time = time.perf_counter() - start
+        self.results = self.__results(terminations)
+        self._logger.info("[Decomposition] Operational model solved over %s clusters in %.3fs with %s workers.",
+                          len(self.processed_data.data.clusters), self.solve_time, self.max_workers)
+
+    def __solve(self):
+        data = self.processed_data.data
+        n_clusters, n_products = data.product_cost.shape
+        # (cluster, product) offer quotas, as right-hand sides of the product offer rows
+        first_row, n_rows = self.model.constraints['product_offer']
+        quotas = self.model.row_lower[first_row:first_row + n_rows].reshape(n_clusters, n_products)
+        budget = self.tactical_model.budget.value + self.tactical_model.z.value
+        # shares of the leftover budget of a retry, in proportion to the tactical cost
+        tactical_cost = (quotas * data.product_cost).sum(axis=1)
+        shares = tactical_cost / tactical_cost.sum() if tactical_cost.sum() > 0 else np.full(n_clusters, 1 / n_clusters)
+        pairs = [np.flatnonzero(data.pair_cluster == k) for k in range(n_clusters)]
+        to_solve = [k for k in range(n_clusters) if quotas[k].sum() > 0]
+
+        selected = np.zeros(data.n_pairs)
+        spent = np.zeros(n_clusters)
+        terminations = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            cluster_budget = cluster_budgets(data, quotas, budget)
+            # handed to the worker processes, where a queued cluster gets the time left when it starts
+            deadline = current_deadline()
+            for attempt in ('share', 'leftover'):
+                futures = {k: pool.submit(_solve_cluster, data.subset(pairs[k], clusters=[k]), quotas[k],
+                                          cluster_budget[k], self.warmstart, deadline) for k in to_solve}
+                failed = []
+                for k, future in futures.items():
+                    terminations[k], cluster_selected = future.result()
+                    if cluster_selected is None:
+                        failed.append(k)
+                        continue
+                    selected[pairs[k]] = cluster_selected
+                    spent[k] = data.pair_cost[pairs[k]] @ cluster_selected
+                if not failed or attempt == 'leftover':
+                    break
+                # retry the failed clusters with the budget left over by the solved clusters
+                leftover = budget - spent.sum()
+                self._logger.warning("[Decomposition] Clusters %s not solved with their budget share, retrying with "
+                                     "the leftover budget %.2f.", data.clusters[failed].tolist(), leftover)
+                cluster_budget = np.zeros(n_clusters)
+                cluster_budget[failed] = leftover * shares[failed] / shares[failed].sum() \
+                    if shares[failed].sum() > 0 else leftover / len(failed)
+                to_solve = failed
+
+        if failed:
+            raise ValueError(f"Model optimisation resulted into an infeasible solution for clusters "
+                             f"{data.clusters[failed].tolist()}: {[terminations[k] for k in failed]}")
+        self.model.x.values = selected
+        self.model.load_solution(self.model.solution)
+        self.model.optimised = True
+        if Config.OPTIMISATION_MODELLING_CONFIG['decomposition_bound']:
+            self.bound = self.model.solve_relaxation()
+        if self.bound is not None:
+            self.gap = relative_gap(self.model.objective_value, self.bound)
+            self._logger.info("[Decomposition] Objective %.2f against the monolithic LP relaxation bound %.2f "
+                              "(gap %.4f%%).", self.model.objective_value, self.bound, 100 * self.gap)
+        return terminations
+
+    @staticmethod
+    def __gap_tolerance():
+        """Relative MIP gap of the configured solver, within which a solve is reported optimal."""
+        config = Config.OPTIMISATION_MODELLING_CONFIG
+        solver_type = 'highs' if config['solver_backend'] == 'persistent' else config['solver_type']
+        options = config['solver_option'].get(solver_type) or {}
+        return options.get(GAP_OPTIONS.get(solver_type), 0.0)
+
+    def __results(self, terminations) -> SolverResults:
+        if not all(t == str(TerminationCondition.optimal) for t in terminations.values()):
+            termination = TerminationCondition.maxTimeLimit
+        elif self.gap is not None and self.gap <= self.__gap_tolerance() + self.TOLERANCE:
+            termination = TerminationCondition.optimal
+        else:
+            # optimal clusters under a heuristic budget split, not proven optimal for the whole model
+            termination = TerminationCondition.feasible
+        results = matrix_results(self.model, f"decomposed_{Config.OPTIMISATION_MODELLING_CONFIG['solver_type']}",
+                                 termination, self.model.objective_value, self.bound, self.solve_time)
+        if self.gap is not None:
+            results.solver.message = f"gap {self.gap:.6f} to the monolithic LP relaxation bound"
+        return results
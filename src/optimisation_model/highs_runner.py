@@ -0,0 +1,54 @@
+"""
+HIGHS RUNNER
+
+Solves an LP or MPS problem file with HiGHS in its own process, for the HiGHS racers of
+a SolverRace. Only needs highspy, so it is run as a script rather than imported with
+the rest of the package.
+
+Usage:
+    python highs_runner.py model.lp solution.json --options options.json --start start.json
+"""
+import json
+import argparse
+import highspy
+
+STATUS = {
+    highspy.HighsModelStatus.kOptimal: 'optimal',
+    highspy.HighsModelStatus.kInfeasible: 'infeasible',
+    highspy.HighsModelStatus.kUnbounded: 'unbounded',
+    highspy.HighsModelStatus.kUnboundedOrInfeasible: 'infeasible',
+    highspy.HighsModelStatus.kTimeLimit: 'time_limit',
+}
+
+
+def solve(problem_file, options=None, start=None):
+    """Status and, if HiGHS found a feasible solution, the value of each column by name."""
+    highs = highspy.Highs()
+    for k, v in (options or {}).items():
+        highs.setOptionValue(k, v)
+    highs.readModel(problem_file)
+    names = list(highs.getLp().col_names_)
+    if start:
+        positions = {name: i for i, name in enumerate(names)}
+        start_cols = [positions[name] for name in start if name in positions]
+        highs.setSolution(len(start_cols), start_cols, [start[names[i]] for i in start_cols])
+    highs.run()
+    values = None
+    if highs.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+        values = dict(zip(names, highs.getSolution().col_value))
+    return STATUS.get(highs.getModelStatus(), 'unknown'), values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a problem file with HiGHS and write the solution as JSON.")
+    parser.add_argument('problem_file')
+    parser.add_argument('solution_file')
+    parser.add_argument('--options', help="JSON file of HiGHS options")
+    parser.add_argument('--start', help="JSON file of starting column values by name")
+    args = parser.parse_args()
+
+    options = json.load(open(args.options)) if args.options else None
+    start = json.load(open(args.start)) if args.start else None
+    status, values = solve(args.problem_file, options, start)
+    with open(args.solution_file, 'w') as file:
+        json.dump({'status': status, 'values': values}, file)
@@ -6,28 +6,48 @@ All data loading should come from this class to ensure standardised and structur
 """
 
 import pandas as pd
+from pathlib import Path
+from conf import Config
 from src.data_connectors import PandasFileConnector
+from src.optimisation_model.campaign_data import CUSTOMER_COLUMNS
 
 pd.set_option("max.columns", 20)
 pd.set_option("display.width", 2000)
 
 
 class InputHandler:
+
+    @classmethod
+    def path(cls, table):
+        """CSV file of an input table, in the configured import directory."""
+        return Path(Config.MODEL_INPUTOUTPUT['import_settings']['csv']['import_filepath'], f"{table}.csv")
     
     @classmethod
     def get_data_customers(cls):
 
         data_df = PandasFileConnector.load(
-            "data/01_raw/customer_data.csv",
+            cls.path('customer_data'),
             file_type='csv'
         )
         return data_df
 
+    @classmethod
+    def get_data_customers_chunks(cls, chunksize, dtype=None):
+        """Customer data as an iterator of dataframes of `chunksize` rows, reading only the CUSTOMER_COLUMNS."""
+        data_chunks = PandasFileConnector.load(
+            cls.path('customer_data'),
+            file_type='csv',
+            usecols=CUSTOMER_COLUMNS,
+            dtype=dtype,
+            chunksize=chunksize
+        )
+        return data_chunks
+
     @classmethod
     def get_data_cluster(cls):
 
         data_df = PandasFileConnector.load(
-            "data/01_raw/cluster_data.csv",
+            cls.path('cluster_data'),
             file_type='csv'
         )
         return data_df
@@ -36,7 +56,7 @@ class InputHandler:
     def get_data_product(cls):
 
         data_df = PandasFileConnector.load(
-            "data/01_raw/product_data.csv",
+            cls.path('product_data'),
             file_type='csv'
         )
         return data_df
@@ -45,7 +65,7 @@ class InputHandler:
     def get_data_product_cost(cls):
 
         data_df = PandasFileConnector.load(
-            "data/01_raw/product_cost.csv",
+            cls.path('product_cost'),
             file_type='csv'
         )
         return data_df
@@ -54,7 +74,7 @@ class InputHandler:
     def get_data_product_profit(cls):
 
         data_df = PandasFileConnector.load(
-            "data/01_raw/product_profit.csv",
+            cls.path('product_profit'),
             file_type='csv'
         )
         return data_df
\ No newline at end of file
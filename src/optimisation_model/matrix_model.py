@@ -0,0 +1,457 @@
+"""
+MATRIX MODEL CLASSES
+
+Alternative build path to the Pyomo models. The objective, the sparse constraint
+matrix and the bounds are assembled straight from the CampaignData arrays, without
+building any expression trees. The resulting MatrixModel can be written out as an
+MPS file or handed to an in-process solver by ModelSolver.
+
+The variable and parameter blocks mimic the Pyomo components read downstream
+(`model.y[k, j].value`, `model.expected_profit[k, j]`, `model.budget.value`, ...),
+so that a solved MatrixModel can be post-processed like a Pyomo model.
+"""
+import numpy as np
+from conf import Logger
+from src.optimisation_model.preprocessing import Preprocessing
+
+INF = np.inf
+
+
+class _Value:
+    """Single entry of a variable block, exposing `.value` like a Pyomo variable."""
+    def __init__(self, block, position):
+        self._block = block
+        self._position = position
+
+    @property
+    def value(self):
+        return self._block.value_at(self._position)
+
+    @value.setter
+    def value(self, value):
+        self._block.set_value_at(self._position, value)
+
+
+class _Block:
+    """Named, indexed block of values, looked up by index key or by position."""
+    def __init__(self, index):
+        self._index = index
+        self._positions = None
+
+    @property
+    def index(self):
+        if callable(self._index):
+            self._index = self._index()
+        return self._index
+
+    def position(self, key):
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.index)}
+        return self._positions[key]
+
+    def __iter__(self):
+        return iter(self.index)
+
+
+class VariableBlock(_Block):
+    """Columns of a MatrixModel, stored from `offset` to `offset + size`."""
+    def __init__(self, model, name, offset, size, index):
+        super().__init__(index)
+        self._model = model
+        self.name = name
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def columns(self):
+        return np.arange(self.offset, self.offset + self.size)
+
+    @property
+    def values(self):
+        return self._model.solution[self.offset:self.offset + self.size]
+
+    @values.setter
+    def values(self, values):
+        self._model.solution[self.offset:self.offset + self.size] = values
+
+    def value_at(self, position):
+        value = self._model.solution[self.offset + position]
+        return None if np.isnan(value) else float(value)
+
+    def set_value_at(self, position, value):
+        self._model.solution[self.offset + position] = np.nan if value is None else value
+
+    def __getitem__(self, key):
+        return _Value(self, self.position(key))
+
+    @property
+    def value(self):
+        return self.value_at(0)
+
+    @value.setter
+    def value(self, value):
+        self.set_value_at(0, value)
+
+
+class ParamBlock(_Block):
+    """Fixed data of a MatrixModel, exposing `[key]` and `.value` like a Pyomo parameter."""
+    def __init__(self, name, values, index=None):
+        super().__init__(index if index is not None else [None])
+        self.name = name
+        self.values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+    def __getitem__(self, key):
+        return float(self.values[self.position(key)])
+
+    @property
+    def value(self):
+        return float(self.values[0])
+
+
+class MatrixModel(object):
+    """
+    Linear model held in matrix form:
+    optimise c'x subject to row_lower <= Ax <= row_upper and col_lower <= x <= col_upper,
+    with `integrality` flagging the integer columns.
+    """
+    def __init__(self, name, sense='maximize'):
+        self.name = name
+        self.sense = sense
+        self.optimised = False
+        self.variables = {}
+        self.constraints = {}
+        self._constraint_blocks = {}
+        self._sets = {}
+        self._c, self._col_lower, self._col_upper, self._integrality = [], [], [], []
+        self._row_lower, self._row_upper = [], []
+        self._coo_rows, self._coo_cols, self._coo_vals = [], [], []
+        self.n_cols = 0
+        self.n_rows = 0
+        self._A = None
+        self.structure_version = 0  # changed with the columns, rows or coefficients, not with the bounds
+        self.solution = np.empty(0)
+        self.objective_value = None
+
+    def __getattr__(self, name):
+        # lazily materialised index sets, such as `cp` and `ccp`
+        sets = self.__dict__.get('_sets', {})
+        if name in sets:
+            if callable(sets[name]):
+                sets[name] = sets[name]()
+            return sets[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def add_set(self, name, initialize):
+        """Register an index set, given as a list or as a callable building the list on first use."""
+        self._sets[name] = initialize
+
+    def add_param(self, name, values, index=None):
+        block = ParamBlock(name, values, index)
+        setattr(self, name, block)
+        return block
+
+    def add_variables(self, name, size, lower=0.0, upper=INF, cost=0.0, integer=False, index=None):
+        """Append `size` columns and return their VariableBlock."""
+        block = VariableBlock(self, name, self.n_cols, size, index if index is not None else [None])
+        self._c.append(np.broadcast_to(np.asarray(cost, dtype=np.float64), size))
+        self._col_lower.append(np.broadcast_to(np.asarray(lower, dtype=np.float64), size))
+        self._col_upper.append(np.broadcast_to(np.asarray(upper, dtype=np.float64), size))
+        self._integrality.append(np.full(size, integer, dtype=bool))
+        self.n_cols += size
+        self.structure_version += 1
+        self.solution = np.r_[self.solution, np.full(size, np.nan)]
+        self.variables[name] = block
+        setattr(self, name, block)
+        return block
+
+    def add_constraints(self, name, n_rows, rows, cols, vals, lower=-INF, upper=INF):
+        """
+        Append `n_rows` rows given in coordinate format.
+
+        Args:
+            name ([str]): [constraint block name]
+            n_rows ([int]): [number of rows in the block]
+            rows ([array]): [row of each nonzero, local to the block]
+            cols ([array]): [column of each nonzero]
+            vals ([array]): [coefficient of each nonzero]
+            lower ([float, array]): [row lower bounds]
+            upper ([float, array]): [row upper bounds]
+        """
+        self._coo_rows.append(np.asarray(rows, dtype=np.int64) + self.n_rows)
+        self._coo_cols.append(np.asarray(cols, dtype=np.int64))
+        self._coo_vals.append(np.asarray(vals, dtype=np.float64))
+        self._row_lower.append(np.broadcast_to(np.asarray(lower, dtype=np.float64), n_rows))
+        self._row_upper.append(np.broadcast_to(np.asarray(upper, dtype=np.float64), n_rows))
+        self._constraint_blocks[name] = len(self._row_lower) - 1
+        self.constraints[name] = (self.n_rows, n_rows)
+        self.n_rows += n_rows
+        self.structure_version += 1
+        self._A = None
+
+    def update_constraints(self, name, lower=None, upper=None, vals=None):
+        """Replace the row bounds or the coefficients (same nonzero pattern) of a constraint block."""
+        block, n_rows = self._constraint_blocks[name], self.constraints[name][1]
+        if lower is not None:
+            self._row_lower[block] = np.broadcast_to(np.asarray(lower, dtype=np.float64), n_rows)
+        if upper is not None:
+            self._row_upper[block] = np.broadcast_to(np.asarray(upper, dtype=np.float64), n_rows)
+        if vals is not None:
+            self._coo_vals[block] = np.asarray(vals, dtype=np.float64)
+            self.structure_version += 1
+            self._A = None
+
+    @staticmethod
+    def _concat(arrays, dtype=np.float64):
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    @property
+    def c(self):
+        return self._concat(self._c)
+
+    @property
+    def col_lower(self):
+        return self._concat(self._col_lower)
+
+    @property
+    def col_upper(self):
+        return self._concat(self._col_upper)
+
+    @property
+    def integrality(self):
+        return self._concat(self._integrality, dtype=bool)
+
+    @property
+    def row_lower(self):
+        return self._concat(self._row_lower)
+
+    @property
+    def row_upper(self):
+        return self._concat(self._row_upper)
+
+    @property
+    def A(self):
+        """Constraint matrix in CSR format, assembled once from the coordinate blocks."""
+        if self._A is None:
+            import scipy.sparse as sp  # imported on first use, scipy is slow to import
+
+            self._A = sp.csr_matrix(
+                (self._concat(self._coo_vals),
+                 (self._concat(self._coo_rows, np.int64), self._concat(self._coo_cols, np.int64))),
+                shape=(self.n_rows, self.n_cols))
+        return self._A
+
+    @property
+    def nnz(self):
+        return self.A.nnz
+
+    def nvariables(self):
+        return self.n_cols
+
+    def nconstraints(self):
+        return self.n_rows
+
+    def load_solution(self, values, objective_value=None):
+        self.solution = np.asarray(values, dtype=np.float64).copy()
+        self.objective_value = objective_value if objective_value is not None else float(self.c @ self.solution)
+
+    def solve_relaxation(self):
+        """
+        Objective value of the LP relaxation (integrality dropped), solved with scipy's HiGHS.
+        Returns None if the relaxation has no optimal solution.
+        """
+        import scipy.sparse as sp
+        from scipy.optimize import linprog
+
+        A, row_lower, row_upper = self.A, self.row_lower, self.row_upper
+        equal = row_lower == row_upper
+        upper, lower = np.isfinite(row_upper) & ~equal, np.isfinite(row_lower) & ~equal
+        sign = -1.0 if self.sense == 'maximize' else 1.0
+        result = linprog(sign * self.c,
+                         A_ub=sp.vstack([A[upper], -A[lower]]) if (upper | lower).any() else None,
+                         b_ub=np.r_[row_upper[upper], -row_lower[lower]] if (upper | lower).any() else None,
+                         A_eq=A[equal] if equal.any() else None, b_eq=row_lower[equal] if equal.any() else None,
+                         bounds=np.c_[self.col_lower, self.col_upper], method='highs')
+        return sign * result.fun if result.status == 0 else None
+
+    def write(self, filename):
+        """
+        Write the model as a free-format MPS file. The MPS objective is always minimised,
+        so the costs of a maximisation model are negated. Numbers are written as the repr of
+        Python floats (lossless), not of NumPy scalars (e.g. `np.float64(1.0)` on NumPy 2).
+        """
+        A = self.A.tocsc()
+        c = (-self.c if self.sense == 'maximize' else self.c).tolist()
+        row_lower, row_upper = self.row_lower, self.row_upper
+        col_lower, col_upper, integrality = self.col_lower, self.col_upper, self.integrality
+
+        lines = [f"NAME {self.name}", "ROWS", " N OBJ"]
+        row_types = np.where(row_lower == row_upper, 'E', np.where(np.isinf(row_lower), 'L', 'G'))
+        lines += [f" {t} R{i}" for i, t in enumerate(row_types)]
+
+        lines.append("COLUMNS")
+        in_integer_block = False
+        for j in range(self.n_cols):
+            if integrality[j] != in_integer_block:
+                in_integer_block = integrality[j]
+                marker = 'INTORG' if in_integer_block else 'INTEND'
+                lines.append(f" MARKER 'MARKER' '{marker}'")
+            lines.append(f" C{j} OBJ {c[j]!r}")
+            start, end = A.indptr[j], A.indptr[j + 1]
+            lines += [f" C{j} R{i} {v!r}" for i, v in zip(A.indices[start:end].tolist(), A.data[start:end].tolist())]
+        if in_integer_block:
+            lines.append(" MARKER 'MARKER' 'INTEND'")
+
+        lines.append("RHS")
+        rhs = np.where(row_types == 'L', row_upper, row_lower)
+        lines += [f" RHS R{i} {v!r}" for i, v in enumerate(rhs.tolist()) if v != 0]
+        ranged = np.flatnonzero((row_types == 'G') & np.isfinite(row_upper))
+        if len(ranged):
+            lines.append("RANGES")
+            lines += [f" RNG R{i} {v!r}" for i, v in zip(ranged.tolist(), (row_upper - row_lower)[ranged].tolist())]
+
+        lines.append("BOUNDS")
+        for j, (lo, up) in enumerate(zip(col_lower.tolist(), col_upper.tolist())):
+            if np.isinf(lo) and np.isinf(up):
+                lines.append(f" FR BND C{j}")
+                continue
+            lines.append(f" MI BND C{j}" if np.isinf(lo) else f" LO BND C{j} {lo!r}")
+            if not np.isinf(up):
+                lines.append(f" UP BND C{j} {up!r}")
+            elif integrality[j]:
+                lines.append(f" PL BND C{j}")
+        lines.append("ENDATA")
+
+        with open(filename, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+
+
+class TacticalMatrixModel(object):
+    """
+    Matrix form of TacticalOptimisationModel, with the same
+    objective and constraints built from the campaign data arrays.
+    """
+    M = 10000
+
+    def __init__(self, processed_data: Preprocessing):
+        self._logger = Logger().logger
+        self.processed_data = processed_data
+        self.model = MatrixModel('tactical')
+        self.__build_model()
+
+    @property
+    def optimisation_model(self):
+        return self.model
+
+    def __build_model(self):
+        self._logger.debug("[MatrixModelBuilding] Tactical model build initiated...")
+        data = self.processed_data.data
+        model = self.model
+        n_clusters, n_products = data.product_cost.shape
+        profit, cost = data.product_profit.ravel(), data.product_cost.ravel()
+        hurdle_rate = self.processed_data.roi
+
+        model.add_set('products', data.products.tolist())
+        model.add_set('clusters', data.clusters.tolist())
+        model.add_set('cp', data.cp_keys)
+        model.add_param('number_customers', data.cluster_size, index=data.clusters.tolist())
+        model.add_param('min_offers', data.product_min_offers, index=data.products.tolist())
+        model.add_param('expected_profit', profit, index=data.cp_keys)
+        model.add_param('expected_cost', cost, index=data.cp_keys)
+        model.add_param('hurdle_rate', hurdle_rate)
+        model.add_param('budget', self.processed_data.budget)
+
+        y = model.add_variables('y', n_clusters * n_products, cost=profit, index=data.cp_keys)
+        z = model.add_variables('z', 1, cost=-self.M)
+
+        # y is laid out row-major over (cluster, product)
+        y_cluster, y_product = np.divmod(np.arange(y.size), n_products)
+        # max offers: number of offers in a cluster within its number of customers
+        model.add_constraints('max_offers', n_clusters, y_cluster, y.columns, np.ones(y.size),
+                              upper=data.cluster_size)
+        # budget: total expected cost within budget plus the correction z
+        model.add_constraints('budget_constraint', 1, np.zeros(y.size + 1), np.r_[y.columns, z.columns],
+                              np.r_[cost, -1.0], upper=self.processed_data.budget)
+        # min offers: minimum number of offers of each product
+        model.add_constraints('min_offers_constraint', n_products, y_product, y.columns, np.ones(y.size),
+                              lower=data.product_min_offers)
+        # min ROI: profit at least (1 + hurdle rate) times cost
+        model.add_constraints('min_ROI_constraint', 1, np.zeros(y.size), y.columns,
+                              profit - (1 + hurdle_rate) * cost, lower=0.0)
+        self._logger.info("[MatrixModelBuilding] Tactical model built with %s variables, %s constraints and "
+                          "%s nonzeros.", model.n_cols, model.n_rows, model.nnz)
+
+    def update_parameters(self, budget=None, hurdle_rate=None):
+        """Change the budget or the hurdle rate of the built model, for a re-solve."""
+        model = self.model
+        if budget is not None:
+            model.budget.values[:] = budget
+            model.update_constraints('budget_constraint', upper=budget)
+        if hurdle_rate is not None:
+            model.hurdle_rate.values[:] = hurdle_rate
+            model.update_constraints('min_ROI_constraint',
+                                     vals=model.expected_profit.values - (1 + hurdle_rate) * model.expected_cost.values)
+
+
+class OperationalMatrixModel(object):
+    """
+    Matrix form of OperationalOptimisationModel. The tactical model may be
+    either a solved Pyomo model or a solved tactical MatrixModel.
+    """
+    def __init__(self, tactical_model, processed_data: Preprocessing):
+        self._logger = Logger().logger
+        self.tactical_model = tactical_model
+        self.processed_data = processed_data
+        self.model = MatrixModel('operational')
+        self.__build_model()
+
+    @property
+    def optimisation_model(self):
+        return self.model
+
+    def __build_model(self):
+        self._logger.debug("[MatrixModelBuilding] Operational model build initiated...")
+        data = self.processed_data.data
+        model = self.model
+        n_pairs, n_products = data.n_pairs, len(data.products)
+        offers, new_budget = self.__tactical_rhs()
+
+        model.add_set('customers', data.customers.tolist())
+        model.add_set('products', data.products.tolist())
+        model.add_set('clusters', data.clusters.tolist())
+        model.add_set('ccp', data.ccp_keys)
+        model.add_param('customer_profit', data.pair_profit, index=data.ccp_keys)
+        model.add_param('customer_cost', data.pair_cost, index=data.ccp_keys)
+
+        x = model.add_variables('x', n_pairs, upper=1.0, cost=data.pair_profit, integer=True, index=data.ccp_keys)
+
+        # product offer: offers of a product in a cluster equal the tactical allocation
+        cluster_product_row = data.pair_cluster.astype(np.int64) * n_products + data.pair_product
+        model.add_constraints('product_offer', len(offers), cluster_product_row, x.columns, np.ones(n_pairs),
+                              lower=offers, upper=offers)
+        # offer limit: at most one product per customer of a cluster
+        cluster_customers, cluster_customer_row = np.unique(
+            data.pair_cluster.astype(np.int64) * len(data.customers) + data.pair_customer, return_inverse=True)
+        model.add_constraints('offer_limit', len(cluster_customers), cluster_customer_row, x.columns,
+                              np.ones(n_pairs), upper=1.0)
+        # budget: total cost within the budget corrected by the tactical model
+        model.add_constraints('budget_constraint', 1, np.zeros(n_pairs), x.columns, data.pair_cost,
+                              upper=new_budget)
+        self._logger.info("[MatrixModelBuilding] Operational model built with %s variables, %s constraints and "
+                          "%s nonzeros.", model.n_cols, model.n_rows, model.nnz)
+
+    def __tactical_rhs(self):
+        """Offer quotas and corrected budget, the only entries of the model taken from the tactical results."""
+        offers = np.array([self.tactical_model.y[g].value for g in self.processed_data.data.cp_keys()], dtype=np.float64)
+        return offers, self.tactical_model.budget.value + self.tactical_model.z.value
+
+    def update_tactical(self, tactical_model):
+        """Re-target the built model to other tactical results, only updating its right-hand sides."""
+        self.tactical_model = tactical_model
+        offers, new_budget = self.__tactical_rhs()
+        self.model.update_constraints('product_offer', lower=offers, upper=offers)
+        self.model.update_constraints('budget_constraint', upper=new_budget)
+        self.model.solution = np.full(self.model.n_cols, np.nan)
+        self.model.optimised = False
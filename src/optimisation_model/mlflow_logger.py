@@ -1,86 +1,168 @@
-import mlflow
-import shutil
-import inspect
-import collections
+"""
+MLFLOW LOGGER CLASS
+
+Logs the solver results and the post-processed results of an optimisation run to
+MLflow. The run is built in memory (params, metrics and CSV artifacts as text) and
+handed to a background worker thread through a bounded queue, which sends it with a
+single `log_batch` and `log_text` calls, so the optimisation never waits for MLflow.
+When the queue is full the run is dropped with a warning rather than blocking.
+
+The queued runs are flushed at exit, and explicitly at the end of each API job, as the
+worker processes of a pool exit without running the at-exit hooks.
+"""
+import time
+import queue
+import atexit
+import threading
+import collections.abc
+from conf import Logger
 from conf import Config
-from pathlib import Path
-from src.data_connectors import PandasFileConnector
 
-mlflow.set_tracking_uri(Config.MLFLOW['TRACKING_URI'])  # Setting location to save models
-mlflow.set_experiment(Config.MLFLOW['EXPERIMENT_NAME'])
+_mlflow = None
+
+# MLflow limits of a single log_batch call
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_METRICS = 1000
+
+
+def init_mlflow():
+    """Import mlflow and set its tracking URI and experiment, once per process and only when logging."""
+    global _mlflow
+    if _mlflow is None:
+        import mlflow
+        mlflow.set_tracking_uri(Config.MLFLOW['TRACKING_URI'])  # Setting location to save models
+        mlflow.set_experiment(Config.MLFLOW['EXPERIMENT_NAME'])
+        _mlflow = mlflow
+    return _mlflow
 
 
 class MLFlowLogger:
 
+    _logger = Logger().logger
+    _queue = None
+    _worker = None
+    _worker_lock = threading.Lock()
+    dropped_runs = 0
+
     @classmethod
     def log(cls, post_process_output):
+        """Log the run of the post-processed results, in the background unless MLFLOW BACKGROUND is off."""
+        run = cls.build_run(post_process_output)
+        if not Config.MLFLOW['BACKGROUND']:
+            cls.send(run)
+            return
+        try:
+            cls.__run_queue().put_nowait(run)
+        except queue.Full:
+            cls.dropped_runs += 1
+            cls._logger.warning("[MLFlowLogger] Logging queue full, run dropped (%s dropped so far).",
+                                cls.dropped_runs)
 
-        with mlflow.start_run():
-            cls.__log_opt_solver(post_process_output)
-            cls.__log_opt_model(post_process_output)
-    
     @classmethod
-    def __log_opt_solver(cls, post_process_output):
-
-        artifact_folder = Config.MLFLOW['TEMP_ARTIFACT_DIR']
-        Path(artifact_folder).mkdir(parents=True, exist_ok=True)
-
-        # Solver Results [Tactical]
-        post_process_output.operational_solver_results.results.write(
-            filename=str(Path(artifact_folder, 'solver_results.json')), format='json'
-        )
-        results_dict = PandasFileConnector.load(Path(artifact_folder, 'solver_results.json'))
+    def build_run(cls, post_process_output):
+        """Params, metrics and artifacts (path to CSV text) of a run, built in memory."""
+        # Solver Results [Operational]
+        results_dict = post_process_output.operational_solver_results.results.json_repn()
         for key, value in results_dict.items():
             results_dict[key] = value[0]
         results_dict = cls.flatten(results_dict)
-        params_results_dict = {k: v for k, v in results_dict.items() if type(v) == str and v is not None}
-        metrics_results_dict = {k: v for k, v in results_dict.items() if type(v) != str and v is not None}
+        params = {k: v for k, v in results_dict.items() if type(v) == str and v is not None}
+        metrics = {k: v for k, v in results_dict.items() if type(v) != str and v is not None}
 
         # add few model parameters
-        tactical_expected_money = post_process_output.money_df.to_dict(orient='records')
-        tactical_expected_money_dict = collections.ChainMap(*tactical_expected_money)
-        for k, v in tactical_expected_money_dict.items():
-            metrics_results_dict[k] = v
+        for money_df in (post_process_output.money_df, post_process_output.cust_money_df):
+            metrics.update(collections.ChainMap(*money_df.to_dict(orient='records')))
 
-        operational_expected_money = post_process_output.cust_money_df.to_dict(orient='records')
-        operational_expected_money_dict = collections.ChainMap(*operational_expected_money)
-        for k, v in operational_expected_money_dict.items():
-            metrics_results_dict[k] = v
+        # Post Processed Results
+        artifacts = {
+            "postprocessing/tactical_expected_money.csv": post_process_output.money_df,
+            "postprocessing/cluster_product_assignment_data.csv": post_process_output.clus_prod_selected,
+            "postprocessing/operational_expected_money.csv": post_process_output.cust_money_df,
+            "postprocessing/cluster_product_customer_assignment_data.csv": post_process_output.clus_cust_prod_selected,
+        }
+        return {
+            'params': params,
+            'metrics': {k: float(v) for k, v in metrics.items()},
+            'artifacts': {path: df.to_csv() for path, df in artifacts.items()},
+            'timestamp': int(time.time() * 1000),
+        }
 
-        # Logging to mlflow
-        mlflow.log_params(params_results_dict)
-        mlflow.log_metrics(metrics_results_dict)
+    @classmethod
+    def send(cls, run):
+        """Send a built run to MLflow: one run, batched params and metrics and the artifacts as text."""
+        init_mlflow()
+        from mlflow.entities import Metric, Param
+        from mlflow.tracking import MlflowClient
+
+        client = MlflowClient()
+        experiment = client.get_experiment_by_name(Config.MLFLOW['EXPERIMENT_NAME'])
+        run_id = client.create_run(experiment.experiment_id, start_time=run['timestamp']).info.run_id
+        try:
+            params = [Param(k, str(v)) for k, v in run['params'].items()]
+            metrics = [Metric(k, v, run['timestamp'], 0) for k, v in run['metrics'].items()]
+            # a single call unless the run exceeds the batch limits
+            n_batches = max(-(-len(params) // MAX_BATCH_PARAMS), -(-len(metrics) // MAX_BATCH_METRICS), 1)
+            for batch in range(n_batches):
+                client.log_batch(run_id, params=params[batch * MAX_BATCH_PARAMS:(batch + 1) * MAX_BATCH_PARAMS],
+                                 metrics=metrics[batch * MAX_BATCH_METRICS:(batch + 1) * MAX_BATCH_METRICS])
+            for artifact_file, text in run['artifacts'].items():
+                client.log_text(run_id, text, artifact_file)
+        except Exception:
+            client.set_terminated(run_id, status='FAILED')
+            raise
+        client.set_terminated(run_id)
+        cls._logger.info("[MLFlowLogger] Run %s logged to experiment %s.", run_id, Config.MLFLOW['EXPERIMENT_NAME'])
+        return run_id
 
     @classmethod
-    def __log_opt_model(cls, post_process_output):
+    def __run_queue(cls):
+        """Queue of the background worker, started on first use (again after a fork)."""
+        with cls._worker_lock:
+            if cls._worker is None or not cls._worker.is_alive():
+                init_mlflow()  # imported here once, not in the worker, which may still be starting at exit
+                cls._queue = queue.Queue(maxsize=Config.MLFLOW['QUEUE_SIZE'])
+                cls._worker = threading.Thread(target=cls.__work, args=(cls._queue,), name='mlflow-logger', daemon=True)
+                cls._worker.start()
+            return cls._queue
+
+    @classmethod
+    def __work(cls, run_queue):
+        while True:
+            run = run_queue.get()
+            try:
+                cls.send(run)
+            except Exception as e:
+                cls._logger.error("[MLFlowLogger] Logging run failed: %s", e)
+            finally:
+                run_queue.task_done()
+
+    @classmethod
+    def flush(cls, timeout=None):
+        """Wait for the queued runs to be sent, at most `timeout` (MLFLOW FLUSH_TIMEOUT) seconds."""
+        run_queue = cls._queue
+        if run_queue is None or cls._worker is None or not cls._worker.is_alive():
+            return True
+        deadline = time.monotonic() + (timeout if timeout is not None else Config.MLFLOW['FLUSH_TIMEOUT'])
+        with run_queue.all_tasks_done:
+            while run_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    cls._logger.warning("[MLFlowLogger] %s runs not logged before the timeout.",
+                                        run_queue.unfinished_tasks)
+                    return False
+                run_queue.all_tasks_done.wait(remaining)
+        return True
 
-        artifact_folder = Config.MLFLOW['TEMP_ARTIFACT_DIR']
-        # Post Processed Results
-        tactical_expected_money = post_process_output.money_df
-        cluster_product_assignment_data = post_process_output.clus_prod_selected
-        operational_expected_money = post_process_output.cust_money_df
-        cluster_product_customer_assignment_data = post_process_output.clus_cust_prod_selected
-
-        PandasFileConnector.save(tactical_expected_money, Path(artifact_folder, "tactical_expected_money.csv"))
-        PandasFileConnector.save(cluster_product_assignment_data, 
-                                Path(artifact_folder, "cluster_product_assignment_data.csv"))
-        PandasFileConnector.save(operational_expected_money, Path(artifact_folder, "operational_expected_money.csv"))
-        PandasFileConnector.save(cluster_product_customer_assignment_data, Path(artifact_folder, "cluster_product_customer_assignment_data.csv"))
-
-        # Logging to mlflow
-        mlflow.log_artifacts(artifact_folder, artifact_path='postprocessing')
-
-        shutil.rmtree(artifact_folder)  # Deleting temp folder
-    
     @classmethod
     def flatten(cls, d, parent_key='', sep='_'):
         items = []
         for k, v in d.items():
             new_key = parent_key + sep + k if parent_key else k #https://www.programcreek.com/python/example/3372/collections.MutableMapping
-            if isinstance(v, collections.MutableMapping):
+            if isinstance(v, collections.abc.MutableMapping):
                 items.extend(cls.flatten(v, new_key, sep=sep).items())
             else:
                 items.append((new_key, v))
         return dict(items)
 
 
+atexit.register(MLFlowLogger.flush)  # once per process; a no-op until the worker has started
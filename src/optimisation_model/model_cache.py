@@ -0,0 +1,56 @@
+"""
+OPERATIONAL MODEL CACHE
+
+The tactical results only enter the operational model through the right-hand sides of
+its product offer rows (the y[k, j] quotas) and of its budget row (budget + z), which
+the operational builders hold as mutable parameters. Built operational models are kept
+per process, keyed by the builder and by the fingerprint of the campaign data, so that
+a re-run on the same customers and products (a sweep point, a re-submitted campaign
+with another budget) only updates those parameters before the re-solve. With the
+persistent solver backend, the solver then only receives the changed bounds.
+
+With the operational presolve, models are built from the offers the tactical results
+leave selectable, so a model is re-targeted when new tactical results give zero quotas
+to the same (cluster, product) pairs, and built otherwise.
+"""
+import threading
+from collections import OrderedDict
+from conf import Logger
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+
+
+class OperationalModelCache(object):
+    """Least recently used built operational models, by (builder, campaign data fingerprint)."""
+    _models = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, OperationalModel, tactical_model, processed_data: Preprocessing):
+        """
+        Operational model builder instance for the solved tactical model, re-targeted from
+        the cache when the campaign data was seen before, built (and cached) otherwise.
+        """
+        max_entries = Config.OPTIMISATION_MODELLING_CONFIG['operational_model_cache']
+        if not max_entries:
+            return OperationalModel(tactical_model, processed_data)
+        logger = Logger().logger
+        key = (OperationalModel.__name__, processed_data.data.fingerprint())
+        with cls._lock:
+            operation_model = cls._models.pop(key, None)
+        if operation_model is not None:
+            operation_model.update_tactical(tactical_model)
+            logger.info("[ModelCache] Operational model %s re-targeted to the new tactical results.", key[1][:12])
+        else:
+            operation_model = OperationalModel(tactical_model, processed_data)
+            logger.info("[ModelCache] Operational model %s built and cached.", key[1][:12])
+        with cls._lock:
+            cls._models[key] = operation_model
+            while len(cls._models) > max_entries:
+                cls._models.popitem(last=False)
+        return operation_model
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._models.clear()
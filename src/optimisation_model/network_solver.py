@@ -0,0 +1,173 @@
+"""
+NETWORK ASSIGNMENT SOLVER CLASS
+
+Without its budget row, the operational model is a transportation problem: in each
+cluster the product offer quotas are supplies, customers take at most one offer, and
+its constraint matrix is totally unimodular. Its LP relaxation therefore has integral
+vertex solutions, which a simplex method finds without any branching.
+
+The budget row is handled by Lagrangian relaxation: for a cost multiplier lambda the
+offers are assigned on profit - lambda * cost, and lambda is bisected until the
+assignment fits the budget. Every multiplier gives an upper bound L(lambda) on the
+operational optimum, and every assignment within budget a feasible solution, so the
+optimality gap of the result is known.
+
+Once the budget is relaxed, the clusters no longer share any row, so each cluster is
+its own transportation LP. Each is loaded once into an in-process HiGHS instance, and
+a new multiplier only changes the column costs: the simplex restarts from the optimal
+basis of the previous multiplier, which is still primal feasible.
+"""
+import time
+import numpy as np
+from pyomo.opt import TerminationCondition
+from conf import Logger
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import OperationalMatrixModel
+from src.optimisation_model.solver import matrix_results
+
+
+class NetworkAssignmentSolver(object):
+    """
+    Solves the operational model from a solved tactical model (Pyomo or matrix).
+    Exposes `model` and `results` like a ModelSolver, so that it can be passed on
+    to Postprocessing in place of the operational solver.
+    """
+    def __init__(self, tactical_model, processed_data: Preprocessing, gap=None, max_iterations=None):
+        self._logger = Logger().logger
+        options = Config.OPTIMISATION_MODELLING_CONFIG['solver_option']['network']
+        self.gap_tolerance = gap if gap is not None else options['gap']
+        self.max_iterations = max_iterations or options['max_iterations']
+        self.processed_data = processed_data
+        self.model = OperationalMatrixModel(tactical_model, processed_data).model
+        self.results = None
+        self.bound = None
+        self.gap = None
+        self.multiplier = None
+        self.iterations = 0
+        self.solve_time = None
+        start = time.perf_counter()
+        termination = self.__solve()
+        self.solve_time = time.perf_counter() - start
+        self.results = matrix_results(self.model, 'network', termination, self.model.objective_value,
+                                      self.bound, self.solve_time)
+        if termination == TerminationCondition.infeasible:
+            raise ValueError("Model optimisation resulted into an infeasible solution")
+        self.model.optimised = True
+        self._logger.info("[NetworkSolver] Objective %.2f with bound %.2f (gap %.4f%%) after %s assignments in %.3fs.",
+                          self.model.objective_value, self.bound, 100 * self.gap, self.iterations, self.solve_time)
+
+    def __solve(self):
+        model = self.model
+        profit, cost = model.customer_profit.values, model.customer_cost.values
+        first_row, n_rows = model.constraints['product_offer']
+        quotas = model.row_lower[first_row:first_row + n_rows]
+        if not np.allclose(quotas, np.rint(quotas)):
+            self._logger.warning("[NetworkSolver] Tactical offer counts are not integral and are rounded.")
+        self.__clusters = self.__cluster_lps(np.rint(quotas))
+        budget = model.row_upper[model.constraints['budget_constraint'][0]]
+
+        best_profit, best_x = -np.inf, None
+        bound = np.inf
+
+        def evaluate(multiplier):
+            nonlocal best_profit, best_x, bound
+            x = self.__assign(profit - multiplier * cost)
+            self.iterations += 1
+            if x is None:
+                return None
+            x_profit, x_cost = float(profit @ x), float(cost @ x)
+            bound = min(bound, x_profit - multiplier * (x_cost - budget))
+            if x_cost <= budget + 1e-6 and x_profit > best_profit:
+                best_profit, best_x = x_profit, x
+            return x_cost
+
+        x_cost = evaluate(0.0)
+        if x_cost is None:
+            return TerminationCondition.infeasible
+        low, high = 0.0, None
+        if x_cost > budget + 1e-6:
+            # smallest multiplier found to fit the budget, starting from the highest profit/cost ratio
+            high = float(np.max(profit / np.maximum(cost, 1e-9), initial=1.0))
+            while evaluate(high) > budget + 1e-6:
+                low, high = high, 2 * high
+                if self.iterations >= self.max_iterations:
+                    break
+        while best_x is not None and (bound - best_profit) > self.gap_tolerance * max(abs(bound), 1e-9) \
+                and self.iterations < self.max_iterations and high - low > 1e-9 * high:
+            multiplier = (low + high) / 2
+            if evaluate(multiplier) > budget + 1e-6:
+                low = multiplier
+            else:
+                high = multiplier
+
+        if best_x is None:
+            return TerminationCondition.infeasible
+        self.multiplier = high if high is not None else 0.0
+        model.x.values = best_x
+        model.load_solution(model.solution)
+        self.bound = bound
+        self.gap = (bound - best_profit) / max(abs(bound), 1e-9)
+        if self.gap <= self.gap_tolerance:
+            return TerminationCondition.optimal
+        # otherwise stopped by the iteration limit, or by a duality gap of the Lagrangian relaxation
+        return TerminationCondition.maxIterations if self.iterations >= self.max_iterations else TerminationCondition.feasible
+
+    def __cluster_lps(self, quotas):
+        """
+        Transportation LP of each cluster with offers to make, as (pairs of the cluster, HiGHS
+        instance): its product offer rows (quotas) and offer limit rows over its offers.
+        """
+        try:
+            import highspy
+        except ImportError as e:
+            raise ImportError("The network engine requires the highspy package.") from e
+        import scipy.sparse as sp  # imported on first use, scipy is slow to import
+
+        data = self.processed_data.data
+        n_clusters, n_products = data.product_cost.shape
+        quotas = quotas.reshape(n_clusters, n_products)
+        order = np.argsort(data.pair_cluster, kind='stable')
+        bounds = np.searchsorted(data.pair_cluster[order], np.arange(n_clusters + 1))
+        clusters = []
+        for k in np.flatnonzero(quotas.sum(axis=1) > 0):
+            pairs = order[bounds[k]:bounds[k + 1]]
+            customers, customer_row = np.unique(data.pair_customer[pairs], return_inverse=True)
+            n_cols, n_rows = len(pairs), n_products + len(customers)
+            rows = np.concatenate([data.pair_product[pairs], n_products + customer_row])
+            A = sp.csc_matrix((np.ones(2 * n_cols), (rows, np.tile(np.arange(n_cols), 2))), shape=(n_rows, n_cols))
+            lp = highspy.HighsLp()
+            lp.num_col_, lp.num_row_ = n_cols, n_rows
+            lp.col_cost_ = np.zeros(n_cols)
+            lp.col_lower_, lp.col_upper_ = np.zeros(n_cols), np.ones(n_cols)
+            lp.row_lower_ = np.concatenate([quotas[k], np.full(len(customers), -highspy.kHighsInf)])
+            lp.row_upper_ = np.concatenate([quotas[k], np.ones(len(customers))])
+            lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+            lp.a_matrix_.num_col_, lp.a_matrix_.num_row_ = n_cols, n_rows
+            lp.a_matrix_.start_, lp.a_matrix_.index_, lp.a_matrix_.value_ = A.indptr, A.indices, A.data
+            lp.sense_ = highspy.ObjSense.kMaximize
+            highs = highspy.Highs()
+            highs.setOptionValue('output_flag', False)
+            highs.setOptionValue('solver', 'simplex')
+            highs.passModel(lp)
+            clusters.append((pairs, highs))
+        return clusters
+
+    def __assign(self, weight):
+        """
+        Assignment maximising `weight` under the offer quotas and offer limits, as a vertex of
+        the transportation LP of each cluster found by the simplex. None if a quota cannot be met.
+        """
+        import highspy
+
+        x = np.zeros(self.model.n_cols)
+        for pairs, highs in self.__clusters:
+            highs.changeColsCost(len(pairs), np.arange(len(pairs), dtype=np.int32), weight[pairs])
+            highs.run()
+            if highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+                return None
+            x[pairs] = highs.getSolution().col_value
+        assignment = np.rint(x)
+        if not np.allclose(assignment, x, atol=1e-6):
+            self._logger.warning("[NetworkSolver] Assignment LP returned a fractional vertex, values are rounded.")
+        return assignment
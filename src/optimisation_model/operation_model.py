@@ -1,6 +1,5 @@
 import pyomo.environ as pyo
 from conf import Logger
-from itertools import product
 from src.optimisation_model.preprocessing import Preprocessing
 
 
@@ -13,22 +12,28 @@ class OperationalOptimisationModel(object):
         self._logger = Logger().logger
         self.tactical_model = tactical_model
         self.processed_data = processed_data
-        self.model = pyo.ConcreteModel()
+        self.model = pyo.ConcreteModel(name='operational')
         self.model.optimised = False
         self.__build_model()
         
     def __build_model(self):
         self._logger.debug("[ModelBuilding] Defining model indicies and sets initiated...")
-        self.model.customers = pyo.Set(initialize=[c.name for c in self.processed_data.customer_list])
-        self.model.products = pyo.Set(initialize=[p.product_type for p in self.processed_data.product_list])
-        self.model.clusters = pyo.Set(initialize=[k.cluster for k in self.processed_data.cluster_list])
-        self.model.ccp = pyo.Set(initialize=[c.customer_cluster_product_list for c in self.processed_data.customer_list])        
+        data = self.processed_data.data
+        self._ccp_keys = data.ccp_keys()
+        self.model.customers = pyo.Set(initialize=data.customers.tolist())
+        self.model.products = pyo.Set(initialize=data.products.tolist())
+        self.model.clusters = pyo.Set(initialize=data.clusters.tolist())
+        self.model.ccp = pyo.Set(initialize=self._ccp_keys)
 
         self._logger.info("[ModelBuilding] Defining model indicies and sets completed successfully.")
 
         self._logger.debug("[ModelBuilding] Defining model parameters initiated...")
-        self.model.customer_profit = pyo.Param(self.model.ccp, initialize={cp: self.processed_data.customer_profit[cp] for cp in self.model.ccp}, domain=pyo.Any)
-        self.model.customer_cost = pyo.Param(self.model.ccp, initialize={cp: self.processed_data.customer_cost[cp] for cp in self.model.ccp}, domain=pyo.Any)
+        self.model.customer_profit = pyo.Param(self.model.ccp, initialize=dict(zip(self._ccp_keys, data.pair_profit.tolist())), domain=pyo.Any)
+        self.model.customer_cost = pyo.Param(self.model.ccp, initialize=dict(zip(self._ccp_keys, data.pair_cost.tolist())), domain=pyo.Any)
+        # tactical results, mutable so that the built model can be re-solved for other tactical results
+        self.model.cp = pyo.Set(initialize=data.cp_keys())
+        self.model.offer_quota = pyo.Param(self.model.cp, initialize=self.__offer_quotas(), mutable=True)
+        self.model.budget = pyo.Param(initialize=self.__budget(), mutable=True)
         self._logger.info("[ModelBuilding] Defining model parameters completed successfully.")
 
         # define decision variables
@@ -44,8 +49,18 @@ class OperationalOptimisationModel(object):
         # set Constraints
         self.__add_constraints()
         
+    def __group_ccp(self):
+        """
+        Group the (cluster, customer, product) index once by (cluster, product)
+        and by (cluster, customer), so that each constraint only visits its own terms.
+        """
+        data = self.processed_data.data
+        self._ccp_by_cluster_product = data.group_pairs('cluster_product')
+        self._ccp_by_cluster_customer = data.group_pairs('cluster_customer')
+
     def __add_constraints(self):
         self._logger.info("[ModelBuilding] Defining model constraint function initiated...")
+        self.__group_ccp()
         # product offer constraint
         self.model.product_offer = pyo.ConstraintList()
         self._product_offer()
@@ -70,25 +85,45 @@ class OperationalOptimisationModel(object):
         Allocate offers of a product to customers of each cluster.
 
         """
-        for k in self.model.clusters:
-            for j in self.model.products:
-                exp = pyo.quicksum(self.model.x[cluster, customer, product] for cluster, customer, product in self.model.ccp if (cluster==k and product==j))
-                self.model.product_offer.add(exp == self.tactical_model.y[k, j].value)
+        for (k, j), ccp_group in self._ccp_by_cluster_product.items():
+            exp = pyo.quicksum(self.model.x[self._ccp_keys[i]] for i in ccp_group)
+            self.model.product_offer.add(exp == self.model.offer_quota[k, j])
 
     def _offer_limit(self):
         """
         At most one product may be offered to a customer of a cluster.
         """
-        cluster_customer = []
-        for grp in self.processed_data.customer_list:
-            cluster_customer.append(grp.customer_cluster_list)
-        for clust, cust in set(cluster_customer):
-            exp = pyo.quicksum(self.model.x[cluster, customer, product] for cluster, customer, product in self.model.ccp if (cluster==clust and customer==cust))
+        for ccp_group in self._ccp_by_cluster_customer.values():
+            exp = pyo.quicksum(self.model.x[self._ccp_keys[i]] for i in ccp_group)
             self.model.offer_limit.add(exp<= 1)
 
     def _budget_constraint(self):
         """Enforce budget constraint."""
-        new_budget = self.tactical_model.budget + self.tactical_model.z.value
         exp = pyo.quicksum(self.model.x[cp]*self.model.customer_cost[cp] for cp in self.model.ccp) 
-        self.model.budget_constraint.add(exp<=new_budget)
+        self.model.budget_constraint.add(exp<=self.model.budget)
+
+    def __offer_quotas(self):
+        """
+        Number of offers of each (cluster, product) in the tactical results. A product
+        without any customer in a cluster can only be given a zero quota.
+        """
+        quotas = {g: self.tactical_model.y[g].value for g in self.processed_data.data.cp_keys()}
+        groups = self.processed_data.data.group_pairs('cluster_product')
+        unserved = [g for g, quota in quotas.items() if g not in groups and abs(quota) > 1e-6]
+        if unserved:
+            raise ValueError(f"Model optimisation resulted into an infeasible solution: offers allocated "
+                             f"to (cluster, product) pairs without customers {unserved[:5]}")
+        return quotas
+
+    def __budget(self):
+        """Campaign budget corrected by the tactical model."""
+        return self.tactical_model.budget.value + self.tactical_model.z.value
+
+    def update_tactical(self, tactical_model):
+        """Re-target the built model to other tactical results, only updating its mutable parameters."""
+        self.tactical_model = tactical_model
+        for g, quota in self.__offer_quotas().items():
+            self.model.offer_quota[g] = quota
+        self.model.budget = self.__budget()
+        self.model.optimised = False
 
@@ -1,11 +1,24 @@
+import logging
 from conf import Logger
 from conf import Config
+import numpy as np
 import pandas as pd
 from src.data_connectors import PandasFileConnector
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.solver import solve_status, OPTIMAL, TIME_LIMITED
+from src.optimisation_model.solver_progress import relative_gap
 from pathlib import Path
 
 
 class Postprocessing(object):
+    """
+    Collects the tactical and operational solutions into dataframes and JSON results.
+    Variable values are extracted in bulk and the frames are built in one go, the
+    console report is a summary bounded by MAX_REPORT_ROWS. The results hold the status
+    of the solves, 'time_limited' when a solve stopped at its time limit and the
+    solutions are its best incumbent, with its bound and gap.
+    """
+    MAX_REPORT_ROWS = 20
      
     def __init__(self, tactical_solver_results, operational_solver_results, tactical_model, operational_model, export=False):
         self._logger = Logger().logger
@@ -16,42 +29,100 @@ class Postprocessing(object):
         self._result_list = []
         self.money_df, self.clus_prod_selected = self.__product_allocation()
         self.cust_money_df, self.clus_cust_prod_selected = self.__offer_allocation()
+        self.solve_status = self.__solve_status()
+        statuses = [solve['status'] for solve in self.solve_status.values()]
+        self.status = TIME_LIMITED if TIME_LIMITED in statuses else \
+            next((status for status in statuses if status != OPTIMAL), OPTIMAL)
 
         # Converting results into a JSON format
         self.compiled_json_results = {
+            "status": self.status,
+            "solve_status": self.solve_status,
             "tactical_expected_money": self.money_df.to_dict(orient='records'),
             "cluster_product_assignment_data": self.clus_prod_selected.to_dict(orient='records'),
             "operational_expected_money": self.cust_money_df.to_dict(orient='records'),
             "cluster_product_customer_assignment_data": self.clus_cust_prod_selected.to_dict(orient='records'),
         }
 
-        # Converting results into a JSON format
         if export:
-            self._logger.debug("[Data Export to CSV] initiated...")
-            PandasFileConnector.save(self.money_df, Path(Config.MODEL_INPUTOUTPUT['export_settings'].get('csv')['export_filepath'], "Tactical_Expected_Money.csv"))
-            PandasFileConnector.save(self.clus_prod_selected, Path(Config.MODEL_INPUTOUTPUT['export_settings'].get('csv')['export_filepath'], "Cluster_Product_Assignment_data.csv"))
-            PandasFileConnector.save(self.cust_money_df, Path(Config.MODEL_INPUTOUTPUT['export_settings'].get('csv')['export_filepath'], "Operational_Expected_Money.csv"))
-            PandasFileConnector.save(self.clus_cust_prod_selected, Path(Config.MODEL_INPUTOUTPUT['export_settings'].get('csv')['export_filepath'], "Cluster_Product_Customer_Assignment_Data.csv"))
-    
+            self.export()
+
+    def export(self):
+        """Save the result frames as CSV files in the configured export directory."""
+        self._logger.debug("[Data Export to CSV] initiated...")
+        export_filepath = Config.MODEL_INPUTOUTPUT['export_settings'].get('csv')['export_filepath']
+        PandasFileConnector.save(self.money_df, Path(export_filepath, "Tactical_Expected_Money.csv"))
+        PandasFileConnector.save(self.clus_prod_selected, Path(export_filepath, "Cluster_Product_Assignment_data.csv"))
+        PandasFileConnector.save(self.cust_money_df, Path(export_filepath, "Operational_Expected_Money.csv"))
+        PandasFileConnector.save(self.clus_cust_prod_selected, Path(export_filepath, "Cluster_Product_Customer_Assignment_Data.csv"))
+
+    @staticmethod
+    def _values(model, name, keys):
+        """Values of a variable or parameter of a Pyomo model or MatrixModel, in bulk and in `keys` order."""
+        component = getattr(model, name)
+        if isinstance(model, MatrixModel):
+            return np.asarray(component.values, dtype=np.float64)
+        values = component.extract_values()
+        return np.array([values[key] for key in keys], dtype=np.float64)
+
+    @staticmethod
+    def _money(values):
+        return pd.Series(values).map('{:,.2f}'.format).to_numpy()
+
+    def __solve_status(self):
+        """Status, objective value, best bound and gap of the tactical and operational solves."""
+        solves = {}
+        for stage, solver in (('tactical', self.tactical_solver_results), ('operational', self.operational_solver_results)):
+            status = solve_status(solver.model, solver.results)
+            if getattr(solver, 'bound', None) is not None:
+                # e.g. a bound from the solver progress, or the relaxation bound of a decomposition
+                status.update(bound=solver.bound, gap=relative_gap(status['objective_value'], solver.bound))
+            if status['status'] == TIME_LIMITED:
+                if status['gap'] is not None:
+                    self._logger.warning("[PostProcessing] The %s solve stopped at its time limit, its results are "
+                                         "those of its best incumbent, %.4f%% from the bound.", stage, 100 * status['gap'])
+                else:
+                    self._logger.warning("[PostProcessing] The %s solve stopped at its time limit, its results are "
+                                         "those of its best incumbent.", stage)
+            solves[stage] = {
+                'status': status['status'],
+                'objective_value': round(status['objective_value'], 2) if status['objective_value'] is not None else None,
+                'bound': round(status['bound'], 2) if status['bound'] is not None else None,
+                'gap': round(status['gap'], 6) if status['gap'] is not None else None,
+            }
+        return solves
+
     def __product_allocation(self):
         self._logger.debug("[PostProcessing] Optimal Products' allocation detail is as such...")
-        total_expected_profit = 0
-        total_expected_cost = 0
-        clus_prod_selected = pd.DataFrame()
-        money_df = pd.DataFrame()
-        for cluster, product in self.tactical_model.cp:
-            append_row = pd.DataFrame({
-                'Cluster': cluster,
-                'Product': product,
-                'Count': self.tactical_model.y[cluster, product].value if (self.tactical_model.y[cluster, product].value)> 1e-6 else 0,
-                'Profit (RM)': '{:,.2f}'.format(self.tactical_model.expected_profit[cluster, product]*self.tactical_model.y[cluster, product].value if (self.tactical_model.y[cluster, product].value)> 1e-6 else 0),
-                'Cost (RM)': '{:,.2f}'.format(self.tactical_model.expected_cost[cluster, product]*self.tactical_model.y[cluster, product].value if (self.tactical_model.y[cluster, product].value)> 1e-6 else 0),
-            }, index=[0])
-            clus_prod_selected = pd.concat([clus_prod_selected, append_row], axis=0)
-
-            self._logger.info(f'[ProductAllocation] The number of customers in cluster {cluster} that gets an offer of product {product} is {self.tactical_model.y[cluster, product].value}')
-            total_expected_profit += self.tactical_model.expected_profit[cluster, product]*self.tactical_model.y[cluster, product].value
-            total_expected_cost +=self.tactical_model.expected_cost[cluster, product]*self.tactical_model.y[cluster, product].value
+        keys = list(self.tactical_model.cp)
+        y = self._values(self.tactical_model, 'y', keys)
+        expected_profit = self._values(self.tactical_model, 'expected_profit', keys)
+        expected_cost = self._values(self.tactical_model, 'expected_cost', keys)
+        count = np.where(y > 1e-6, y, 0)
+        clus_prod_selected = pd.DataFrame({
+            'Cluster': [cluster for cluster, _ in keys],
+            'Product': [product for _, product in keys],
+            'Count': count,
+            'Profit (RM)': self._money(np.where(y > 1e-6, expected_profit * y, 0)),
+            'Cost (RM)': self._money(np.where(y > 1e-6, expected_cost * y, 0)),
+        }, index=np.zeros(len(keys), dtype=np.int64))
+
+        # aggregated allocation log: a summary and the first allocations, every pair only when debugging
+        allocated = np.flatnonzero(y > 1e-6)
+        self._logger.info('[ProductAllocation] %d of %d (cluster, product) pairs get %d offers in total.',
+                          len(allocated), len(keys), round(count.sum()))
+        for i in allocated[:self.MAX_REPORT_ROWS]:
+            self._logger.info('[ProductAllocation] The number of customers in cluster %s that gets an offer of product %s is %s',
+                              keys[i][0], keys[i][1], y[i])
+        if len(allocated) > self.MAX_REPORT_ROWS:
+            self._logger.info('[ProductAllocation] ... and %d more allocations, see the assignment data',
+                              len(allocated) - self.MAX_REPORT_ROWS)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            for (cluster, product), value in zip(keys, y.tolist()):
+                self._logger.debug('[ProductAllocation] The number of customers in cluster %s that gets an offer of product %s is %s',
+                                   cluster, product, value)
+        total_expected_profit = float(expected_profit @ y)
+        total_expected_cost = float(expected_cost @ y)
         self.increased_budget = '${:,.2f}'.format(self.tactical_model.z.value)
         self._logger.info(f'[ProductAllocation] The increase correction in campaign budget is {self.increased_budget}')
         self.optimal_ROI = round(100*total_expected_profit/total_expected_cost,2)
@@ -66,55 +137,51 @@ class Postprocessing(object):
         print(f"Optimal total expected profit is {money_expected_profit}.")
         print(f"Optimal total expected cost is {money_expected_cost} with a budget of {self.money_budget} and an extra amount of {self.increased_budget}.")
         print(f"Optimal ROI is {self.optimal_ROI}% with a minimum ROI of  {self.min_ROI}%.")
-        money_df = money_df.append({'money_expected_profit': round(total_expected_profit, 2), 
-                                  'money_expected_cost': round(total_expected_cost, 2), 
+        money_df = pd.DataFrame([{'money_expected_profit': round(total_expected_profit, 2),
+                                  'money_expected_cost': round(total_expected_cost, 2),
                                   'money_budget': round(self.tactical_model.budget.value, 2),
                                   'increased_budget': round(self.tactical_model.z.value, 2),
                                   'optimal_ROI': self.optimal_ROI,
-                                  'min_ROI': self.min_ROI}, ignore_index=True)
+                                  'min_ROI': self.min_ROI}], dtype=np.float64)
         return money_df, clus_prod_selected
 
     def __offer_allocation(self):
         self._logger.debug("[PostProcessing] Optimal assignment of product offers to customers is as such...")
-        total_customer_profit = 0
-        total_customer_cost = 0
-        kvalue = None
-        first = True
-        num_assignments = 0
-        clus_cust_prod_selected = pd.DataFrame()
-        cust_money_df = pd.DataFrame()
+        keys = list(self.operational_model.ccp)
+        x = self._values(self.operational_model, 'x', keys)
+        customer_profit = self._values(self.operational_model, 'customer_profit', keys)
+        customer_cost = self._values(self.operational_model, 'customer_cost', keys)
+        # offers reported in (cluster, customer, product) order
+        offers = pd.DataFrame(keys, columns=['Cluster', 'Customer', 'Product'])
+        order = offers.sort_values(['Cluster', 'Customer', 'Product']).index.to_numpy()
+        offers = offers.iloc[order].reset_index(drop=True)
+        x, customer_profit, customer_cost = x[order], customer_profit[order], customer_cost[order]
+        selected = x > 0.5
+
+        offers['Selected'] = selected.astype(np.int64)
+        offers['Profit (RM)'] = self._money(np.where(selected, customer_profit, 0))
+        offers['Cost (RM)'] = self._money(np.where(selected, customer_cost, 0))
+        offers.index = np.zeros(len(offers), dtype=np.int64)
+        clus_cust_prod_selected = offers
+        total_customer_profit = float(customer_profit[selected] @ x[selected])
+        total_customer_cost = float(customer_cost[selected] @ x[selected])
+
+        # bounded console summary: assignments by cluster and the first selected offers
+        assignments = offers.loc[selected].groupby('Cluster', sort=True).size()
         print("\nOptimal assignment of product offers to customers.")
         print("___________________________________________________")
-        for cluster, customer, product in sorted(self.operational_model.ccp):
-            append_row = pd.DataFrame({
-                'Cluster': cluster,
-                'Customer': customer,
-                'Product': product,
-                'Selected': 1 if self.operational_model.x[cluster, customer, product].value > 0.5 else 0,
-                'Profit (RM)': '{:,.2f}'.format(self.operational_model.customer_profit[cluster, customer, product] if self.operational_model.x[cluster, customer, product].value > 0.5 else 0),
-                'Cost (RM)': '{:,.2f}'.format(self.operational_model.customer_cost[cluster, customer, product] if self.operational_model.x[cluster, customer, product].value > 0.5 else 0),
-            }, index=[0])
-            clus_cust_prod_selected = pd.concat([clus_cust_prod_selected, append_row], axis=0)
-            if cluster != kvalue:
-                prevk = kvalue
-                kvalue = cluster
-                if not first:
-                    print("___________________________________________________")
-                    print(f"Number of assignments in cluster {prevk} is {num_assignments}")
-                    print("___________________________________________________")
-                    num_assignments = 0
-                if first:
-                    first = False
-            if self.operational_model.x[cluster, customer, product].value > 0.5:
-                profit = '${:,.2f}'.format(self.operational_model.customer_profit[cluster, customer, product])
-                cost = '${:,.2f}'.format(self.operational_model.customer_cost[cluster, customer, product])
-                print(f"Customer {customer} in cluster {cluster} gets an offer of product {product}:")
-                print(f"The expected profit is {profit} at a cost of {cost}")
-                total_customer_profit += self.operational_model.customer_profit[cluster, customer, product]*self.operational_model.x[cluster, customer, product].value
-                total_customer_cost += self.operational_model.customer_cost[cluster, customer, product]*self.operational_model.x[cluster, customer, product].value
-                num_assignments += 1
+        for cluster, num_assignments in assignments.head(self.MAX_REPORT_ROWS).items():
+            print(f"Number of assignments in cluster {cluster} is {num_assignments}")
+        if len(assignments) > self.MAX_REPORT_ROWS:
+            print(f"... and {len(assignments) - self.MAX_REPORT_ROWS} more clusters")
+        print(f"Total number of assignments is {int(selected.sum())}")
         print("___________________________________________________")
-        print(f"Number of assignments in cluster {kvalue} is {num_assignments}")
+        for cluster, customer, product, profit, cost in zip(*(offers.loc[selected, column].head(self.MAX_REPORT_ROWS) for column in
+                                                              ['Cluster', 'Customer', 'Product', 'Profit (RM)', 'Cost (RM)'])):
+            print(f"Customer {customer} in cluster {cluster} gets an offer of product {product}: "
+                  f"expected profit ${profit} at a cost of ${cost}")
+        if selected.sum() > self.MAX_REPORT_ROWS:
+            print(f"... and {int(selected.sum()) - self.MAX_REPORT_ROWS} more offers, see the assignment data")
         print("___________________________________________________\n")
 
         # Financial reports
@@ -127,7 +194,7 @@ class Postprocessing(object):
         print(f"Optimal total customers profit is {money_customers_profit}.")
         print(f"Optimal total customers cost is {money_customers_cost} with a budget of {self.money_budget} and an extra amount of {self.increased_budget}.")
         print(f"Optimal ROI is {customers_ROI}% with a minimum ROI of  {self.min_ROI}%.")
-        cust_money_df = cust_money_df.append({'customer_expected_profit': round(total_customer_profit, 2), 
-                                  'customer_expected_cost': round(total_customer_cost, 2), 
-                                  'customer_optimal_ROI': customers_ROI}, ignore_index=True)
-        return cust_money_df, clus_cust_prod_selected
\ No newline at end of file
+        cust_money_df = pd.DataFrame([{'customer_expected_profit': round(total_customer_profit, 2),
+                                       'customer_expected_cost': round(total_customer_cost, 2),
+                                       'customer_optimal_ROI': customers_ROI}], dtype=np.float64)
+        return cust_money_df, clus_cust_prod_selected
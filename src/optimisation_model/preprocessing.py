@@ -1,8 +1,11 @@
 from conf import Logger
 from conf import Config
 from typing import List, Dict
+from functools import cached_property
 from src.optimisation_model.input_handler import InputHandler
-import collections
+from src.optimisation_model.campaign_data import CampaignData, CUSTOMER_COLUMNS
+from src.optimisation_model.preprocessing_cache import PreprocessingCache
+import pandas as pd
 
 
 class Cluster:
@@ -37,151 +40,110 @@ class Preprocessing():
     """
     This class is intended to pre-process the data,
     such that it can be ingested by the optimisation 
-    model class.
+    model class. The processed data is held in the
+    array-backed `data` attribute, the object lists and
+    dictionaries are lazy views kept for compatibility.
     """
     
-    def __init__(self, api_data=None):
+    def __init__(self, api_data=None, data: CampaignData = None):
         self._logger = Logger().logger
-        self.cluster_list: List[Cluster] = []
-        self.product_list: List[Product] = []
-        self.product_cost:Dict = None
-        self.product_profit:Dict = None
-        self.customer_list: List[Customer] = []
-        self.customer_cost:Dict = None
-        self.customer_profit:Dict = None
+        self.data: CampaignData = data
         self.api_data = api_data
         self.budget = Config.OPT_PARAMS['budget']
         self.roi = (Config.OPT_PARAMS['roi'] - 100)/100
-        if self.api_data is None:
-            self.__process_cluster()
-            self.__process_product()
-            self.__process_customer()
-            self.__process_product_cost()
-            self.__process_product_profit()
+        if self.data is not None:
+            pass  # already processed campaign data, e.g. a subset for one cluster
+        elif self.api_data is None:
+            self.__process_csv()
         else:
             self.__process_json()
-            
+        self._logger.debug("[DataProcessing] Processed %s.", self.data)
         
     def __process_json(self):
-        #cluster_df = collections.ChainMap(*self.api_data['cluster'])
-        cluster_df = self.api_data['cluster']
-        for dic in cluster_df:
-            thisCluster = Cluster(dic['Cluster'], float(dic['Count']))
-            self.cluster_list.append(thisCluster)
-
-        product = self.api_data['product']
-        for dic in product:
-            thisProduct = Product(dic['Product_Type'], float(dic['Count']))
-            self.product_list.append(thisProduct)
-        
-        cost = self.api_data['cost']
-        self.product_cost = {}
-        for dict in cost:
-            p=(dict['Product_Type_Cost'])
-            for k,v in dict.items():
-                if k !='Product_Type_Cost':
-                    self.product_cost[k, p] = float(v)
-        #{(i['Product_Type_Cost'],k):v for k,v in i.items() for i in l if k!='Product_Type_Cost'}
-
-        profit = self.api_data['profit']
-        self.product_profit = {}
-        for dict in profit:
-            p=(dict['Product_Type_Profit'])
-            for k,v in dict.items():
-                if k !='Product_Type_Profit':
-                    self.product_profit[k, p] = float(v)
-
-        cust_cost_profit = self.api_data['cust_cost_profit']
-        self.customer_cost = {}
-        for dic in cust_cost_profit:
-            self.customer_cost[dic['Cluster'], dic['Customer'], dic['Product']] = float(dic['Cost'])
-            thisCustomer = Customer(dic['Customer'], (dic['Cluster'], dic['Customer']), [dic['Cluster'], dic['Customer'], dic['Product']])
-            self.customer_list.append(thisCustomer)
-
-        self.customer_profit = {}
-        for dic in cust_cost_profit:
-            self.customer_profit[dic['Cluster'], dic['Customer'], dic['Product']] = float(dic['Profit'])
+        cluster_df = pd.DataFrame.from_records(self.api_data['cluster'], columns=['Cluster', 'Count'])
+        product_df = pd.DataFrame.from_records(self.api_data['product'], columns=['Product_Type', 'Count'])
+        # rows are products and columns are clusters
+        cost_df = pd.DataFrame.from_records(self.api_data['cost']).set_index('Product_Type_Cost').T
+        profit_df = pd.DataFrame.from_records(self.api_data['profit']).set_index('Product_Type_Profit').T
+        cust_df = pd.DataFrame.from_records(self.api_data['cust_cost_profit'], columns=CUSTOMER_COLUMNS)
+        self.data = CampaignData.from_frames(cluster_df, product_df, cost_df, profit_df, cust_df)
         self.budget = self.api_data['budget']
         self.roi = (self.api_data['roi'] - 100)/100
 
-    def __process_cluster(self):
+    def __process_csv(self):
         """
-        This function processes the cluster dataset
-        and save the data into the cluster list.
+        This function processes the cluster, product, product cost,
+        product profit and customer datasets into the campaign data,
+        unless the preprocessing cache holds them for unchanged inputs.
         """
+        cache = PreprocessingCache()
+        self.data = cache.load()
+        if self.data is None:
+            self.__read_csv()
+            cache.save(self.data)
+
+    def __read_csv(self):
         df_cluster = InputHandler.get_data_cluster()
-        for _, row in df_cluster.iterrows():
-            thisCluster = Cluster(*row)
-            self.cluster_list.append(thisCluster)
-        self._logger.debug("[DataProcessing] Processed data for Cluster Data.")
-            
-    def __process_product(self):
-        """
-        This function processes the product dataset
-        and save the product details into the product list.
-        """
         df_product = InputHandler.get_data_product()
-        for _, row in df_product.iterrows():
-            thisProduct = Product(*row)
-            self.product_list.append(thisProduct)
-        self._logger.debug("[DataProcessing] Processed data for Product Data.") 
-    
-    def __process_product_cost(self):
-        """product cost by cluster"""
-        cost_df = InputHandler.get_data_product_cost()
-        keys = list(cost_df.loc[:, 'Unnamed: 0'])
-        cost_df = cost_df.iloc[:, 1:]
-        self.product_cost = {}
-        for i,l1 in enumerate(keys):
-            for j,l2 in enumerate(cost_df):
-                self.product_cost[l1, l2] = cost_df.iloc[i, j]
-        self._logger.debug("[DataProcessing] Processed data for Product Cost.")
-        
-    def __process_product_profit(self):
-        """product cost by cluster"""
-        profit_df = InputHandler.get_data_product_profit()
-        keys = list(profit_df.loc[:, 'Unnamed: 0'])
-        profit_df = profit_df.iloc[:, 1:]
-        self.product_profit = {}
-        for i,l1 in enumerate(keys):
-            for j,l2 in enumerate(profit_df):
-                self.product_profit[l1, l2] = profit_df.iloc[i, j]
-        self._logger.debug("[DataProcessing] Processed data for Product Profit.")
-
-    def __process_customer(self):
+        # product cost and profit by cluster
+        cost_df = InputHandler.get_data_product_cost().set_index('Unnamed: 0')
+        profit_df = InputHandler.get_data_product_profit().set_index('Unnamed: 0')
+        settings = Config.MODEL_INPUTOUTPUT['import_settings']['csv']
+        if settings.get('customer_chunksize'):
+            self.data = CampaignData.from_chunks(df_cluster, df_product, cost_df, profit_df,
+                                                 self.__customer_chunks(df_cluster, df_product, settings))
+        else:
+            df_customer = InputHandler.get_data_customers()
+            # same (cluster, customer, product) ordering as the former pivot by cluster and customer
+            df_customer = df_customer[CUSTOMER_COLUMNS].sort_values(['Cluster', 'Customer', 'Product'], kind='mergesort')
+            self.data = CampaignData.from_frames(df_cluster, df_product, cost_df, profit_df, df_customer)
+        self._logger.debug("[DataProcessing] Processed data for Cluster, Product, Product Cost & Profit and Customer Data.")
+
+    def __customer_chunks(self, df_cluster, df_product, settings):
         """
-        This function processes the customer dataset
-        and save the customer details into the customer list.
+        Customer data read in chunks with compact dtypes: clusters and products as categoricals
+        of the known labels, customers as strings (encoded chunk by chunk) and costs and profits
+        as floats of `customer_float_dtype`, so that memory does not grow with the raw file size.
         """
-        df_customer = InputHandler.get_data_customers()
-        cost = df_customer[['Cluster', 'Customer', 'Product', 'Cost']]
-        cost = cost.pivot(index=['Cluster', 'Customer'], columns='Product', values='Cost').reset_index()            
-        profit = df_customer[['Cluster', 'Customer', 'Product', 'Profit']]
-        profit = profit.pivot(index=['Cluster', 'Customer'], columns='Product', values='Profit').reset_index()
-        ### cost dictionary
-        key_cost = cost[['Cluster','Customer']]
-        dict_key_cost = {}
-        for _, row in key_cost.iterrows():
-            dict_key_cost[row[1]] = row[0]
-        cost_df = cost.iloc[:, 2:]
-        self.customer_cost = {}
-        i = 0
-        for customer, cluster in dict_key_cost.items():
-            for index, product in enumerate(cost_df):
-                self.customer_cost[cluster, customer, product] = cost_df.iloc[i, index]
-                thisCustomer = Customer(customer, (cluster, customer), [cluster, customer, product])
-                self.customer_list.append(thisCustomer)
-            i = i + 1
-        ### profit dictionary
-        self.customer_profit = {}
-        profit_df = profit.iloc[:, 2:]
-        i = 0
-        for customer, cluster in dict_key_cost.items():
-            for index, product in enumerate(profit_df):
-                self.customer_profit[cluster, customer, product] = profit_df.iloc[i, index]
-            i = i + 1
-        self._logger.debug("[DataProcessing] Processed data for Customer Data, Cost & Profit.")
-    
+        dtype = {
+            'Cluster': pd.CategoricalDtype(df_cluster.iloc[:, 0]),
+            'Product': pd.CategoricalDtype(df_product.iloc[:, 0]),
+            'Customer': str,
+            'Cost': settings.get('customer_float_dtype', 'float64'),
+            'Profit': settings.get('customer_float_dtype', 'float64'),
+        }
+        self._logger.info("[DataProcessing] Reading customer data in chunks of %d rows.",
+                          settings['customer_chunksize'])
+        return InputHandler.get_data_customers_chunks(settings['customer_chunksize'], dtype=dtype)
+
+    @cached_property
+    def cluster_list(self) -> List[Cluster]:
+        return [Cluster(k, n) for k, n in zip(self.data.clusters.tolist(), self.data.cluster_size.tolist())]
+
+    @cached_property
+    def product_list(self) -> List[Product]:
+        return [Product(j, n) for j, n in zip(self.data.products.tolist(), self.data.product_min_offers.tolist())]
+
+    @cached_property
+    def product_cost(self) -> Dict:
+        return dict(zip(self.data.cp_keys(), self.data.product_cost.ravel().tolist()))
+
+    @cached_property
+    def product_profit(self) -> Dict:
+        return dict(zip(self.data.cp_keys(), self.data.product_profit.ravel().tolist()))
+
+    @cached_property
+    def customer_list(self) -> List[Customer]:
+        return [Customer(customer, (cluster, customer), [cluster, customer, product])
+                for cluster, customer, product in self.data.ccp_keys()]
+
+    @cached_property
+    def customer_cost(self) -> Dict:
+        return dict(zip(self.data.ccp_keys(), self.data.pair_cost.tolist()))
+
+    @cached_property
+    def customer_profit(self) -> Dict:
+        return dict(zip(self.data.ccp_keys(), self.data.pair_profit.tolist()))
 
     @property
     def cluster_data(self):
@@ -198,7 +160,3 @@ class Preprocessing():
 
 if __name__ == "__main__":
     Preprocessing()
-        
-        
-        
-    
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+PREPROCESSING CACHE CLASS
+
+On-disk cache of the preprocessed campaign data of the CSV inputs. The CampaignData
+arrays are stored as Feather (or Parquet) tables under a key derived from the input
+files named in `Config.MODEL_INPUTOUTPUT['import_settings']['csv']`: their size and
+modification time, or their content hash, and the import settings. Any change to an
+input file gives a new key, so a stale entry is never read, and it is removed when
+the new entry is written.
+"""
+import os
+import shutil
+import hashlib
+import pandas as pd
+from pathlib import Path
+from conf import Logger
+from conf import Config
+from src.data_connectors import PandasFileConnector
+from src.optimisation_model.campaign_data import CampaignData
+
+CACHE_VERSION = 1  # bump when the stored layout or the preprocessing changes
+PAIR_COLUMNS = ['pair_cluster', 'pair_customer', 'pair_product', 'pair_cost', 'pair_profit']
+
+
+class PreprocessingCache(object):
+    def __init__(self, enabled=None, cache_dir=None, file_format=None, fingerprint=None):
+        self._logger = Logger().logger
+        settings = Config.MODEL_INPUTOUTPUT['cache_settings']
+        self.import_settings = Config.MODEL_INPUTOUTPUT['import_settings']['csv']
+        self.enabled = settings['enabled'] if enabled is None else enabled
+        self.cache_dir = Path(cache_dir or settings['cache_dir'])
+        self.file_format = file_format or settings['format']
+        self.fingerprint = fingerprint or settings['fingerprint']
+        if self.enabled:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                self._logger.warning("[PreprocessingCache] Disabled, the %s format requires pyarrow: %s",
+                                     self.file_format, e)
+                self.enabled = False
+
+    @property
+    def input_files(self):
+        return [Path(self.import_settings['import_filepath'], f"{table}.csv") for table in self.import_settings['import_table']]
+
+    def key(self):
+        """Hash of the input files (size and mtime, or content) and of the import settings."""
+        digest = hashlib.sha256(f"{CACHE_VERSION}|{self.file_format}".encode())
+        settings = {k: v for k, v in self.import_settings.items() if k != 'customer_chunksize'}
+        if not self.import_settings.get('customer_chunksize'):
+            settings.pop('customer_float_dtype', None)  # only applies to the streamed customer data
+        digest.update(repr(sorted(settings.items())).encode())
+        for path in self.input_files:
+            stat = path.stat()
+            digest.update(f"{path.name}|{stat.st_size}".encode())
+            if self.fingerprint == 'content':
+                with open(path, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        digest.update(block)
+            else:
+                digest.update(str(stat.st_mtime_ns).encode())
+        return digest.hexdigest()
+
+    def __table(self, entry, name):
+        return Path(entry, f"{name}.{self.file_format}")
+
+    def load(self):
+        """Cached campaign data of the current input files, or None."""
+        if not self.enabled:
+            return None
+        try:
+            entry = Path(self.cache_dir, self.key())
+        except FileNotFoundError:
+            return None  # missing input files are reported by the CSV read
+        if not entry.is_dir():
+            self._logger.info("[PreprocessingCache] No preprocessed data for the current inputs (%s).",
+                              entry.name[:12])
+            return None
+        tables = {name: PandasFileConnector.load(self.__table(entry, name))
+                  for name in ('clusters', 'products', 'customers', 'pairs')}
+        if any(table is None for table in tables.values()):
+            return None
+        clusters, products, pairs = tables['clusters'], tables['products'], tables['pairs']
+        n_products = len(products)
+        data = CampaignData(
+            clusters=clusters['label'].to_numpy(dtype=object),
+            cluster_size=clusters['size'],
+            products=products['label'].to_numpy(dtype=object),
+            product_min_offers=products['min_offers'],
+            product_cost=clusters[[f"cost_{j}" for j in range(n_products)]].to_numpy(),
+            product_profit=clusters[[f"profit_{j}" for j in range(n_products)]].to_numpy(),
+            customers=tables['customers']['label'].to_numpy(dtype=object),
+            **{column: pairs[column].to_numpy() for column in PAIR_COLUMNS},
+        )
+        self._logger.info("[PreprocessingCache] Loaded preprocessed %s (%s).", data, entry.name[:12])
+        return data
+
+    def save(self, data: CampaignData):
+        """
+        Store the campaign data of the current input files, replacing any older entry. A
+        failed write is logged and skipped, the cache never fails the preprocessing.
+        """
+        if not self.enabled:
+            return
+        try:
+            key = self.key()
+        except FileNotFoundError:
+            return
+        tmp_entry = Path(self.cache_dir, f".{key}.{os.getpid()}.tmp")
+        try:
+            self.__save(data, key, tmp_entry)
+        except OSError as e:
+            self._logger.warning("[PreprocessingCache] Preprocessed data not cached: %s", e)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def __save(self, data, key, tmp_entry):
+        entry = Path(self.cache_dir, key)
+        if entry.is_dir():
+            return  # stored by another process from the same inputs
+        # cluster level table, with the (K, P) product cost and profit matrices as columns
+        n_products = len(data.products)
+        clusters = pd.concat([
+            pd.DataFrame({'label': data.clusters, 'size': data.cluster_size}),
+            pd.DataFrame(data.product_cost, columns=[f"cost_{j}" for j in range(n_products)]),
+            pd.DataFrame(data.product_profit, columns=[f"profit_{j}" for j in range(n_products)]),
+        ], axis=1)
+        tables = {
+            'clusters': clusters,
+            'products': pd.DataFrame({'label': data.products, 'min_offers': data.product_min_offers}),
+            'customers': pd.DataFrame({'label': data.customers}),
+            'pairs': pd.DataFrame({column: getattr(data, column) for column in PAIR_COLUMNS}),
+        }
+        for table in ('clusters', 'products', 'customers'):
+            # labels read back with their own type (str or int), mixed types cannot be stored
+            if tables[table]['label'].map(type).nunique() > 1:
+                self._logger.warning("[PreprocessingCache] Not cached, the %s labels have mixed types.", table)
+                return
+            tables[table]['label'] = tables[table]['label'].infer_objects()
+        tmp_entry.mkdir(parents=True, exist_ok=True)
+        for name, table in tables.items():
+            PandasFileConnector.save(table, self.__table(tmp_entry, name), file_type=f".{self.file_format}")
+        if not all(self.__table(tmp_entry, name).exists() for name in tables):
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            if not entry.is_dir():
+                raise
+            # stored by another process in the meantime, from the same inputs
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        for stale in self.cache_dir.iterdir():
+            if stale.name != key and not stale.name.startswith('.'):
+                shutil.rmtree(stale, ignore_errors=True)
+        self._logger.info("[PreprocessingCache] Stored preprocessed %s (%s).", data, key[:12])
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
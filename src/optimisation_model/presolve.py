@@ -0,0 +1,130 @@
+"""
+OPERATIONAL PRESOLVE CLASS
+
+Most (cluster, product) pairs get no offers in the tactical results, and the product
+offer rows then force every offer of such a pair to zero. Offers whose cost alone
+exceeds the whole (corrected) budget are forced to zero by the budget row. Rather than
+building these variables and leaving them to the solver's presolve (or to Pyomo's
+fixed variable transformations, which only run on the full model), the operational
+model is built on the subset of the offers that can be selected. Product offer rows of
+pairs without offers and offer limit rows of customers without offers then disappear
+with them.
+
+With `presolve_drop_unprofitable`, offers with a non-positive profit are dropped as
+well, from the (cluster, product) pairs that keep at least their quota of offers. This
+is not exact: a quota can force such an offer when the profitable ones of the pair are
+taken by the offer limits.
+
+The solution of the reduced model is mapped back onto every offer of the campaign by
+`restore`, so that post-processing reports the dropped offers as not selected. The
+operational model cache is keyed on the reduced data, so a re-run of the same input
+re-targets the model built for it.
+"""
+import numpy as np
+import pyomo.environ as pyo
+from conf import Logger
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.operation_model import OperationalOptimisationModel
+
+
+class OperationalPresolve(object):
+    """
+    Offers of the campaign data that the operational model can select, given the solved
+    tactical model (Pyomo or matrix). `processed_data` holds the reduced campaign data
+    the operational model is built from, `removed` the number of dropped offers by reason.
+    """
+    TOLERANCE = 1e-6
+
+    def __init__(self, tactical_model, processed_data: Preprocessing, drop_unprofitable=None):
+        self._logger = Logger().logger
+        self.full_data = processed_data
+        self.drop_unprofitable = Config.OPTIMISATION_MODELLING_CONFIG['presolve_drop_unprofitable'] \
+            if drop_unprofitable is None else drop_unprofitable
+        data = processed_data.data
+        self.quotas = np.array([tactical_model.y[g].value or 0.0 for g in data.cp_keys()], dtype=np.float64)
+        self.budget = tactical_model.budget.value + tactical_model.z.value
+        self.kept, self.removed = self.__reduce()
+        self.processed_data = self.__reduced_data()
+        self._logger.info("[Presolve] %s of %s offers kept, removed %s with a zero tactical quota, %s costing more than "
+                          "the budget and %s unprofitable.", len(self.kept), data.n_pairs, self.removed['zero_quota'],
+                          self.removed['over_budget'], self.removed['unprofitable'])
+
+    def __reduce(self):
+        data = self.full_data.data
+        cluster_product = data.pair_cluster.astype(np.int64) * len(data.products) + data.pair_product
+        zero_quota = np.abs(self.quotas[cluster_product]) <= self.TOLERANCE
+        over_budget = ~zero_quota & (data.pair_cost > self.budget + self.TOLERANCE)
+        keep = ~(zero_quota | over_budget)
+        unprofitable = np.zeros(data.n_pairs, dtype=bool)
+        if self.drop_unprofitable:
+            # only from the pairs whose profitable offers can still fill their quota
+            candidates = keep & (data.pair_profit <= 0)
+            profitable = np.bincount(cluster_product[keep & ~candidates], minlength=len(self.quotas))
+            unprofitable = candidates & (profitable[cluster_product] >= np.ceil(self.quotas[cluster_product] - self.TOLERANCE))
+            keep &= ~unprofitable
+        removed = {
+            'zero_quota': int(zero_quota.sum()),
+            'over_budget': int(over_budget.sum()),
+            'unprofitable': int(unprofitable.sum()),
+        }
+        return np.flatnonzero(keep), removed
+
+    def __reduced_data(self):
+        processed_data = Preprocessing(data=self.full_data.data.subset(self.kept))
+        processed_data.budget, processed_data.roi = self.full_data.budget, self.full_data.roi
+        return processed_data
+
+    @property
+    def summary(self):
+        """Offers before and after the presolve, and the removed offers by reason."""
+        return dict(offers=self.full_data.data.n_pairs, kept_offers=len(self.kept),
+                    **{f"removed_{reason}": n for reason, n in self.removed.items()})
+
+    def restore(self, model):
+        """
+        Operational model over every offer of the campaign, of the type of the reduced
+        operational `model` (Pyomo or matrix), holding its solution and zero for the dropped
+        offers. It only holds the sets, parameters, variables and objective read by the
+        post-processing, not the constraints.
+        """
+        data = self.full_data.data
+        if isinstance(model, MatrixModel):
+            values = model.x.values
+        else:
+            values = model.x.extract_values()
+            values = [np.nan if values[key] is None else values[key] for key in self.processed_data.data.ccp_keys()]
+        selected = np.zeros(data.n_pairs)
+        selected[self.kept] = np.asarray(values, dtype=np.float64)
+        full_model = self.__restore_matrix(selected) if isinstance(model, MatrixModel) else self.__restore_pyomo(selected)
+        full_model.optimised = model.optimised
+        return full_model
+
+    def __restore_matrix(self, selected):
+        data = self.full_data.data
+        full_model = MatrixModel('operational')
+        full_model.add_set('customers', data.customers.tolist())
+        full_model.add_set('products', data.products.tolist())
+        full_model.add_set('clusters', data.clusters.tolist())
+        full_model.add_set('ccp', data.ccp_keys)
+        full_model.add_param('customer_profit', data.pair_profit, index=data.ccp_keys)
+        full_model.add_param('customer_cost', data.pair_cost, index=data.ccp_keys)
+        full_model.add_variables('x', data.n_pairs, upper=1.0, cost=data.pair_profit, integer=True, index=data.ccp_keys)
+        full_model.load_solution(selected)
+        return full_model
+
+    def __restore_pyomo(self, selected):
+        data = self.full_data.data
+        keys = data.ccp_keys()
+        full_model = pyo.ConcreteModel(name='operational')
+        full_model.customers = pyo.Set(initialize=data.customers.tolist())
+        full_model.products = pyo.Set(initialize=data.products.tolist())
+        full_model.clusters = pyo.Set(initialize=data.clusters.tolist())
+        full_model.ccp = pyo.Set(initialize=keys)
+        full_model.customer_profit = pyo.Param(full_model.ccp, initialize=dict(zip(keys, data.pair_profit.tolist())), domain=pyo.Any)
+        full_model.customer_cost = pyo.Param(full_model.ccp, initialize=dict(zip(keys, data.pair_cost.tolist())), domain=pyo.Any)
+        full_model.x = pyo.Var(full_model.ccp, domain=pyo.Binary)
+        full_model.x.set_values({key: None if np.isnan(value) else value for key, value in zip(keys, selected.tolist())})
+        full_model.obj = pyo.Objective(rule=OperationalOptimisationModel.objective, sense=pyo.maximize)
+        return full_model
@@ -1,16 +1,194 @@
 from conf import Logger
 from conf import Config
+import math
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import contextlib
+import contextvars
+import logging
+import collections
+import numpy as np
 import pyomo.environ as pyo
-from pyomo.opt import SolverStatus, TerminationCondition
+from pathlib import Path
+from pyomo.opt import SolverStatus, TerminationCondition, SolverResults
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.stage_metrics import span
+from src.optimisation_model.solver_scheduler import solver_slots
+from src.optimisation_model.solver_progress import capture_progress, relative_gap
+
+# solver option of the time limit in seconds, by solver type
+TIME_LIMIT_OPTIONS = {'cbc': 'seconds', 'glpk': 'tmlim', 'highs': 'time_limit', 'appsi_highs': 'time_limit'}
+# solver option of the relative MIP gap at which a solve stops as optimal, by solver type
+GAP_OPTIONS = {'cbc': 'ratioGap', 'glpk': 'mipgap', 'highs': 'mip_rel_gap', 'appsi_highs': 'mip_rel_gap'}
+OPTIMAL, TIME_LIMITED = 'optimal', 'time_limited'
+_deadline = contextvars.ContextVar('solve_deadline', default=None)
+
+
+class SolverTimeLimitError(Exception):
+    """Raised when a solve reaches its time limit without a feasible solution."""
+
+
+@contextlib.contextmanager
+def solve_deadline(seconds=None, deadline=None):
+    """
+    Deadline of the solves run in this context, e.g. those of one request, `seconds` from
+    now or at the `deadline` of current_deadline, e.g. handed on to a worker process. Each
+    solve gets the time left when it starts as its time limit in place of the configured
+    one, and at least `min_time_limit` to find an incumbent. No deadline for None.
+    """
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+    if deadline is None:
+        yield
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """Deadline of the current context on the (system-wide) monotonic clock, None without one."""
+    return _deadline.get()
+
+
+def remaining_time():
+    """Time limit of a solve started now under the current deadline, None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), Config.OPTIMISATION_MODELLING_CONFIG['min_time_limit'])
 
 
 class ModelSolver(object):
-    def __init__(self, model, solver_type=None): 
+    """
+    Solves either a Pyomo model or a MatrixModel with the configured solver.
+    Pyomo models go through Pyomo's SolverFactory, matrix models are handed to
+    HiGHS in-process (solver_type 'highs') or written as MPS for CBC (solver_type 'cbc').
+
+    With the 'persistent' solver backend both model kinds are solved by in-process
+    HiGHS instances, no files are written. Each model object keeps its instance, so
+    that re-solving the same model (e.g. the points of a sweep) only pushes its
+    changes, while solves of other models run on instances of their own.
+
+    With the 'race' solver backend, the configured racers (solver types and option
+    sets) solve the model in separate processes and the first optimal result is kept,
+    see SolverRace.
+
+    With `warmstart`, the current values of the model variables (e.g. loaded by
+    GreedyWarmStart) are passed to the solver as the starting incumbent.
+
+    A `time_limit` in seconds, or the time left to the current solve_deadline, replaces
+    the time limit of the solver options. A solve stopped at its time limit keeps its best
+    incumbent and gets the status 'time_limited', with the best bound and the gap when the
+    solver reports them. Without an incumbent it raises SolverTimeLimitError.
+
+    Every solve first takes host-wide solver slots, see solver_scheduler, and CBC runs
+    with one thread per slot taken. Within a progress log, e.g. of an API job, the solver
+    output is parsed into progress events, see solver_progress.
+    """
+    _persistent_solvers_lock = threading.Lock()  # guards the creation of the in-process solver instances
+    LOG_TAIL_LINES = 20  # last lines of the CBC output of a matrix model logged when debugging, e.g. its final statistics
+
+    def __init__(self, model, solver_type=None, solver_backend=None, warmstart=False, time_limit=None):
         self._logger = Logger().logger
         self.model = model
         self.results = None
+        self.warmstart = warmstart
+        self.time_limit = time_limit if time_limit is not None else remaining_time()
+        self.solve_time = None
+        self.status = None
+        self.objective_value = None
+        self.bound = None
+        self.gap = None
+        self.threads = 1
+        self.progress = None
+        self.solver_backend = solver_backend or Config.OPTIMISATION_MODELLING_CONFIG['solver_backend']
         self.solver_type = solver_type or Config.OPTIMISATION_MODELLING_CONFIG['solver_type']
-        self.__solve()
+        if self.solver_backend == 'persistent':
+            self.solver_type = 'highs' if isinstance(self.model, MatrixModel) else 'appsi_highs'
+        elif self.solver_backend == 'race':
+            self.solver_type = 'race'
+        start = time.perf_counter()
+        with solver_slots(self.__wanted_threads()) as threads, \
+                capture_progress(self.solver_type, self.model.name, objective_sense(self.model)) as progress:
+            self.threads, self.progress = threads, progress
+            if self.solver_backend == 'race':
+                self.__solve_race()
+            elif isinstance(self.model, MatrixModel):
+                self.__solve_matrix()
+            elif self.solver_backend == 'persistent':
+                self.__solve_persistent()
+            else:
+                self.__solve()
+        self.solve_time = time.perf_counter() - start
+        self._logger.info("[ModelSolver] Model %s solved in %.3fs with %s thread(s) (%s warm start).",
+                          self.model.name, self.solve_time, self.threads, 'with' if self.warmstart else 'without')
+
+    def __wanted_threads(self) -> int:
+        """Solver slots to take: one per racer of a race, MAX_THREADS for a MIP and one for an LP."""
+        if self.solver_backend == 'race':
+            return len(Config.OPTIMISATION_MODELLING_CONFIG['solver_race']['racers'])
+        if isinstance(self.model, MatrixModel):
+            has_integers = bool(self.model.integrality.any())
+        else:
+            has_integers = any(not v.is_continuous() for v in self.model.component_data_objects(pyo.Var, descend_into=True))
+        return Config.SOLVER_SCHEDULER['MAX_THREADS'] if has_integers else 1
+
+    def __solver_options(self, solver_type=None) -> dict:
+        """Configured options of the solver type, with the CBC threads of the slots taken and the time limit of the solve."""
+        solver_type = solver_type or self.solver_type
+        options = dict(Config.OPTIMISATION_MODELLING_CONFIG['solver_option'].get(solver_type) or {})
+        if solver_type == 'cbc' and self.threads > 1:
+            options['threads'] = self.threads
+        if self.time_limit is not None and solver_type in TIME_LIMIT_OPTIONS:
+            # GLPK takes whole seconds
+            options[TIME_LIMIT_OPTIONS[solver_type]] = math.ceil(self.time_limit) if solver_type == 'glpk' else self.time_limit
+        return options
+
+    @classmethod
+    def persistent_solver(cls, model, factory):
+        """
+        Return the (solver, lock) kept with this model object, creating it on its first solve.
+        The instance goes with the model, which it references itself (appsi).
+        """
+        with cls._persistent_solvers_lock:
+            if getattr(model, '_persistent_solver', None) is None:
+                model._persistent_solver = (factory(), threading.Lock())
+            return model._persistent_solver
+
+    def __solve_persistent(self) -> None:
+        """
+        persistent solver function. The appsi HiGHS interface keeps the model
+        loaded in memory and only applies the changes when the same model object
+        is re-solved.
+        """
+        with span('transformations'):
+            pyo.TransformationFactory("contrib.detect_fixed_vars").apply_to(self.model)  # type: ignore
+            pyo.TransformationFactory("contrib.deactivate_trivial_constraints").apply_to(self.model)  # type: ignore
+
+        def factory():
+            opt = pyo.SolverFactory(self.solver_type)
+            for k, v in Config.OPTIMISATION_MODELLING_CONFIG['solver_option'].get('highs', {}).items():
+                opt.options[k] = v
+            return opt
+
+        opt, lock = self.persistent_solver(self.model, factory)
+        with lock:
+            # set on every solve, the re-solves of a model may have another deadline
+            opt.options['time_limit'] = self.__solver_options('highs').get('time_limit', float('inf'))
+            self._logger.debug("[ModelSolver] Persistent solver starting on model %s...", self.model.name)
+            try:
+                results = opt.solve(self.model, tee=True, warmstart=self.warmstart)
+            except Exception as e:
+                raise Exception(f"Model optimisation failed with {self.solver_type} with error message {e}.")
+            self.results = results
+            self._logger.info("[ModelSolver] Solver completed.")
+        self.__check_results(results)
 
     def __solve(self)-> None:  
         """
@@ -18,40 +196,307 @@ class ModelSolver(object):
         transformations, which detects fixed variables and detects trival 
         constraints in oder to remove them.
         """
-        pyo.TransformationFactory("contrib.detect_fixed_vars").apply_to(self.model)  # type: ignore
-        pyo.TransformationFactory("contrib.deactivate_trivial_constraints").apply_to(self.model)  # type: ignore
+        with span('transformations'):
+            pyo.TransformationFactory("contrib.detect_fixed_vars").apply_to(self.model)  # type: ignore
+            pyo.TransformationFactory("contrib.deactivate_trivial_constraints").apply_to(self.model)  # type: ignore
 
         # initialise the solver object
         self._logger.debug("[ModelSolver] Solver object initiated...") 
         opt = pyo.SolverFactory(self.solver_type) # finding solver
-        for k, v in Config.OPTIMISATION_MODELLING_CONFIG['solver_option'].get(self.solver_type).items():  # setting solver parameters, if any found in config
+        for k, v in self.__solver_options().items():  # setting solver parameters, if any found in config
             opt.options[k] = v
         try:
             self._logger.debug("[ModelSolver] Solver starting...")
-            results = opt.solve(self.model, tee=True)
+            results = opt.solve(self.model, tee=True, **self.__warmstart_kwargs(opt))
             self.results = results
             self._logger.info("[ModelSolver] Solver completed.")
         except:
             opt = pyo.SolverFactory(self.solver_type, 
                                    executable=Config.OPTIMISATION_MODELLING_CONFIG['solver_loc'].get(self.solver_type)) # finding solver with path given, for local run
-            for k, v in Config.OPTIMISATION_MODELLING_CONFIG['solver_option'].get(self.solver_type).items():  # setting solver parameters, if any found in config
+            for k, v in self.__solver_options().items():  # setting solver parameters, if any found in config
                 opt.options[k] = v
             try:
-                results = opt.solve(self.model, tee=True)
+                results = opt.solve(self.model, tee=True, **self.__warmstart_kwargs(opt))
                 self.results = results
                 self._logger.info("[ModelSolver] Solver completed.")
             except Exception as e:
                 raise Exception(f"Model optimisation failed with {self.solver_type} with error message {e}.")
- 
 
+        self.__check_results(results)
+
+    def __solve_race(self) -> None:
+        """
+        race solver function. The model is written once and solved by the
+        configured racers in separate processes, the first optimal result wins.
+        """
+        from src.optimisation_model.solver_race import SolverRace  # imports matrix_results from this module
+
+        if not isinstance(self.model, MatrixModel):
+            with span('transformations'):
+                pyo.TransformationFactory("contrib.detect_fixed_vars").apply_to(self.model)  # type: ignore
+                pyo.TransformationFactory("contrib.deactivate_trivial_constraints").apply_to(self.model)  # type: ignore
+        self.results = SolverRace(self.model, deadline=self.time_limit, warmstart=self.warmstart,
+                                  max_racers=self.threads).results
+        self._logger.info("[ModelSolver] Solver completed.")
+        self.__check_results(self.results)
+
+    def __warmstart_kwargs(self, opt) -> dict:
+        if not self.warmstart:
+            return {}
+        if not opt.warm_start_capable():
+            self._logger.warning("[ModelSolver] %s does not accept a warm start, solving cold.", self.solver_type)
+            return {}
+        return {'warmstart': True}
+
+    def __check_results(self, results) -> None:
         if (results.solver.status == SolverStatus.ok) and (results.solver.termination_condition == TerminationCondition.optimal):
             self._logger.info("Solution is feasible and optimal")
             results.write()
         elif results.solver.termination_condition == TerminationCondition.infeasible:
             raise ValueError("Model optimisation resulted into an infeasible solution")
 
+        status = solve_status(self.model, results)
+        self.status, self.objective_value, self.bound, self.gap = \
+            status['status'], status['objective_value'], status['bound'], status['gap']
+        if self.bound is None and self.progress is not None and self.progress.state['bound'] is not None:
+            # the bound of the last progress line, e.g. of a solve read from a CBC solution file
+            self.bound = self.progress.state['bound']
+            self.gap = relative_gap(self.objective_value, self.bound)
+        if results.solver.termination_condition == TerminationCondition.maxTimeLimit:
+            if self.objective_value is None:
+                raise SolverTimeLimitError(f"Model optimisation of {self.model.name} reached the time limit without "
+                                           f"a feasible solution.")
+            if self.gap is not None:
+                self._logger.warning("[ModelSolver] Time limit reached on model %s, continuing from the best incumbent "
+                                     "%.2f with a gap of %.4f%% to the bound %.2f.", self.model.name,
+                                     self.objective_value, 100 * self.gap, self.bound)
+            else:
+                self._logger.warning("[ModelSolver] Time limit reached on model %s, continuing from the best incumbent "
+                                     "%.2f.", self.model.name, self.objective_value)
         self.model.optimised = True
 
+    def __solve_matrix(self) -> None:
+        """
+        matrix model solver function. The constraint matrix is passed to HiGHS
+        in memory, or written once as an MPS file for the CBC executable.
+        """
+        options = self.__solver_options()
+        self._logger.debug("[ModelSolver] Matrix model solver starting with %s...", self.solver_type)
+        if self.solver_type in ('highs', 'appsi_highs'):
+            self.results = self.__solve_matrix_highs(options)
+        elif self.solver_type == 'cbc':
+            self.results = self.__solve_matrix_cbc(options)
+        else:
+            raise ValueError(f"Matrix models can only be solved with 'highs' or 'cbc', not {self.solver_type}.")
+        self._logger.info("[ModelSolver] Solver completed.")
+        self.__check_results(self.results)
+
+    def __solve_matrix_highs(self, options) -> SolverResults:
+        try:
+            import highspy
+        except ImportError as e:
+            raise ImportError("Solving matrix models with 'highs' requires the highspy package.") from e
+
+        def factory():
+            highs = highspy.Highs()
+            for k, v in options.items():
+                highs.setOptionValue(k, v)
+            return highs
+
+        if self.solver_backend == 'persistent':
+            highs, lock = self.persistent_solver(self.model, factory)
+        else:
+            highs, lock = factory(), threading.Lock()
+        with lock:
+            # set on every solve, the re-solves of a model may have another deadline
+            highs.setOptionValue('time_limit', float(options.get('time_limit', highspy.kHighsInf)))
+            self.__load_highs(highspy, highs)
+            return self.__run_highs(highspy, highs)
+
+    def __load_highs(self, highspy, highs) -> None:
+        """
+        Pass the model to HiGHS. A persistent instance already holding this model with the
+        same structure only gets its row bounds updated, e.g. for new tactical results.
+        """
+        model = self.model
+        if self.solver_backend == 'persistent' and getattr(model, '_persistent_structure', None) == model.structure_version:
+            rows = np.arange(model.n_rows, dtype=np.int32)
+            highs.changeRowsBounds(model.n_rows, rows, model.row_lower, model.row_upper)
+            self._logger.debug("[ModelSolver] Persistent HiGHS model %s updated in place.", model.name)
+            return
+        A = model.A.tocsc()
+        lp = highspy.HighsLp()
+        lp.num_col_ = model.n_cols
+        lp.num_row_ = model.n_rows
+        lp.col_cost_ = model.c
+        lp.col_lower_ = model.col_lower
+        lp.col_upper_ = model.col_upper
+        lp.row_lower_ = model.row_lower
+        lp.row_upper_ = model.row_upper
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.num_col_ = model.n_cols
+        lp.a_matrix_.num_row_ = model.n_rows
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.sense_ = highspy.ObjSense.kMaximize if model.sense == 'maximize' else highspy.ObjSense.kMinimize
+        highs.passModel(lp)
+        integer_cols = np.flatnonzero(model.integrality).astype(np.int32)
+        if len(integer_cols):
+            highs.changeColsIntegrality(len(integer_cols), integer_cols,
+                                        np.full(len(integer_cols), highspy.HighsVarType.kInteger.value, dtype=np.uint8))
+        if self.solver_backend == 'persistent':
+            model._persistent_structure = model.structure_version  # loaded in its persistent instance
+
+    def __run_highs(self, highspy, highs) -> SolverResults:
+        model = self.model
+        integer_cols = np.flatnonzero(model.integrality)
+        if self.warmstart:
+            start_cols = np.flatnonzero(~np.isnan(model.solution)).astype(np.int32)
+            highs.setSolution(len(start_cols), start_cols, model.solution[start_cols])
+        if self.progress is not None:
+            # HiGHS logs to the console itself, its log lines are parsed through a callback
+            on_log = lambda event: self.progress.feed(event.message)
+            highs.cbLogging.subscribe(on_log)
+        start = time.perf_counter()
+        try:
+            highs.run()
+        finally:
+            if self.progress is not None:
+                highs.cbLogging.unsubscribe(on_log)
+        wallclock_time = time.perf_counter() - start
+
+        status = highs.getModelStatus()
+        info = highs.getInfo()
+        termination = {
+            highspy.HighsModelStatus.kOptimal: TerminationCondition.optimal,
+            highspy.HighsModelStatus.kInfeasible: TerminationCondition.infeasible,
+            highspy.HighsModelStatus.kUnbounded: TerminationCondition.unbounded,
+            highspy.HighsModelStatus.kUnboundedOrInfeasible: TerminationCondition.infeasibleOrUnbounded,
+            highspy.HighsModelStatus.kTimeLimit: TerminationCondition.maxTimeLimit,
+            highspy.HighsModelStatus.kIterationLimit: TerminationCondition.maxIterations,
+        }.get(status, TerminationCondition.unknown)
+
+        objective_value, bound = None, None
+        if info.primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+            model.load_solution(highs.getSolution().col_value, info.objective_function_value)
+            objective_value = info.objective_function_value
+            bound = info.mip_dual_bound if len(integer_cols) else objective_value
+        return self.__matrix_results(termination, objective_value, bound, wallclock_time)
+
+    def __solve_matrix_cbc(self, options) -> SolverResults:
+        executable = shutil.which('cbc') or Config.OPTIMISATION_MODELLING_CONFIG['solver_loc'].get('cbc')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mps_file, solution_file = Path(tmp_dir, 'model.mps'), Path(tmp_dir, 'model.sol')
+            self.model.write(mps_file)
+            command = [executable, str(mps_file)]
+            for k, v in options.items():
+                command += [f"-{k}", str(v)]
+            if self.warmstart:
+                # CBC mipstart file, with the nonzero integer columns of the current solution
+                start_file = Path(tmp_dir, 'start.sol')
+                start_cols = np.flatnonzero(self.model.integrality & (np.nan_to_num(self.model.solution) != 0))
+                with open(start_file, 'w') as file:
+                    file.writelines(f"{i} C{j} {value!r}\n" for i, (j, value) in
+                                    enumerate(zip(start_cols.tolist(), self.model.solution[start_cols].tolist())))
+                command += ['-mipstart', str(start_file)]
+            command += ['-solve', '-solu', str(solution_file)]
+            try:
+                # fed to the progress parser within a progress log, only its end is logged when debugging
+                tail = collections.deque(maxlen=self.LOG_TAIL_LINES)
+                with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True) as process:
+                    for line in process.stdout:
+                        if self.progress is not None:
+                            self.progress.feed(line)
+                        tail.append(line)
+                if self._logger.isEnabledFor(logging.DEBUG):
+                    self._logger.debug("[ModelSolver] CBC output of %s ends with:\n%s", self.model.name, ''.join(tail).rstrip())
+                if process.returncode:
+                    raise subprocess.CalledProcessError(process.returncode, command)
+            except Exception as e:
+                raise Exception(f"Model optimisation failed with {self.solver_type} with error message {e}.")
+            with open(solution_file) as file:
+                header, *rows = file.read().splitlines()
+
+        # header reads as "Optimal - objective value -123.0", the MPS objective being minimised
+        status = header.split(' - ')[0].strip().lower()
+        termination = TerminationCondition.optimal if status.startswith('optimal') else \
+            TerminationCondition.infeasible if 'infeasible' in status else \
+            TerminationCondition.unbounded if 'unbounded' in status else \
+            TerminationCondition.maxTimeLimit if 'time' in status else TerminationCondition.unknown
+
+        objective_value = None
+        if termination in (TerminationCondition.optimal, TerminationCondition.maxTimeLimit):
+            values = np.zeros(self.model.n_cols)
+            for row in rows:
+                _, name, value = row.replace('**', '').split()[:3]
+                values[int(name[1:])] = float(value)
+            self.model.load_solution(values)
+            objective_value = self.model.objective_value
+        return self.__matrix_results(termination, objective_value, None, None)
+
+    def __matrix_results(self, termination, objective_value, bound, wallclock_time) -> SolverResults:
+        return matrix_results(self.model, self.solver_type, termination, objective_value, bound, wallclock_time)
+
+
+def matrix_results(model, solver_name, termination, objective_value, bound, wallclock_time) -> SolverResults:
+    """Pyomo-style results of a matrix model solve, so that logging and checks are shared."""
+    results = SolverResults()
+    results.solver.name = solver_name
+    results.solver.status = SolverStatus.ok if objective_value is not None or \
+        termination == TerminationCondition.infeasible else SolverStatus.warning
+    results.solver.termination_condition = termination
+    if wallclock_time is not None:
+        results.solver.wallclock_time = wallclock_time
+    results.problem.name = model.name
+    results.problem.sense = model.sense
+    results.problem.number_of_variables = model.n_cols
+    results.problem.number_of_constraints = model.n_rows
+    results.problem.number_of_nonzeros = model.nnz
+    if objective_value is not None:
+        # the objective value bounds the optimum on one side, the best bound on the other
+        if bound is None and termination == TerminationCondition.optimal:
+            bound = objective_value
+        primal, dual = ('lower_bound', 'upper_bound') if model.sense == 'maximize' else ('upper_bound', 'lower_bound')
+        setattr(results.problem, primal, objective_value)
+        if bound is not None:
+            setattr(results.problem, dual, bound)
+    return results
+
+
+def objective_sense(model) -> str:
+    """'maximize' or 'minimize', for a Pyomo model or a MatrixModel."""
+    if isinstance(model, MatrixModel):
+        return model.sense
+    objective = next(model.component_data_objects(pyo.Objective, active=True))
+    return 'maximize' if objective.sense == pyo.maximize else 'minimize'
+
+
+def _finite(value):
+    return value if value is not None and abs(value) < 1e50 else None  # solvers report 1e50 or inf for none
+
+
+def solve_status(model, results) -> dict:
+    """
+    Status of a solve from its Pyomo-style results, 'optimal', 'time_limited' when it stopped
+    at its time limit with an incumbent or else its termination condition, with the objective
+    value of the incumbent held by the model, the best bound and their relative gap. Values
+    the solver did not report are None.
+    """
+    termination = results.solver.termination_condition
+    lower, upper = _finite(results.problem.lower_bound), _finite(results.problem.upper_bound)
+    incumbent, bound = (lower, upper) if objective_sense(model) == 'maximize' else (upper, lower)
+    objective_value = None
+    if incumbent is not None or termination == TerminationCondition.optimal:
+        objective_value = model.objective_value if isinstance(model, MatrixModel) else \
+            pyo.value(next(model.component_data_objects(pyo.Objective, active=True)), exception=False)
+    if termination == TerminationCondition.optimal:
+        status = OPTIMAL
+    elif termination == TerminationCondition.maxTimeLimit and objective_value is not None:
+        status = TIME_LIMITED
+    else:
+        status = str(termination)
+    return {'status': status, 'objective_value': objective_value, 'bound': bound, 'gap': relative_gap(objective_value, bound)}
 
 if __name__ == "__main__":
     test = ModelSolver()
@@ -0,0 +1,254 @@
+"""
+SOLVER PROGRESS
+
+Parses the output of the solvers into progress events while they run: the incumbent
+objective, the best bound, the relative gap, the branch-and-bound nodes and the elapsed
+seconds. An API job opens a `progress_log` and the events of its solves are appended to
+it as JSON lines, from which the API streams them to the clients of the job. Solves run
+while no progress log is open print their output as before, unparsed.
+
+The output of CBC and GLPK, and of HiGHS through Pyomo, is teed through a parser of the
+solver type on its way to stdout, the output of the racers of a SolverRace is followed
+in their log files and in-process HiGHS hands its log lines to a callback. CBC reports
+the objective in its internal minimisation sense, as do all solvers of the MPS file of a
+MatrixModel, which is written as a minimisation. It is turned back for maximisation
+models.
+"""
+import io
+import os
+import re
+import sys
+import time
+import orjson
+import contextlib
+import contextvars
+from conf import Config
+
+_current_log = contextvars.ContextVar('progress_log', default=None)
+_NUMBER = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+_NO_SOLUTION = 1e50  # objective printed by CBC before the first incumbent
+
+# CBC log lines, e.g.
+#   Continuous objective value is -1300.5 - 0.02 seconds
+#   Cbc0012I Integer solution of -1234 found by feasibility pump after 0 iterations and 0 nodes (0.12 seconds)
+#   Cbc0010I After 1000 nodes, 12 on tree, -1234 best solution, best possible -1300.2 (3.45 seconds)
+#   Cbc0001I Search completed - best objective -1250, took 5678 iterations and 90 nodes (12.34 seconds)
+CBC_PATTERNS = [
+    (re.compile(rf"Continuous objective value is {_NUMBER} - {_NUMBER} seconds"), ('bound', 'elapsed')),
+    (re.compile(rf"Cbc00(?:04|12)I Integer solution of {_NUMBER} .* (\d+) nodes \({_NUMBER} seconds\)"),
+     ('incumbent', 'nodes', 'elapsed')),
+    (re.compile(rf"Cbc0010I After (\d+) nodes, \d+ on tree, {_NUMBER} best solution, best possible {_NUMBER} \({_NUMBER} seconds\)"),
+     ('nodes', 'incumbent', 'bound', 'elapsed')),
+    (re.compile(rf"Cbc0001I Search completed - best objective {_NUMBER}, took \d+ iterations and (\d+) nodes \({_NUMBER} seconds\)"),
+     ('incumbent', 'nodes', 'elapsed')),
+]
+# GLPK branch-and-bound lines, "+ <iterations>: mip = <incumbent> <= <bound> <gap> (<active>; <solved>)", e.g.
+#   +   151: mip =   1.230000000e+03 <=   1.300000000e+03   5.4% (12; 3)
+#   +    20: >>>>>   1.100000000e+03 <=   1.300000000e+03  15.4% (8; 0)
+GLPK_PATTERN = re.compile(r"^\+\s*\d+: (?:mip =|>>>>>)\s+(not found yet|\S+) [<>]=\s+(tree is empty|\S+)\s.*\((\d+); (\d+)\)")
+
+
+def _number(text):
+    try:
+        value = float(text.rstrip('%s'))
+    except ValueError:
+        return None
+    return value if abs(value) < _NO_SOLUTION else None
+
+
+def relative_gap(incumbent, bound):
+    """Gap between the incumbent objective and the best bound, relative to the incumbent, or None."""
+    if incumbent is None or bound is None:
+        return None
+    return abs(bound - incumbent) / max(abs(incumbent), 1e-10)
+
+
+def parse_cbc(line):
+    """Fields of a CBC progress line, or None."""
+    for pattern, fields in CBC_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            return {field: int(value) if field == 'nodes' else _number(value) for field, value in zip(fields, match.groups())}
+    return None
+
+
+def parse_highs(line):
+    """
+    Fields of a row of the HiGHS MIP log table, or None: an optional source letter, then
+    nodes, queued nodes, leaves, explored %, best bound, best solution, gap, cuts, LP rows,
+    conflicts, LP iterations and the elapsed time.
+    """
+    parts = line.split()
+    if parts and len(parts[0]) == 1 and parts[0].isalpha():
+        parts = parts[1:]
+    if len(parts) != 12 or not parts[0].isdigit() or not parts[3].endswith('%') or not parts[11].endswith('s'):
+        return None
+    return {'nodes': int(parts[0]), 'bound': _number(parts[4]), 'incumbent': _number(parts[5]), 'elapsed': _number(parts[11])}
+
+
+def parse_glpk(line):
+    """Fields of a GLPK branch-and-bound line, or None. GLPK does not print the elapsed time."""
+    match = GLPK_PATTERN.search(line)
+    if match is None:
+        return None
+    incumbent, bound, _, solved = match.groups()
+    return {'incumbent': _number(incumbent), 'bound': _number(bound), 'nodes': int(solved)}
+
+
+PARSERS = {
+    'cbc': parse_cbc,
+    'highs': parse_highs,
+    'appsi_highs': parse_highs,
+    'glpk': parse_glpk,
+}
+
+
+class ProgressLog(object):
+    """Progress events of the solves of one job, appended to `path` as JSON lines."""
+    def __init__(self, path):
+        self.path = path
+
+    def publish(self, event):
+        # a single write of a whole line to a file opened for appending, so that the lines
+        # of concurrent solves (e.g. of the decomposed clusters) are not interleaved
+        with open(self.path, 'ab') as file:
+            file.write(orjson.dumps(event) + b'\n')
+
+    @staticmethod
+    def read(path, offset=0):
+        """Events appended to `path` past `offset`, as (offset after the event, event) pairs."""
+        try:
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return []
+        events = []
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break  # being written
+            offset += len(line)
+            events.append((offset, orjson.loads(line)))
+        return events
+
+
+class ProgressParser(object):
+    """
+    Progress of one solve, fed with the output of its solver. Publishes an event when the
+    incumbent or the bound changes, and otherwise at most every MIN_INTERVAL seconds.
+    """
+    def __init__(self, log, solver_type, model_name, sense='minimize', solver=None, minimised=False):
+        self.log = log
+        self.parse = PARSERS[solver_type]
+        # the objective of a maximisation model is negated in the output of a solver that minimises it
+        self.sign = -1 if sense == 'maximize' and (solver_type == 'cbc' or minimised) else 1
+        self.state = {'model': model_name, 'solver': solver or solver_type,
+                      'incumbent': None, 'bound': None, 'gap': None, 'nodes': None, 'elapsed': None}
+        self.min_interval = Config.SOLVER_PROGRESS['MIN_INTERVAL']
+        self.events = 0
+        self._start = time.perf_counter()
+        self._published, self._published_at = None, None
+        self._pending = ''
+
+    def feed(self, text):
+        """Solver output, in chunks of any size."""
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self.feed_line(line)
+
+    def feed_line(self, line):
+        fields = self.parse(line)
+        if not fields:
+            return
+        for key in ('incumbent', 'bound'):
+            if fields.get(key) is not None:
+                fields[key] *= self.sign
+        state = self.state
+        state.update((key, value) for key, value in fields.items() if value is not None)
+        if state.get('elapsed') is None or 'elapsed' not in fields:
+            state['elapsed'] = round(time.perf_counter() - self._start, 3)
+        if state['incumbent'] is not None and state['bound'] is not None:
+            state['gap'] = relative_gap(state['incumbent'], state['bound'])
+        improved = self._published is None or \
+            (state['incumbent'], state['bound']) != (self._published['incumbent'], self._published['bound'])
+        if improved or time.perf_counter() - self._published_at >= self.min_interval:
+            self.publish()
+
+    def publish(self):
+        event = dict(self.state, time=time.time())
+        self.log.publish(event)
+        self._published, self._published_at = event, time.perf_counter()
+        self.events += 1
+
+    def close(self):
+        """Parse a last unterminated line, and publish the final state if it was held back."""
+        if self._pending:
+            self.feed_line(self._pending)
+            self._pending = ''
+        if self._published is not None and any(self._published[k] != v for k, v in self.state.items()):
+            self.publish()
+
+
+class _ProgressStream(io.TextIOBase):
+    """Text stream writing through to `stream` and feeding the parser."""
+    def __init__(self, stream, parser):
+        self.stream = stream
+        self.parser = parser
+
+    def write(self, text):
+        self.stream.write(text)
+        self.parser.feed(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def progress_parser(solver_type, model_name, sense='minimize', solver=None, minimised=False):
+    """
+    Parser of a solve in the current progress log, None outside of one or for a solver type
+    without a parser. `minimised` if the model was handed to the solver as a minimisation.
+    """
+    log = _current_log.get()
+    if log is None or solver_type not in PARSERS:
+        return None
+    return ProgressParser(log, solver_type, model_name, sense, solver, minimised)
+
+
+@contextlib.contextmanager
+def capture_progress(solver_type, model_name, sense='minimize'):
+    """
+    Tee what is printed in this context, i.e. the output of a solver run with `tee=True`,
+    through a progress parser. Yields the parser, or None outside of a progress log.
+    """
+    parser = progress_parser(solver_type, model_name, sense)
+    if parser is None:
+        yield None
+        return
+    with contextlib.ExitStack() as stack:
+        # written through to a duplicate of the stdout file descriptor, which solver interfaces
+        # capturing the descriptor itself (e.g. appsi) do not redirect back into their capture
+        stream = sys.stdout
+        try:
+            stream.flush()
+            stream = stack.enter_context(os.fdopen(os.dup(stream.fileno()), 'w', buffering=1))
+        except (AttributeError, OSError, ValueError):
+            pass  # stdout without a file descriptor, e.g. captured by a test runner
+        stack.callback(parser.close)
+        stack.enter_context(contextlib.redirect_stdout(_ProgressStream(stream, parser)))
+        yield parser
+
+
+@contextlib.contextmanager
+def progress_log(path):
+    """Progress log of the solves run in this context, e.g. those of an API job. Yields None when SOLVER_PROGRESS is disabled."""
+    if not Config.SOLVER_PROGRESS['ENABLED']:
+        yield None
+        return
+    log = ProgressLog(os.fspath(path))
+    token = _current_log.set(log)
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
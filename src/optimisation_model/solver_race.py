@@ -0,0 +1,377 @@
+"""
+SOLVER RACE CLASS
+
+Solve times of the operational MIPs vary a lot between solvers and option sets, and no
+single configuration is fastest on every instance. A race writes the model once and
+starts each configured racer (a solver type with its options, e.g. CBC with another seed
+or node strategy, GLPK, HiGHS) on it as a separate process. The first racer to prove
+optimality wins and the others are terminated. Racers stop themselves at the deadline,
+through their own time limit option, and report their best incumbent; the best of these
+is kept. An infeasibility proof of any racer ends the race as well.
+
+Racers compete for the CPU cores, so a race pays off on hosts with at least as many
+idle cores as racers. Each racer runs single-threaded, in one of the solver slots held by
+the race (see solver_scheduler), and the racers beyond the slots held are left out, the
+first configured ones racing.
+
+    cbc:   the CBC executable, solution read from its -solu file
+    glpk:  the glpsol executable, solution read from its -w file, column names from --wglp
+    highs: HiGHS run by highs_runner.py in a Python subprocess
+"""
+import os
+import sys
+import json
+import math
+import signal
+import logging
+import collections
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import pyomo.environ as pyo
+from pathlib import Path
+from pyomo.opt import SolverStatus, TerminationCondition, SolverResults
+from conf import Logger
+from conf import Config
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.solver import matrix_results
+from src.optimisation_model.solver_progress import progress_parser
+
+TIME_LIMIT_OPTIONS = {'cbc': 'seconds', 'glpk': 'tmlim', 'highs': 'time_limit'}
+THREADS_OPTIONS = {'cbc': 'threads', 'highs': 'threads'}  # GLPK is single-threaded
+EXECUTABLES = {'cbc': 'cbc', 'glpk': 'glpsol'}
+HIGHS_RUNNER = Path(__file__).with_name('highs_runner.py')
+TERMINATIONS = {
+    'optimal': TerminationCondition.optimal,
+    'time_limit': TerminationCondition.maxTimeLimit,
+    'infeasible': TerminationCondition.infeasible,
+    'unbounded': TerminationCondition.unbounded,
+}
+
+
+class Racer(object):
+    """One solver process of a race."""
+    def __init__(self, name, solver_type, options, executable):
+        self.name = name
+        self.solver_type = solver_type
+        self.options = options
+        self.executable = executable
+        self.process = None
+        self.status = 'waiting'  # then running, terminated or a status read from the solution
+        self.values = None  # column values by name of the reported solution
+        self.objective_value = None
+        self.solve_time = None
+        self.progress = None  # parser of its log, within a progress log
+        self._log_offset = 0
+
+    def __str__(self):
+        return f"{self.name} ({self.solver_type}) {self.status}" + \
+               (f" {self.objective_value:,.2f}" if self.objective_value is not None else '') + \
+               (f" in {self.solve_time:.3f}s" if self.solve_time is not None else '')
+
+    def start(self, problem_file, work_dir, start_values=None):
+        self.work_dir = Path(work_dir, self.name)
+        self.work_dir.mkdir()
+        self.log_file = self.work_dir / 'solver.log'
+        self.solution_file = self.work_dir / 'solution'
+        command = self.__command(problem_file, start_values)
+        self._start = time.perf_counter()
+        with open(self.log_file, 'w') as log:
+            # in a session of its own, so that a terminated racer takes its child processes along
+            self.process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        self.status = 'running'
+
+    def __command(self, problem_file, start_values):
+        is_mps = Path(problem_file).suffix == '.mps'
+        if self.solver_type == 'cbc':
+            command = [self.executable, str(problem_file)]
+            command += [arg for k, v in self.options.items() for arg in (f"-{k}", str(v))]
+            if start_values:
+                start_file = self.work_dir / 'start.sol'
+                with open(start_file, 'w') as file:
+                    file.writelines(f"{i} {name} {value!r}\n" for i, (name, value) in enumerate(start_values.items()))
+                command += ['-mipstart', str(start_file)]
+            return command + ['-solve', '-solu', str(self.solution_file)]
+        if self.solver_type == 'glpk':
+            command = [self.executable, '--freemps' if is_mps else '--lp', str(problem_file)]
+            command += [arg for k, v in self.options.items() for arg in (f"--{k}", str(v))]
+            return command + ['--wglp', str(self.work_dir / 'problem.glp'), '-w', str(self.solution_file)]
+        options_file = self.work_dir / 'options.json'
+        options_file.write_text(json.dumps(self.options))
+        command = [self.executable, str(HIGHS_RUNNER), str(problem_file), str(self.solution_file),
+                   '--options', str(options_file)]
+        if start_values:
+            start_file = self.work_dir / 'start.json'
+            start_file.write_text(json.dumps(start_values))
+            command += ['--start', str(start_file)]
+        return command
+
+    def follow_log(self):
+        """Feed the output written to the log since the last call to the progress parser."""
+        if self.progress is None:
+            return
+        with open(self.log_file, 'rb') as log:
+            log.seek(self._log_offset)
+            output = log.read()
+        self._log_offset += len(output)
+        self.progress.feed(output.decode(errors='replace'))
+
+    def poll(self):
+        """True once the process has ended, with its status and solution read."""
+        if self.process.poll() is None:
+            self.follow_log()
+            return False
+        self.follow_log()
+        if self.progress is not None:
+            self.progress.close()
+        self.solve_time = time.perf_counter() - self._start
+        try:
+            self.status, self.values = self.__read_solution()
+        except (OSError, ValueError, IndexError) as e:
+            self.status, self.values = f"failed ({e})", None
+        return True
+
+    def __read_solution(self):
+        if self.solver_type == 'highs':
+            solution = json.loads(self.solution_file.read_text())
+            return solution['status'], solution['values']
+        if self.solver_type == 'cbc':
+            # header like "Optimal - objective value -123.0", then "index name value reduced cost" rows
+            header, *rows = self.solution_file.read_text().splitlines()
+            status = header.split(' - ')[0].strip().lower()
+            if status.startswith('optimal'):
+                status = 'optimal'
+            elif 'infeasible' in status:
+                return 'infeasible', None
+            elif 'time' in status and 'no integer solution' not in status:
+                status = 'time_limit'
+            else:
+                return status, None
+            values = {}
+            for row in rows:
+                _, name, value = row.replace('**', '').split()[:3]
+                values[name] = float(value)
+            return status, values
+        # glpsol raw solution: "s mip <rows> <cols> <status> <objective>" and "j <col> <value>" rows
+        names = {}
+        with open(self.work_dir / 'problem.glp') as file:
+            for line in file:
+                if line.startswith('n j '):
+                    _, _, col, name = line.split()
+                    names[col] = name
+        status, values = None, {}
+        with open(self.solution_file) as file:
+            for line in file:
+                parts = line.split()
+                if parts[0] == 's':
+                    mip = parts[1] == 'mip'
+                    status = {'o': 'optimal', 'f': 'time_limit', 'n': 'infeasible'}.get(parts[4], 'unknown')
+                elif parts[0] == 'j':
+                    values[names[parts[1]]] = float(parts[2] if mip else parts[3])
+        return status, values if status in ('optimal', 'time_limit') else None
+
+    def __signal(self, signum):
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.process.pid, signum)
+            except ProcessLookupError:
+                pass
+        else:  # Windows, without process groups
+            self.process.terminate()
+
+    def terminate(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.__signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.__signal(signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+            self.process.wait()
+        self.solve_time = time.perf_counter() - self._start
+        self.status = 'terminated'
+
+
+class SolverRace(object):
+    """
+    Races the configured solvers on a Pyomo model or a MatrixModel and loads the kept
+    solution into it. Exposes `results` like a ModelSolver, with the winning racer as the
+    solver name, and `racers` with the outcome of each. At most `max_racers` racers are
+    started, e.g. one per solver slot held.
+    """
+    POLL_SECONDS = 0.05
+    KILL_GRACE_SECONDS = 30  # past the deadline, racers still running are killed
+    LOG_TAIL_LINES = 20  # last lines of the log of the winner logged when debugging, e.g. its final statistics
+
+    def __init__(self, model, racers=None, deadline=None, warmstart=False, max_racers=None):
+        self._logger = Logger().logger
+        settings = Config.OPTIMISATION_MODELLING_CONFIG['solver_race']
+        self.model = model
+        # a given deadline, e.g. of a request, replaces the time limits of the racers, the configured one caps them
+        self.deadline_given = deadline is not None
+        self.deadline = deadline or settings['deadline']
+        self.warmstart = warmstart
+        self.racers = self.__racers(racers or settings['racers'], max_racers)
+        self.winner = None
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as work_dir:
+            problem_file = self.__write(work_dir)
+            self.__race(problem_file, work_dir)
+        self.solve_time = time.perf_counter() - start
+        self.results = self.__results()
+        self._logger.info("[SolverRace] Model %s raced in %.3fs: %s.",
+                          self.model.name, self.solve_time, '; '.join(str(racer) for racer in self.racers))
+
+    def __racers(self, racer_settings, max_racers=None):
+        solver_options = Config.OPTIMISATION_MODELLING_CONFIG['solver_option']
+        racers = []
+        for i, settings in enumerate(racer_settings):
+            solver_type = settings['solver_type']
+            if solver_type not in TIME_LIMIT_OPTIONS:
+                raise ValueError(f"Solver races support {sorted(TIME_LIMIT_OPTIONS)}, not {solver_type}.")
+            executable = sys.executable if solver_type == 'highs' else \
+                shutil.which(EXECUTABLES[solver_type]) or Config.OPTIMISATION_MODELLING_CONFIG['solver_loc'].get(solver_type)
+            if executable is None or not Path(executable).is_file():
+                self._logger.warning("[SolverRace] No %s executable found, racer %s left out.", solver_type, i)
+                continue
+            options = dict(solver_options.get(solver_type, {}), **settings.get('options', {}))
+            time_limit = TIME_LIMIT_OPTIONS[solver_type]
+            options[time_limit] = self.deadline if self.deadline_given else min(options.get(time_limit, self.deadline), self.deadline)
+            if solver_type == 'glpk':
+                options[time_limit] = math.ceil(options[time_limit])
+            if solver_type in THREADS_OPTIONS:
+                options[THREADS_OPTIONS[solver_type]] = 1  # within its solver slot
+            racers.append(Racer(settings.get('name', f"{solver_type}_{i}"), solver_type, options, executable))
+        if not racers:
+            raise Exception("Model optimisation failed with race with error message no racer could be started.")
+        if max_racers is not None and len(racers) > max_racers:
+            self._logger.info("[SolverRace] %s solver slot(s) held, racers %s left out.",
+                              max_racers, ', '.join(racer.name for racer in racers[max_racers:]))
+            racers = racers[:max(max_racers, 1)]
+        return racers
+
+    def __write(self, work_dir):
+        """
+        Write the model once for all racers, and index its columns: the objective
+        coefficient of each column name and, for a Pyomo model, its variable.
+        """
+        if isinstance(self.model, MatrixModel):
+            problem_file = Path(work_dir, 'model.mps')
+            self.model.write(problem_file)
+            self._names = [f"C{j}" for j in range(self.model.n_cols)]
+            self._objective = dict(zip(self._names, self.model.c.tolist()))
+            self._constant = 0.0
+            return problem_file
+        from pyomo.repn import generate_standard_repn
+
+        problem_file = Path(work_dir, 'model.lp')
+        _, symbol_map_id = self.model.write(str(problem_file), io_options={'symbolic_solver_labels': False})
+        symbol_map = self.model.solutions.symbol_map[symbol_map_id]
+        self._variables = {name: obj for name, obj in symbol_map.bySymbol.items()
+                           if obj.ctype is pyo.Var and obj.parent_block() is not None}
+        self._names = list(self._variables)
+        objective = next(self.model.component_data_objects(pyo.Objective, active=True))
+        repn = generate_standard_repn(objective.expr)
+        self._objective = {symbol_map.getSymbol(var): coef for var, coef in zip(repn.linear_vars, repn.linear_coefs)}
+        self._constant = repn.constant
+        return problem_file
+
+    def __start_values(self):
+        """Nonzero values of the current solution by column name, the warm start of the cbc and highs racers."""
+        if not self.warmstart:
+            return None
+        if isinstance(self.model, MatrixModel):
+            values = np.nan_to_num(self.model.solution).tolist()
+            return {name: value for name, value in zip(self._names, values) if value}
+        return {name: var.value for name, var in self._variables.items() if var.value}
+
+    def __race(self, problem_file, work_dir):
+        start_values = self.__start_values()
+        for racer in self.racers:
+            racer.progress = progress_parser(racer.solver_type, self.model.name, self.__sense(), racer.name,
+                                             minimised=isinstance(self.model, MatrixModel))
+            racer.start(problem_file, work_dir, start_values if racer.solver_type != 'glpk' else None)
+        kill_at = time.perf_counter() + self.deadline + self.KILL_GRACE_SECONDS
+        running = list(self.racers)
+        try:
+            while running and time.perf_counter() < kill_at:
+                finished = [racer for racer in running if racer.poll()]
+                for racer in finished:
+                    running.remove(racer)
+                    if racer.values is not None:
+                        racer.objective_value = self.__objective_value(racer.values)
+                proofs = [racer for racer in finished if racer.status in ('optimal', 'infeasible')]
+                if proofs:
+                    self.winner = proofs[0]
+                    return
+                time.sleep(self.POLL_SECONDS)
+        finally:
+            for racer in running:
+                racer.terminate()
+            self.__load()
+
+    def __objective_value(self, values):
+        return self._constant + sum(coef * values.get(name, 0.0) for name, coef in self._objective.items())
+
+    def __load(self):
+        """Load the solution of the winner or, without one, the best incumbent at the deadline."""
+        if self.winner is None:
+            incumbents = [racer for racer in self.racers if racer.objective_value is not None]
+            if incumbents:
+                sign = 1 if self.__sense() == 'maximize' else -1
+                self.winner = max(incumbents, key=lambda racer: sign * racer.objective_value)
+        if self.winner is None:
+            return
+        if self._logger.isEnabledFor(logging.DEBUG):
+            with open(self.winner.log_file, errors='replace') as log:
+                tail = collections.deque(log, maxlen=self.LOG_TAIL_LINES)
+            self._logger.debug("[SolverRace] Output of %s ends with:\n%s", self.winner.name, ''.join(tail).rstrip())
+        if self.winner.values is None:
+            return
+        values = self.winner.values
+        if isinstance(self.model, MatrixModel):
+            self.model.load_solution([values.get(name, 0.0) for name in self._names], self.winner.objective_value)
+        else:
+            for name, var in self._variables.items():
+                if not var.fixed:
+                    var.set_value(values.get(name, 0.0), skip_validation=True)
+
+    def __sense(self):
+        if isinstance(self.model, MatrixModel):
+            return self.model.sense
+        objective = next(self.model.component_data_objects(pyo.Objective, active=True))
+        return 'maximize' if objective.sense == pyo.maximize else 'minimize'
+
+    def __results(self) -> SolverResults:
+        if self.winner is None:
+            termination = TerminationCondition.maxTimeLimit
+        else:
+            termination = TERMINATIONS.get(self.winner.status, TerminationCondition.unknown)
+        objective_value = self.winner.objective_value if self.winner is not None else None
+        # the best bound is that of a proven optimum, or the last one in the progress of the winner
+        bound = None
+        if objective_value is not None and termination == TerminationCondition.optimal:
+            bound = objective_value
+        elif objective_value is not None and self.winner.progress is not None:
+            bound = self.winner.progress.state['bound']
+        solver_name = f"race:{self.winner.name if self.winner is not None else 'none'}"
+        if isinstance(self.model, MatrixModel):
+            return matrix_results(self.model, solver_name, termination, objective_value, bound, self.solve_time)
+        sense = self.__sense()
+        results = SolverResults()
+        results.solver.name = solver_name
+        results.solver.status = SolverStatus.ok if objective_value is not None or \
+            termination == TerminationCondition.infeasible else SolverStatus.warning
+        results.solver.termination_condition = termination
+        results.solver.wallclock_time = self.solve_time
+        results.problem.name = self.model.name
+        results.problem.sense = sense
+        results.problem.number_of_variables = len(self._names)
+        if objective_value is not None:
+            primal, dual = ('lower_bound', 'upper_bound') if sense == 'maximize' else ('upper_bound', 'lower_bound')
+            setattr(results.problem, primal, objective_value)
+            if bound is not None:
+                setattr(results.problem, dual, bound)
+        return results
@@ -0,0 +1,112 @@
+"""
+SOLVER SCHEDULER
+
+Every solve of every process on the host (API workers, their job pools, command line
+runs) takes solver slots before it starts, so that bursts of requests queue for the CPU
+instead of oversubscribing it. A slot is an exclusive lock (flock) on one of SLOTS files
+in the shared SLOT_DIR, so the limit holds across processes without a coordinator, and
+the slots of a process that dies are released with its files.
+
+A MIP solve takes as many free slots as it can, up to MAX_THREADS, and runs with that
+many solver threads (CBC `threads`). Under load every solve gets a single thread, on an
+idle host a solve gets several. LPs take a single slot.
+"""
+import os
+import time
+import contextlib
+from pathlib import Path
+from conf import Logger
+from conf import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class SolverCapacityTimeout(Exception):
+    """Raised when no solver slot frees up within the scheduler timeout."""
+
+
+class SolverSlots(object):
+    """`n_slots` host-wide solver slots, as lock files in `slot_dir`."""
+    POLL_SECONDS = 0.1
+
+    def __init__(self, n_slots=None, slot_dir=None):
+        settings = Config.SOLVER_SCHEDULER
+        self.n_slots = n_slots or settings['SLOTS'] or os.cpu_count() or 1
+        self.slot_dir = Path(slot_dir or settings['SLOT_DIR'])
+        self.slot_dir.mkdir(parents=True, exist_ok=True)
+
+    def __try_lock(self, slot):
+        file = open(self.slot_dir / f"slot_{slot}.lock", 'w')
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return None
+        return file
+
+    def acquire(self, wanted=1, timeout=None):
+        """
+        Lock up to `wanted` free slots, waiting up to `timeout` seconds for the first one.
+        Returns the lock files held, to be passed to `release`.
+        """
+        wanted = max(1, min(wanted, self.n_slots))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # start from another slot in each process, so that the processes do not all probe slot 0 first
+        first = os.getpid() % self.n_slots
+        while True:
+            held = []
+            for i in range(self.n_slots):
+                file = self.__try_lock((first + i) % self.n_slots)
+                if file is not None:
+                    held.append(file)
+                    if len(held) == wanted:
+                        break
+            if held:
+                return held
+            if deadline is not None and time.monotonic() > deadline:
+                raise SolverCapacityTimeout(f"No solver slot of {self.n_slots} freed up within {timeout}s.")
+            time.sleep(self.POLL_SECONDS)
+
+    @staticmethod
+    def release(held):
+        for file in held:
+            fcntl.flock(file, fcntl.LOCK_UN)
+            file.close()
+
+    def in_use(self):
+        """Number of slots held by any process, e.g. for admission control."""
+        busy = 0
+        for slot in range(self.n_slots):
+            file = self.__try_lock(slot)
+            if file is None:
+                busy += 1
+            else:
+                self.release([file])
+        return busy
+
+
+@contextlib.contextmanager
+def solver_slots(wanted=1):
+    """
+    Hold up to `wanted` solver slots for the duration of a solve and yield the number of
+    threads the solve may use. Yields `wanted` without waiting when the scheduler is disabled
+    or where file locks are not available.
+    """
+    settings = Config.SOLVER_SCHEDULER
+    if not settings['ENABLED'] or fcntl is None:
+        yield wanted
+        return
+    logger = Logger().logger
+    slots = SolverSlots()
+    start = time.perf_counter()
+    held = slots.acquire(wanted, settings['TIMEOUT'])
+    waited = time.perf_counter() - start
+    if waited > 1:
+        logger.info("[SolverScheduler] Waited %.1fs for %s of %s solver slots.", waited, len(held), slots.n_slots)
+    try:
+        yield len(held)
+    finally:
+        slots.release(held)
@@ -0,0 +1,223 @@
+"""
+STAGE METRICS
+
+Structured spans of the pipeline stages. `main()` (or an API job) opens a profile and
+each stage runs in a `span`, which records its wall time, its CPU time (including the
+solver subprocesses it waited for), the peak resident memory of the process during the
+stage and, when given a model, the model size. Spans opened while no profile is active,
+e.g. by a ModelSolver used on its own, cost nothing.
+
+The size of a model is taken when its span closes, outside of the span timings and
+before the solver transformations fix variables or deactivate constraints. Matrix models
+know their size, a Pyomo model is only counted with MODEL_SIZE, as counting its nonzeros
+is a pass over all of its constraint expressions.
+
+The peak memory is the process high-water mark (VmHWM), reset at the start of each span
+on Linux. Elsewhere only the high-water mark of the whole process is available. A
+profile with `memory='tracemalloc'` records the peak of the traced Python heap above its
+size at the start of the span instead, which is slower but attributes the allocations
+to the stages, e.g. for benchmarks.
+"""
+import os
+import time
+import tracemalloc
+import contextlib
+import contextvars
+from conf import Config
+
+_current_profile = contextvars.ContextVar('stage_profile', default=None)
+_CLEAR_REFS, _STATUS = '/proc/self/clear_refs', '/proc/self/status'
+
+
+def _reset_peak_rss():
+    """Reset the process high-water mark, False where it cannot be reset."""
+    try:
+        with open(_CLEAR_REFS, 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    """Process high-water mark in bytes, or None."""
+    try:
+        with open(_STATUS) as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024  # bytes on macOS, kB elsewhere
+    except (ImportError, AttributeError):
+        return None
+
+
+def _cpu_time():
+    """CPU time of the process and of its waited-for children, e.g. the CBC executable."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def model_size(model):
+    """(variables, constraints, nonzeros) of a Pyomo or a matrix model."""
+    if hasattr(model, 'nnz'):
+        return model.n_cols, model.n_rows, model.nnz
+    import pyomo.environ as pyo
+    from pyomo.core.expr.visitor import identify_variables
+    n_variables = sum(1 for _ in model.component_data_objects(pyo.Var, descend_into=True))
+    n_constraints, n_nonzeros = 0, 0
+    for constraint in model.component_data_objects(pyo.Constraint, active=True, descend_into=True):
+        n_constraints += 1
+        n_nonzeros += sum(1 for _ in identify_variables(constraint.body, include_fixed=False))
+    return n_variables, n_constraints, n_nonzeros
+
+
+class StageSpan(object):
+    """One stage of a profile, measured from its `start()` to its `stop()`."""
+    def __init__(self, profile, stage, parent=None):
+        self.profile = profile
+        self.stage = stage
+        self.parent = parent
+        self.model = None
+        self.peak_memory = None
+        self.details = {}
+        self._model_size = None
+
+    def set_model(self, model):
+        """Model built or solved by the stage, measured when the span is closed."""
+        self.model = model
+
+    def annotate(self, **details):
+        """Further figures of the stage, e.g. the offers removed by the presolve."""
+        self.details.update(details)
+
+    def start(self):
+        self.profile.checkpoint_memory()
+        self._base_memory = self.profile.base_memory()
+        self._wall, self._cpu = time.perf_counter(), _cpu_time()
+
+    def stop(self):
+        self.wall_seconds = time.perf_counter() - self._wall
+        self.cpu_seconds = _cpu_time() - self._cpu
+        self.profile.checkpoint_memory()
+        if self.model is not None and (hasattr(self.model, 'nnz') or Config.STAGE_METRICS['MODEL_SIZE']):
+            self._model_size = model_size(self.model)
+        self.model = None  # not kept alive by the profile
+
+    def as_dict(self):
+        record = {
+            'stage': self.stage,
+            'parent': self.parent,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            f"peak_{self.profile.memory}_mib": round((self.peak_memory - self._base_memory) / 2 ** 20, 2) if self.peak_memory is not None else None,
+        }
+        if self._model_size is not None:
+            record['variables'], record['constraints'], record['nonzeros'] = self._model_size
+        record.update(self.details)
+        return record
+
+
+class StageProfile(object):
+    """Spans of the stages of one run, in the order they were opened."""
+    def __init__(self, memory='rss'):
+        self.spans = []
+        self._open = []
+        self.memory = memory
+        self._tracing = memory == 'tracemalloc' and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        self.per_span_peak = self.__reset_peak()
+
+    def __peak(self):
+        return tracemalloc.get_traced_memory()[1] if self.memory == 'tracemalloc' else _peak_rss()
+
+    def __reset_peak(self):
+        if self.memory != 'tracemalloc':
+            return _reset_peak_rss()
+        if not hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+            return False
+        tracemalloc.reset_peak()
+        return True
+
+    def base_memory(self):
+        """Memory the peaks of a new span are measured from, the traced heap or zero for the RSS."""
+        return tracemalloc.get_traced_memory()[0] if self.memory == 'tracemalloc' else 0
+
+    def checkpoint_memory(self):
+        """Fold the peak memory into the open spans, then reset it so that each span sees its own peak."""
+        peak = self.__peak()
+        for open_span in self._open:
+            if peak is not None:
+                open_span.peak_memory = max(open_span.peak_memory or 0, peak)
+        if self.per_span_peak:
+            self.__reset_peak()
+
+    def close(self):
+        if self._tracing:
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        stage_span = StageSpan(self, stage, self._open[-1].stage if self._open else None)
+        stage_span.start()
+        self._open.append(stage_span)
+        try:
+            yield stage_span
+        finally:
+            stage_span.stop()
+            self._open.remove(stage_span)
+            self.spans.append(stage_span)
+
+    def as_list(self):
+        """Spans in opening order, as dicts."""
+        return [stage_span.as_dict() for stage_span in sorted(self.spans, key=lambda s: s._wall)]
+
+    def summary(self):
+        """One line of the top-level stage wall times."""
+        return ', '.join(f"{s.stage} {s.wall_seconds:.3f}s" for s in sorted(self.spans, key=lambda s: s._wall)
+                         if s.parent is None)
+
+
+class _NoSpan(object):
+    """Span outside of any profile."""
+    def set_model(self, model):
+        pass
+
+    def annotate(self, **details):
+        pass
+
+
+@contextlib.contextmanager
+def profile(memory='rss'):
+    """
+    Profile of the stages run in this context, measuring the peak `memory` 'rss' or
+    'tracemalloc'. Nested profiles, e.g. main() run by an API job, record into the
+    outer one. Yields None when STAGE_METRICS is disabled.
+    """
+    current = _current_profile.get()
+    if current is not None or not Config.STAGE_METRICS['ENABLED']:
+        yield current
+        return
+    stage_profile = StageProfile(memory)
+    token = _current_profile.set(stage_profile)
+    try:
+        yield stage_profile
+    finally:
+        _current_profile.reset(token)
+        stage_profile.close()
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Span of a stage in the current profile, a no-op outside of a profile."""
+    current = _current_profile.get()
+    if current is None:
+        yield _NoSpan()
+        return
+    with current.span(stage) as stage_span:
+        yield stage_span
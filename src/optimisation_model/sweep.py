@@ -0,0 +1,115 @@
+"""
+PARAMETRIC SWEEP CLASS
+
+Solves the campaign for a grid of budget and ROI values. The data is preprocessed and
+the tactical model built once, with mutable budget and hurdle rate parameters, and the
+grid points are re-solved in increasing budget order, by default with the persistent
+solver backend so that each solve starts from the previous one.
+
+Usage:
+    python -m src.optimisation_model.sweep --budgets 100 200 300 --rois 120 150
+    python -m src.optimisation_model.sweep --input payload.json --budgets 100 200 --operational --output sweep.json
+"""
+import time
+import argparse
+import orjson
+from conf import Logger
+from conf import Config
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.solver import ModelSolver, solve_deadline, solve_status
+from src.optimisation_model.postprocessing import Postprocessing
+from main import MODEL_BUILDERS, solve_operational
+
+
+class ParametricSweep(object):
+    """
+    Profit against budget (and ROI) curve of the campaign. Each point of `results`
+    holds the tactical figures and, with `operational`, the operational ones.
+    """
+    def __init__(self, processed_data: Preprocessing, budgets=None, rois=None, operational=False, solver_backend=None):
+        self._logger = Logger().logger
+        self.processed_data = processed_data
+        self.budgets = sorted(set(budgets or [processed_data.budget]))
+        self.rois = sorted(set(rois or [100 * (1 + processed_data.roi)]))
+        self.operational = operational
+        self.solver_backend = solver_backend or Config.OPTIMISATION_MODELLING_CONFIG['sweep_solver_backend']
+        TacticalModel, _ = MODEL_BUILDERS[Config.OPTIMISATION_MODELLING_CONFIG['model_builder']]
+        self.tactical_model = TacticalModel(processed_data)
+        self.results = [self.__solve_point(budget, roi) for roi in self.rois for budget in self.budgets]
+        self.compiled_json_results = {"sweep": self.results}
+
+    def __solve_point(self, budget, roi):
+        point = {'budget': budget, 'roi': roi}
+        self.tactical_model.update_parameters(budget=budget, hurdle_rate=(roi - 100) / 100)
+        model = self.tactical_model.model
+        start = time.perf_counter()
+        try:
+            solver = ModelSolver(model, solver_backend=self.solver_backend)
+        except Exception as e:
+            self._logger.warning("[Sweep] No tactical solution for budget %s and ROI %s: %s", budget, roi, e)
+            return dict(point, status='infeasible' if isinstance(e, ValueError) else 'failed', error=str(e))
+        keys = list(model.cp)
+        y = Postprocessing._values(model, 'y', keys)
+        expected_profit = float(Postprocessing._values(model, 'expected_profit', keys) @ y)
+        expected_cost = float(Postprocessing._values(model, 'expected_cost', keys) @ y)
+        point.update(
+            status=solver.status,
+            money_expected_profit=round(expected_profit, 2),
+            money_expected_cost=round(expected_cost, 2),
+            increased_budget=round(model.z.value, 2),
+            optimal_ROI=round(100 * expected_profit / expected_cost, 2) if expected_cost else None,
+        )
+        if self.operational:
+            point.update(self.__solve_operational())
+        point['solve_time'] = round(time.perf_counter() - start, 3)
+        self._logger.info("[Sweep] Budget %s and ROI %s: %s", budget, roi, point)
+        return point
+
+    def __solve_operational(self):
+        try:
+            operational_solver, operation_opt_model = solve_operational(self.tactical_model.model, self.processed_data)
+        except Exception as e:
+            self._logger.warning("[Sweep] No operational solution: %s", e)
+            return {'operational_status': 'infeasible' if isinstance(e, ValueError) else 'failed', 'operational_error': str(e)}
+        keys = list(operation_opt_model.ccp)
+        x = Postprocessing._values(operation_opt_model, 'x', keys)
+        selected = x > 0.5
+        profit = float(Postprocessing._values(operation_opt_model, 'customer_profit', keys)[selected] @ x[selected])
+        cost = float(Postprocessing._values(operation_opt_model, 'customer_cost', keys)[selected] @ x[selected])
+        return {
+            'operational_status': solve_status(operational_solver.model, operational_solver.results)['status'],
+            'customer_expected_profit': round(profit, 2),
+            'customer_expected_cost': round(cost, 2),
+            'customer_optimal_ROI': round(100 * profit / cost, 2) if cost else None,
+        }
+
+
+def run_sweep(inputs):
+    """
+    Sweep of an API request: the optimisation input with `budgets`, `rois` and `operational`
+    entries, and its `time_limit` as the deadline of the whole sweep. Returns the compiled
+    JSON results.
+    """
+    inputs = dict(inputs)
+    budgets, rois, operational = inputs.pop('budgets', None), inputs.pop('rois', None), inputs.pop('operational', False)
+    with solve_deadline(inputs.get('time_limit')):
+        return ParametricSweep(Preprocessing(inputs), budgets, rois, operational).compiled_json_results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the campaign for a grid of budget and ROI values.")
+    parser.add_argument('--input', help="JSON file with the API optimisation input, the CSV input files otherwise")
+    parser.add_argument('--budgets', type=float, nargs='+', help="campaign budgets")
+    parser.add_argument('--rois', type=float, nargs='+', help="minimum ROI values, in percent")
+    parser.add_argument('--operational', action='store_true', help="also solve the operational model of each point")
+    parser.add_argument('--output', help="JSON file for the results, printed otherwise")
+    args = parser.parse_args()
+
+    api_data = orjson.loads(open(args.input, 'rb').read()) if args.input else None
+    sweep = ParametricSweep(Preprocessing(api_data), args.budgets, args.rois, args.operational)
+    output = orjson.dumps(sweep.compiled_json_results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    if args.output:
+        with open(args.output, 'wb') as file:
+            file.write(output)
+    else:
+        print(output.decode())
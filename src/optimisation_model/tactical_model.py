@@ -1,7 +1,6 @@
 import pyomo.environ as pyo
 from src.optimisation_model.preprocessing import Preprocessing
 from conf import Logger
-from itertools import product
 
 
 class TacticalOptimisationModel(object):
@@ -12,25 +11,26 @@ class TacticalOptimisationModel(object):
     def __init__(self, processed_data: Preprocessing):
         self._logger = Logger().logger
         self.processed_data = processed_data
-        self.model = pyo.ConcreteModel()
+        self.model = pyo.ConcreteModel(name='tactical')
         self.model.optimised = False
         self.__build_model()
         
     def __build_model(self):
         self._logger.debug("[ModelBuilding] Defining model indicies and sets initiated...")
-        self.model.products = pyo.Set(initialize=[p.product_type for p in self.processed_data.product_list])
-        self.model.clusters = pyo.Set(initialize=[k.cluster for k in self.processed_data.cluster_list])
-        self.model.cp = pyo.Set(initialize=list(product(self.model.clusters, self.model.products)))
+        data = self.processed_data.data
+        self.model.products = pyo.Set(initialize=data.products.tolist())
+        self.model.clusters = pyo.Set(initialize=data.clusters.tolist())
+        self.model.cp = pyo.Set(initialize=data.cp_keys())
         self._logger.info("[ModelBuilding] Defining model indicies and sets completed successfully.")
 
         self._logger.debug("[ModelBuilding] Defining model parameters initiated...")
-        self.model.number_customers = pyo.Param(self.model.clusters, initialize={k.cluster: k.customer_count for k in self.processed_data.cluster_list}, domain=pyo.Any)
-        self.model.min_offers = pyo.Param(self.model.products, initialize={p.product_type: p.product_count for p in self.processed_data.product_list}, domain=pyo.Any)
-        self.model.expected_profit = pyo.Param(self.model.cp, initialize={g: self.processed_data.product_profit[g] for g in self.model.cp}, domain=pyo.Any)
-        self.model.expected_cost = pyo.Param(self.model.cp, initialize={g: self.processed_data.product_cost[g] for g in self.model.cp}, domain=pyo.Any)
-        # fixed given value
-        self.model.hurdle_rate = pyo.Param(initialize=self.processed_data.roi) # fixed given value
-        self.model.budget = pyo.Param(initialize=self.processed_data.budget)
+        self.model.number_customers = pyo.Param(self.model.clusters, initialize=dict(zip(data.clusters.tolist(), data.cluster_size.tolist())), domain=pyo.Any)
+        self.model.min_offers = pyo.Param(self.model.products, initialize=dict(zip(data.products.tolist(), data.product_min_offers.tolist())), domain=pyo.Any)
+        self.model.expected_profit = pyo.Param(self.model.cp, initialize=dict(zip(data.cp_keys(), data.product_profit.ravel().tolist())), domain=pyo.Any)
+        self.model.expected_cost = pyo.Param(self.model.cp, initialize=dict(zip(data.cp_keys(), data.product_cost.ravel().tolist())), domain=pyo.Any)
+        # given values, mutable so that the built model can be re-solved for other values
+        self.model.hurdle_rate = pyo.Param(initialize=self.processed_data.roi, mutable=True)
+        self.model.budget = pyo.Param(initialize=self.processed_data.budget, mutable=True)
         self._logger.info("[ModelBuilding] Defining model parameters completed successfully.")
 
         # define decision variables
@@ -71,6 +71,13 @@ class TacticalOptimisationModel(object):
     @property
     def optimisation_model(self):
         return self.model
+
+    def update_parameters(self, budget=None, hurdle_rate=None):
+        """Change the budget or the hurdle rate of the built model, for a re-solve."""
+        if budget is not None:
+            self.model.budget.value = budget
+        if hurdle_rate is not None:
+            self.model.hurdle_rate.value = hurdle_rate
     
     def _max_offers(self):
         """
@@ -0,0 +1,125 @@
+"""
+GREEDY WARM START CLASS
+
+Builds a feasible-first incumbent for the operational model from the tactical allocation,
+so that the MIP solver starts from a good solution instead of solving cold.
+"""
+import numpy as np
+from conf import Logger
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import MatrixModel
+
+
+def minimum_cost(data, quotas):
+    """
+    Cost of the cheapest offers filling the (K, P) `quotas` of each (cluster, product), by
+    cluster. A lower bound on the cost of a cluster, as the offer limit per customer is ignored.
+    """
+    cluster_product = data.pair_cluster.astype(np.int64) * quotas.shape[1] + data.pair_product
+    order = np.lexsort((data.pair_cost, cluster_product))
+    sorted_group = cluster_product[order]
+    # rank of each offer by cost within its (cluster, product)
+    rank = np.arange(len(order)) - np.searchsorted(sorted_group, sorted_group)
+    taken = order[rank < np.ceil(quotas.ravel()[sorted_group] - 1e-9)]
+    return np.bincount(data.pair_cluster[taken], weights=data.pair_cost[taken], minlength=quotas.shape[0])
+
+
+def cluster_budgets(data, quotas, budget):
+    """
+    Split of the budget across clusters: each cluster gets the minimum cost of its quotas,
+    and a share of the rest of the budget in proportion to its tactical cost.
+    """
+    tactical_cost = (quotas * data.product_cost).sum(axis=1)
+    n_clusters = quotas.shape[0]
+    shares = tactical_cost / tactical_cost.sum() if tactical_cost.sum() > 0 else np.full(n_clusters, 1 / n_clusters)
+    cost = minimum_cost(data, quotas)
+    return cost + max(budget - cost.sum(), 0.0) * shares
+
+
+class GreedyWarmStart(object):
+    """
+    The incumbent is built cluster by cluster, each within its part of the budget (see
+    cluster_budgets) and the budget the clusters before it left unspent. Within a cluster,
+    offers are taken in decreasing order of profit while the product quota of the tactical
+    model is not filled, the customer has no offer yet and the budget of the cluster covers
+    the offer cost. Quotas still open are then filled with the cheapest offers of customers
+    without an offer, over the budget of the cluster if need be.
+
+    The incumbent is only loaded when it is feasible: every quota filled within the whole budget.
+    """
+    TOLERANCE = 1e-6
+
+    def __init__(self, tactical_model, processed_data: Preprocessing):
+        self._logger = Logger().logger
+        self.processed_data = processed_data
+        data = processed_data.data
+        self.quotas = np.rint([tactical_model.y[g].value for g in data.cp_keys()]).astype(np.int64)
+        self.budget = tactical_model.budget.value + tactical_model.z.value
+        self.selected = self.__greedy()
+        self.objective_value = float(data.pair_profit[self.selected].sum(dtype=np.float64))
+        self.cost = float(data.pair_cost[self.selected].sum(dtype=np.float64))
+        self.quotas_filled = int(self.selected.sum()) == int(self.quotas.clip(min=0).sum())
+        self.feasible = self.quotas_filled and self.cost <= self.budget + self.TOLERANCE
+        self._logger.info("[WarmStart] Greedy incumbent with %s offers, profit %.2f and cost %.2f (quotas filled: %s).",
+                          int(self.selected.sum()), self.objective_value, self.cost, self.quotas_filled)
+
+    def __greedy(self):
+        data = self.processed_data.data
+        n_clusters, n_products = data.product_cost.shape
+        quotas = self.quotas.clip(min=0).reshape(n_clusters, n_products)
+        budgets = cluster_budgets(data, quotas, self.budget)
+        # pairs grouped by cluster, the most profitable first within each cluster
+        order = np.lexsort((-data.pair_profit, data.pair_cluster))
+        bounds = np.searchsorted(data.pair_cluster[order], np.arange(n_clusters + 1), side='left')
+
+        selected = np.zeros(data.n_pairs, dtype=bool)
+        budget_left = 0.0
+        for k in range(n_clusters):
+            budget_left += budgets[k]
+            budget_left = self.__fill_cluster(order[bounds[k]:bounds[k + 1]], quotas[k].tolist(), budget_left, selected)
+        return selected
+
+    def __fill_cluster(self, pairs, remaining_quota, budget_left, selected):
+        """
+        Select the offers of one cluster, `pairs` by decreasing profit, and return the budget
+        left, negative when the quotas could only be filled over the budget of the cluster.
+        """
+        data = self.processed_data.data
+        products = data.pair_product[pairs].tolist()
+        customers = data.pair_customer[pairs].tolist()
+        cost = data.pair_cost[pairs].tolist()
+        pairs = pairs.tolist()
+        offers_left = sum(remaining_quota)
+        has_offer = set()
+        # the most profitable offers within the budget, then the cheapest offers whatever the budget
+        by_cost = sorted(range(len(cost)), key=cost.__getitem__)
+        for within_budget, candidates in ((True, range(len(cost))), (False, by_cost)):
+            for n in candidates:
+                if offers_left == 0:
+                    return budget_left
+                if remaining_quota[products[n]] <= 0 or customers[n] in has_offer or \
+                        (within_budget and cost[n] > budget_left):
+                    continue
+                selected[pairs[n]] = True
+                remaining_quota[products[n]] -= 1
+                has_offer.add(customers[n])
+                budget_left -= cost[n]
+                offers_left -= 1
+        return budget_left
+
+    def load(self, model):
+        """
+        Load the incumbent as the starting values of `model.x`, for a Pyomo model or a MatrixModel.
+        An infeasible incumbent is not loaded, the solver then starts without it.
+        """
+        if not self.feasible:
+            reason = "quotas not filled" if not self.quotas_filled else \
+                f"cost {self.cost:,.2f} over the budget {self.budget:,.2f}"
+            self._logger.info("[WarmStart] Greedy incumbent not loaded, it is infeasible (%s).", reason)
+            return
+        if isinstance(model, MatrixModel):
+            model.x.values = self.selected.astype(np.float64)
+        else:
+            for key, selected in zip(self.processed_data.data.ccp_keys(), self.selected.tolist()):
+                model.x[key].value = 1.0 if selected else 0.0
+        self._logger.debug("[WarmStart] Greedy incumbent loaded into the operational model.")
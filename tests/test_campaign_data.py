@@ -0,0 +1,56 @@
+"""Tests of the array-backed campaign data built from frames and from customer chunks."""
+import numpy as np
+import pandas as pd
+import pytest
+from src.optimisation_model.campaign_data import CampaignData, CUSTOMER_COLUMNS
+from src.optimisation_model.matrix_model import MatrixModel
+
+
+def frames():
+    cluster_df = pd.DataFrame({'Cluster': ['k1', 'k2'], 'Count': [2, 1]})
+    product_df = pd.DataFrame({'Product_Type': ['p1', 'p2'], 'Count': [1, 1]})
+    cost_df = pd.DataFrame({'p1': [200.0, 300.0], 'p2': [100.0, 200.0]}, index=['k1', 'k2'])
+    profit_df = pd.DataFrame({'p1': [2000.0, 3000.0], 'p2': [1000.0, 2000.0]}, index=['k1', 'k2'])
+    customer_df = pd.DataFrame([['k1', 'c1', 'p1', 205.0, 2050.0], ['k1', 'c2', 'p2', 95.0, 950.0],
+                                ['k2', 'c3', 'p1', 300.0, 3000.0]], columns=CUSTOMER_COLUMNS)
+    return cluster_df, product_df, cost_df, profit_df, customer_df
+
+
+def chunks(customer_df):
+    customer_df = customer_df.astype({'Cluster': 'category', 'Product': 'category', 'Customer': str})
+    return [customer_df.iloc[:2], customer_df.iloc[2:]]
+
+
+def test_frames_and_chunks_give_the_same_data():
+    cluster_df, product_df, cost_df, profit_df, customer_df = frames()
+    data = CampaignData.from_frames(cluster_df, product_df, cost_df, profit_df, customer_df)
+    chunked = CampaignData.from_chunks(cluster_df, product_df, cost_df, profit_df, chunks(customer_df))
+    assert chunked.fingerprint() == data.fingerprint()
+    assert data.product_cost.tolist() == [[200.0, 100.0], [300.0, 200.0]]
+
+
+@pytest.mark.parametrize('build', ['from_frames', 'from_chunks'])
+def test_missing_expected_cost_or_profit_is_rejected(build):
+    cluster_df, product_df, cost_df, profit_df, customer_df = frames()
+    cost_df.loc['k2', 'p2'] = None
+    profit_df = profit_df.drop(columns='p2')
+    customers = customer_df if build == 'from_frames' else chunks(customer_df)
+    with pytest.raises(ValueError, match=r"cost data has no value for 1 \(cluster, product\) pairs, e.g. \[\('k2', 'p2'\)\]"):
+        getattr(CampaignData, build)(cluster_df, product_df, cost_df, profit_df, customers)
+    cost_df.loc['k2', 'p2'] = 200.0
+    with pytest.raises(ValueError, match=r"profit data has no value for 2 .*\('k1', 'p2'\), \('k2', 'p2'\)"):
+        getattr(CampaignData, build)(cluster_df, product_df, cost_df, profit_df, customers)
+
+
+def test_compact_floats_are_kept_until_the_model_build():
+    cluster_df, product_df, cost_df, profit_df, customer_df = frames()
+    customer_df = customer_df.astype({'Cost': 'float32', 'Profit': 'float32'})
+    data = CampaignData.from_chunks(cluster_df, product_df, cost_df, profit_df, chunks(customer_df))
+    assert data.pair_cost.dtype == data.pair_profit.dtype == np.float32
+    assert data.subset([0, 1]).pair_cost.dtype == np.float32
+    model = MatrixModel('operational')
+    model.add_variables('x', data.n_pairs, cost=data.pair_profit)
+    assert model.c.dtype == np.float64 and model.c.tolist() == [2050.0, 950.0, 3000.0]
+    # other values are taken as float64
+    ints = CampaignData.from_frames(cluster_df, product_df, cost_df, profit_df, customer_df.astype({'Cost': 'int64'}))
+    assert ints.pair_cost.dtype == np.float64
@@ -0,0 +1,54 @@
+"""Tests of the decomposed operational solve: optimal only within the MIP gap of the monolithic bound."""
+import numpy as np
+import pytest
+from pyomo.opt import TerminationCondition
+from conf import Config
+from src.optimisation_model.campaign_data import CampaignData
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.decomposition import ClusterDecomposition
+
+
+@pytest.fixture(autouse=True)
+def highs_config(monkeypatch):
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    monkeypatch.setitem(config, 'model_builder', 'matrix')
+    monkeypatch.setitem(config, 'solver_type', 'highs')
+    monkeypatch.setitem(config, 'solver_backend', 'shell')
+    monkeypatch.setitem(config, 'decomposition_bound', True)
+    monkeypatch.setitem(config['solver_option'], 'highs', {'mip_rel_gap': 0.01})
+
+
+def decompose(budget):
+    """
+    One offer to make in each of two clusters. The expensive, profitable offer of k1 only fits
+    when k2 takes its cheaper offer, which the split of the budget by tactical cost does not allow.
+    """
+    data = CampaignData(
+        clusters=['k1', 'k2'], cluster_size=[2, 2], products=['p1'], product_min_offers=[1],
+        product_cost=[[50.0], [15.0]], product_profit=[[500.0], [15.0]], customers=['c1', 'c2', 'c3', 'c4'],
+        pair_cluster=[0, 0, 1, 1], pair_customer=[0, 1, 2, 3], pair_product=[0, 0, 0, 0],
+        pair_cost=[10.0, 100.0, 10.0, 20.0], pair_profit=[10.0, 1000.0, 10.0, 20.0])
+    tactical_model = MatrixModel('tactical')
+    tactical_model.add_param('budget', budget)
+    tactical_model.add_variables('y', 2, index=data.cp_keys).values = [1.0, 1.0]
+    tactical_model.add_variables('z', 1).values = [0.0]
+    return ClusterDecomposition(tactical_model, Preprocessing(data=data), max_workers=2)
+
+
+def test_decomposition_within_the_gap_is_optimal():
+    decomposition = decompose(budget=200.0)
+    np.testing.assert_array_equal(decomposition.model.x.values, [0, 1, 0, 1])
+    assert decomposition.gap == pytest.approx(0.0)
+    assert decomposition.results.solver.termination_condition == TerminationCondition.optimal
+
+
+def test_decomposition_over_the_gap_is_feasible():
+    decomposition = decompose(budget=110.0)
+    np.testing.assert_array_equal(decomposition.model.x.values, [1, 0, 0, 1])
+    assert decomposition.bound == pytest.approx(1010.0)
+    assert decomposition.gap > 0.01
+    results = decomposition.results
+    assert results.solver.termination_condition == TerminationCondition.feasible
+    assert results.problem.upper_bound == pytest.approx(decomposition.bound)
+    assert f"{decomposition.gap:.6f}" in results.solver.message
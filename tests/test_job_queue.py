@@ -0,0 +1,108 @@
+"""Tests of the job queue: the lifecycle of a job from its submission to its results."""
+import os
+import time
+import asyncio
+import threading
+import pytest
+from pathlib import Path
+from conf import Config
+from src.api import job_queue as job_queue_module
+from src.api.job_queue import JobQueue, _update_status, COMPLETED, FAILED
+
+
+def echo(inputs):
+    return {'echo': inputs}
+
+
+def fail(inputs):
+    raise ValueError("bad inputs")
+
+
+def sleep(inputs):
+    time.sleep(inputs['seconds'])
+    return {}
+
+
+@pytest.fixture
+def job_queue(tmp_path, monkeypatch):
+    # the tasks are looked up by name in the worker processes, which are forked with these
+    monkeypatch.setitem(job_queue_module.TASKS, 'echo', echo)
+    monkeypatch.setitem(job_queue_module.TASKS, 'fail', fail)
+    monkeypatch.setitem(job_queue_module.TASKS, 'sleep', sleep)
+    monkeypatch.setitem(Config.API_SETTINGS['result_cache'], 'cache_dir', tmp_path / 'cache')
+    queue = JobQueue(max_workers=1, job_dir=tmp_path)
+    yield queue
+    queue.shutdown()
+
+
+def test_submit_status_result(job_queue):
+    job_id = job_queue.submit({'x': 1}, 'echo')
+    assert job_queue.status(job_id)['status'] in ('queued', 'running', 'completed')
+    asyncio.run(job_queue.wait(job_id))
+    status = job_queue.status(job_id)
+    assert status['status'] == COMPLETED
+    assert status['submitted_at'] <= status['started_at'] <= status['finished_at']
+    assert job_queue.result(job_id) == {'echo': {'x': 1}}
+
+
+def test_failed_job_records_its_error(job_queue):
+    job_id = job_queue.submit({'x': 1}, 'fail')
+    asyncio.run(job_queue.wait(job_id))
+    status = job_queue.status(job_id)
+    assert status['status'] == FAILED and status['error'] == 'bad inputs'
+    assert job_queue.result(job_id) is None
+
+
+def test_identical_request_is_answered_by_the_first_job(job_queue):
+    job_id = job_queue.submit({'x': 1}, 'echo')
+    assert job_queue.submit({'x': 1}, 'echo') == job_id
+    asyncio.run(job_queue.wait(job_id))
+    assert job_queue.submit({'x': 1}, 'echo') == job_id
+    assert job_queue.submit({'x': 2}, 'echo') != job_id
+
+
+def test_jobs_queued_at_shutdown_are_recorded_as_failed(job_queue):
+    running = job_queue.submit({'seconds': 0.5}, 'sleep')
+    queued = job_queue.submit({'seconds': 0}, 'sleep')
+    assert job_queue.status(queued)['status'] == 'queued'
+    job_queue.shutdown()
+    status = job_queue.status(queued)
+    assert status['status'] == FAILED and 'shutdown' in status['error']
+    # the running job is left to its worker
+    asyncio.run(job_queue.wait(running))
+    assert job_queue.status(running)['status'] == COMPLETED
+
+
+def test_job_flushes_its_mlflow_runs(tmp_path, monkeypatch):
+    monkeypatch.setitem(job_queue_module.TASKS, 'echo', echo)
+    flushes = []
+    monkeypatch.setattr(job_queue_module.MLFlowLogger, 'flush', lambda: flushes.append(True))
+    assert job_queue_module.run_job('job', {'x': 1}, tmp_path, 'echo') == COMPLETED
+    assert flushes and job_queue_module._read_json(Path(tmp_path, 'job.status.json'))['status'] == COMPLETED
+
+
+def test_unknown_job(job_queue):
+    assert job_queue.status('unknown') is None and job_queue.result('unknown') is None
+
+
+def test_concurrent_status_updates_are_not_lost(tmp_path):
+    def update(field):
+        for i in range(50):
+            _update_status(tmp_path, 'job', **{field: i})
+
+    threads = [threading.Thread(target=update, args=(f"field_{n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    status = job_queue_module._read_json(Path(tmp_path, 'job.status.json'))
+    assert all(status[f"field_{n}"] == 49 for n in range(8))
+
+
+def test_purge_deletes_expired_job_files(job_queue):
+    _update_status(job_queue.job_dir, 'old', status=COMPLETED)
+    _update_status(job_queue.job_dir, 'new', status=COMPLETED)
+    expired = time.time() - job_queue.retention_seconds - 1
+    os.utime(Path(job_queue.job_dir, 'old.status.json'), (expired, expired))
+    job_queue.purge()
+    assert job_queue.status('old') is None and job_queue.status('new') is not None
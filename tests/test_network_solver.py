@@ -0,0 +1,48 @@
+"""Tests of the network engine: per-cluster assignments under a Lagrangian budget, against the MIP."""
+import numpy as np
+import pytest
+from pyomo.opt import TerminationCondition
+from conf import Config
+from src.benchmark.instance_generator import SyntheticInstance
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import TacticalMatrixModel, OperationalMatrixModel
+from src.optimisation_model.solver import ModelSolver
+from src.optimisation_model.network_solver import NetworkAssignmentSolver
+
+
+@pytest.fixture(autouse=True)
+def highs_config(monkeypatch):
+    monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG, 'solver_backend', 'shell')
+    monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG['solver_option'], 'highs', {'mip_rel_gap': 0.0})
+
+
+def tactical(budget_share):
+    processed_data = Preprocessing(SyntheticInstance(400, density=0.5, budget_share=budget_share, seed=11).to_api_json())
+    tactical_model = TacticalMatrixModel(processed_data).model
+    ModelSolver(tactical_model, solver_type='highs')
+    tactical_model.y.values = np.rint(tactical_model.y.values)
+    return tactical_model, processed_data
+
+
+def test_network_matches_the_mip_without_a_binding_budget():
+    tactical_model, processed_data = tactical(1.05)
+    network = NetworkAssignmentSolver(tactical_model, processed_data)
+    mip = ModelSolver(OperationalMatrixModel(tactical_model, processed_data).model, solver_type='highs')
+    assert network.iterations == 1
+    assert network.results.solver.termination_condition == TerminationCondition.optimal
+    assert network.model.objective_value == pytest.approx(mip.objective_value)
+
+
+def test_network_brackets_the_mip_with_a_binding_budget():
+    tactical_model, processed_data = tactical(0.6)
+    unconstrained = NetworkAssignmentSolver(tactical_model, processed_data).model
+    spent = unconstrained.customer_cost.values @ unconstrained.x.values
+    # a budget just below the cost of the best assignment
+    tactical_model.z.values = [spent * 0.999 - tactical_model.budget.value]
+    network = NetworkAssignmentSolver(tactical_model, processed_data, gap=1e-4)
+    mip = ModelSolver(OperationalMatrixModel(tactical_model, processed_data).model, solver_type='highs')
+    assert network.iterations > 1
+    assert network.model.customer_cost.values @ network.model.x.values <= spent * 0.999 + 1e-6
+    # a feasible assignment and a bound on either side of the optimum
+    assert network.model.objective_value <= mip.objective_value + 1e-6 <= network.bound + 2e-6
+    assert network.gap == pytest.approx((network.bound - network.model.objective_value) / network.bound)
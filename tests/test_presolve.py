@@ -0,0 +1,76 @@
+"""Tests of the operational presolve: the restored solution matches the solve without presolve."""
+import numpy as np
+import pytest
+from conf import Config
+from main import MODEL_BUILDERS, solve_operational
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.model_cache import OperationalModelCache
+from src.optimisation_model.presolve import OperationalPresolve
+from src.benchmark.instance_generator import SyntheticInstance
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.solver import ModelSolver, OPTIMAL
+
+
+@pytest.fixture(autouse=True)
+def highs_config(monkeypatch):
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    monkeypatch.setitem(config, 'solver_backend', 'shell')
+    monkeypatch.setitem(config, 'operational_model_cache', 0)
+    monkeypatch.setitem(config, 'presolve_drop_unprofitable', False)
+    for solver_type in ('highs', 'appsi_highs'):
+        monkeypatch.setitem(config['solver_option'], solver_type, {})
+
+
+def solve(model_builder, presolve, monkeypatch):
+    """Operational solver, campaign data and operational model, with or without the presolve."""
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    monkeypatch.setitem(config, 'model_builder', model_builder)
+    monkeypatch.setitem(config, 'solver_type', 'highs' if model_builder == 'matrix' else 'appsi_highs')
+    monkeypatch.setitem(config, 'operational_presolve', presolve)
+    # the tactical quotas go to the preferred products, the presolve drops the other offers
+    instance = SyntheticInstance(400, n_clusters=4, n_products=4, density=0.5, seed=21)
+    processed_data = Preprocessing(instance.to_api_json())
+    TacticalModel, _ = MODEL_BUILDERS[model_builder]
+    tactical_opt_model = TacticalModel(processed_data).model
+    assert ModelSolver(tactical_opt_model).status == OPTIMAL
+    solver, model = solve_operational(tactical_opt_model, processed_data)
+    return solver, processed_data.data, model
+
+
+def values(model):
+    """Offer values of an operational model, Pyomo or matrix."""
+    if isinstance(model, MatrixModel):
+        return np.asarray(model.x.values)
+    return np.array([model.x[key].value for key in model.ccp], dtype=np.float64)
+
+
+@pytest.mark.parametrize('model_builder', ['matrix', 'pyomo'])
+def test_presolve_then_restore_keeps_the_objective(model_builder, monkeypatch):
+    full_solver, data, full_model = solve(model_builder, False, monkeypatch)
+    solver, _, restored = solve(model_builder, True, monkeypatch)
+    assert full_solver.status == solver.status == OPTIMAL
+    assert solver.objective_value == pytest.approx(full_solver.objective_value)
+
+    # the restored model is of the builder used and covers every offer, with the dropped ones not selected
+    assert isinstance(restored, MatrixModel) == (model_builder == 'matrix')
+    selected = values(restored)
+    assert len(selected) == data.n_pairs
+    assert np.isin(np.round(selected), (0, 1)).all()
+    assert selected @ data.pair_profit == pytest.approx(full_solver.objective_value)
+
+
+def test_presolved_model_is_cached_for_the_same_input(monkeypatch):
+    config = Config.OPTIMISATION_MODELLING_CONFIG
+    monkeypatch.setitem(config, 'operational_model_cache', 1)
+    monkeypatch.setitem(config, 'solver_type', 'highs')
+    OperationalModelCache.clear()
+    processed_data = Preprocessing(SyntheticInstance(400, n_clusters=4, n_products=4, density=0.5, seed=21).to_api_json())
+    TacticalModel, OperationalModel = MODEL_BUILDERS['matrix']
+    tactical_opt_model = TacticalModel(processed_data).model
+    ModelSolver(tactical_opt_model)
+    # the cache is keyed on the reduced data, the same for the same input and tactical results
+    first, second = (OperationalModelCache.get(OperationalModel, tactical_opt_model,
+                                               OperationalPresolve(tactical_opt_model, processed_data).processed_data)
+                     for _ in range(2))
+    assert second is first
+    OperationalModelCache.clear()
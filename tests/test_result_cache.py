@@ -0,0 +1,88 @@
+"""Tests of the result cache: hits, coalescing, expiry and eviction of its entries."""
+import time
+import orjson
+import pytest
+from pathlib import Path
+from src.api.result_cache import ResultCache
+
+
+class FakeJobQueue(object):
+    """Job statuses by job ID, in place of the job files of a JobQueue."""
+    def __init__(self):
+        self.statuses = {}
+
+    def status(self, job_id):
+        status = self.statuses.get(job_id)
+        return {'job_id': job_id, 'status': status} if status else None
+
+
+@pytest.fixture
+def job_queue():
+    return FakeJobQueue()
+
+
+@pytest.fixture
+def cache(job_queue, tmp_path):
+    return ResultCache(job_queue, max_entries=2, ttl_seconds=60, cache_dir=tmp_path)
+
+
+def _age(cache, key, seconds):
+    """Move the creation time of an entry `seconds` into the past."""
+    path = Path(cache.cache_dir, key)
+    entry = orjson.loads(path.read_bytes())
+    entry['created_at'] -= seconds
+    path.write_bytes(orjson.dumps(entry))
+
+
+def test_key_is_canonical():
+    assert ResultCache.key({'a': 1, 'b': 2}) == ResultCache.key({'b': 2, 'a': 1})
+    assert ResultCache.key({'a': 1}) != ResultCache.key({'a': 1}, task='sweep')
+
+
+def test_completed_job_is_a_hit(cache, job_queue):
+    assert cache.lookup('k') is None
+    assert cache.claim('k', 'job1') == 'job1'
+    job_queue.statuses['job1'] = 'completed'
+    assert cache.lookup('k') == 'job1'
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+
+def test_running_job_is_coalesced(cache, job_queue):
+    cache.claim('k', 'job1')
+    job_queue.statuses['job1'] = 'running'
+    assert cache.lookup('k') == 'job1'
+    assert cache.stats['coalesced'] == 1
+
+
+def test_claim_is_exclusive(cache, job_queue, tmp_path):
+    other_process = ResultCache(job_queue, cache_dir=tmp_path)
+    assert cache.claim('k', 'job1') == 'job1'
+    assert other_process.claim('k', 'job2') == 'job1'
+
+
+def test_failed_job_is_a_miss(cache, job_queue):
+    cache.claim('k', 'job1')
+    job_queue.statuses['job1'] = 'failed'
+    assert cache.lookup('k') is None
+    assert cache.claim('k', 'job2') == 'job2'
+
+
+def test_entry_expires_after_its_creation_however_often_read(cache, job_queue):
+    cache.claim('k', 'job1')
+    job_queue.statuses['job1'] = 'completed'
+    _age(cache, 'k', 50)
+    assert cache.lookup('k') == 'job1'  # read, which marks it as recently used
+    _age(cache, 'k', 20)
+    assert cache.lookup('k') is None
+    assert not Path(cache.cache_dir, 'k').exists()
+
+
+def test_least_recently_used_entries_are_evicted(cache, job_queue):
+    for key in ['a', 'b']:
+        cache.claim(key, f"job_{key}")
+        job_queue.statuses[f"job_{key}"] = 'completed'
+        time.sleep(0.02)
+    assert cache.lookup('a') == 'job_a'  # 'b' is now the least recently used
+    time.sleep(0.02)
+    cache.claim('c', 'job_c')
+    assert sorted(p.name for p in Path(cache.cache_dir).iterdir()) == ['a', 'c']
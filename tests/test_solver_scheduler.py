@@ -0,0 +1,47 @@
+"""Tests of the host-wide solver slots and of the racers a race starts within them."""
+import pytest
+import pyomo.environ as pyo
+from conf import Config
+from src.optimisation_model.solver_scheduler import SolverSlots, SolverCapacityTimeout, solver_slots
+from src.optimisation_model.solver_race import SolverRace
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    for key, value in dict(ENABLED=True, SLOTS=2, SLOT_DIR=tmp_path, TIMEOUT=0.3).items():
+        monkeypatch.setitem(Config.SOLVER_SCHEDULER, key, value)
+    return SolverSlots()
+
+
+def test_acquire_takes_at_most_the_free_slots(scheduler):
+    held = scheduler.acquire(wanted=5)
+    assert len(held) == 2 and scheduler.in_use() == 2
+    with pytest.raises(SolverCapacityTimeout):
+        scheduler.acquire(timeout=0.2)
+    scheduler.release(held)
+    assert scheduler.in_use() == 0
+
+
+def test_slots_are_shared_between_holders(scheduler):
+    held = scheduler.acquire(wanted=1)
+    with solver_slots(wanted=2) as threads:
+        assert threads == 1 and scheduler.in_use() == 2
+    scheduler.release(held)
+    assert scheduler.in_use() == 0
+
+
+def test_disabled_scheduler_grants_what_is_wanted(scheduler, monkeypatch):
+    monkeypatch.setitem(Config.SOLVER_SCHEDULER, 'ENABLED', False)
+    with solver_slots(wanted=8) as threads:
+        assert threads == 8 and scheduler.in_use() == 0
+
+
+def test_race_starts_one_single_threaded_racer_per_slot():
+    model = pyo.ConcreteModel(name='knapsack')
+    model.x = pyo.Var(range(4), domain=pyo.Binary)
+    model.objective = pyo.Objective(expr=sum((i + 1) * model.x[i] for i in range(4)), sense=pyo.maximize)
+    model.capacity = pyo.Constraint(expr=sum(model.x[i] for i in range(4)) <= 2)
+    racers = [dict(solver_type='highs'), dict(solver_type='highs', options={'random_seed': 7})]
+    race = SolverRace(model, racers=racers, deadline=10, max_racers=1)
+    assert len(race.racers) == 1 and race.racers[0].options['threads'] == 1
+    assert race.winner.status == 'optimal' and pyo.value(model.objective) == pytest.approx(7)
@@ -0,0 +1,97 @@
+"""Tests of time-limited solves: deadlines, and the incumbent kept with its bound and gap."""
+import time
+import numpy as np
+import pytest
+import pyomo.environ as pyo
+from conf import Config
+from src.optimisation_model.matrix_model import MatrixModel
+from src.optimisation_model.solver import ModelSolver, solve_deadline, current_deadline, remaining_time, \
+    OPTIMAL, TIME_LIMITED
+from src.optimisation_model.solver_progress import relative_gap
+
+N_ITEMS, N_RESOURCES = 120, 8  # a multi-dimensional knapsack HiGHS does not close within the time limit
+
+
+def knapsack():
+    rng = np.random.default_rng(1)
+    values = rng.integers(5, 60, N_ITEMS).astype(float)
+    weights = rng.integers(5, 50, (N_RESOURCES, N_ITEMS)).astype(float)
+    return values, weights, weights.sum(axis=1) // 3
+
+
+def matrix_knapsack():
+    values, weights, capacity = knapsack()
+    model = MatrixModel('knapsack')
+    model.sense = 'maximize'
+    model.add_variables('x', N_ITEMS, upper=1.0, cost=values, integer=True)
+    rows, cols = np.divmod(np.arange(weights.size), N_ITEMS)
+    model.add_constraints('capacity', N_RESOURCES, rows, cols, weights.ravel(), upper=capacity)
+    return model
+
+
+def pyomo_knapsack():
+    values, weights, capacity = knapsack()
+    model = pyo.ConcreteModel(name='knapsack')
+    model.I = pyo.RangeSet(0, N_ITEMS - 1)
+    model.x = pyo.Var(model.I, domain=pyo.Binary)
+    model.objective = pyo.Objective(expr=sum(values[i] * model.x[i] for i in model.I), sense=pyo.maximize)
+    model.capacity = pyo.ConstraintList()
+    for r in range(N_RESOURCES):
+        model.capacity.add(sum(weights[r, i] * model.x[i] for i in model.I) <= capacity[r])
+    return model
+
+
+@pytest.fixture(autouse=True)
+def solve_to_optimality(monkeypatch):
+    for solver_type in ('highs', 'appsi_highs'):
+        monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG['solver_option'], solver_type, {})
+
+
+def assert_time_limited(solver):
+    assert solver.status == TIME_LIMITED
+    assert solver.objective_value is not None and solver.bound is not None
+    assert solver.bound >= solver.objective_value  # maximisation
+    assert solver.gap == pytest.approx(relative_gap(solver.objective_value, solver.bound))
+    assert solver.gap > 0
+
+
+def test_matrix_model_keeps_its_incumbent_at_the_time_limit():
+    solver = ModelSolver(matrix_knapsack(), solver_type='highs', solver_backend='shell', time_limit=0.5)
+    assert_time_limited(solver)
+    assert solver.model.objective_value == pytest.approx(solver.objective_value)
+
+
+def test_pyomo_model_keeps_its_incumbent_at_the_time_limit():
+    model = pyomo_knapsack()
+    solver = ModelSolver(model, solver_type='appsi_highs', solver_backend='shell', time_limit=0.5)
+    assert_time_limited(solver)
+    assert pyo.value(model.objective) == pytest.approx(solver.objective_value)
+
+
+def test_deadline_of_the_request_is_the_time_limit(monkeypatch):
+    monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG, 'min_time_limit', 0.1)
+    with solve_deadline(0.5):
+        solver = ModelSolver(matrix_knapsack(), solver_type='highs', solver_backend='shell')
+    assert solver.time_limit <= 0.5
+    assert_time_limited(solver)
+
+
+def test_solve_without_deadline_is_optimal():
+    model = matrix_knapsack()
+    model.update_constraints('capacity', upper=np.zeros(N_RESOURCES))
+    solver = ModelSolver(model, solver_type='highs', solver_backend='shell')
+    assert solver.status == OPTIMAL and solver.gap == pytest.approx(0)
+
+
+def test_remaining_time():
+    min_time_limit = Config.OPTIMISATION_MODELLING_CONFIG['min_time_limit']
+    assert remaining_time() is None
+    with solve_deadline(60):
+        assert 59 < remaining_time() <= 60
+        # handed on as an absolute deadline, e.g. to a worker process, the time left counts from when a solve starts
+        deadline = current_deadline()
+    with solve_deadline(deadline=deadline):
+        assert remaining_time() <= 60
+    with solve_deadline(deadline=time.monotonic() - 1):
+        assert remaining_time() == min_time_limit
+    assert current_deadline() is None
@@ -0,0 +1,40 @@
+"""Tests of the greedy warm start: quotas filled, and only feasible incumbents loaded."""
+import numpy as np
+import pytest
+from conf import Config
+from src.api.api_pydantic_models import EXAMPLE_JSON
+from src.benchmark.instance_generator import SyntheticInstance
+from src.optimisation_model.preprocessing import Preprocessing
+from src.optimisation_model.matrix_model import TacticalMatrixModel, OperationalMatrixModel
+from src.optimisation_model.solver import ModelSolver
+from src.optimisation_model.warm_start import GreedyWarmStart
+
+
+@pytest.fixture(autouse=True)
+def highs_config(monkeypatch):
+    monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG, 'solver_backend', 'shell')
+    monkeypatch.setitem(Config.OPTIMISATION_MODELLING_CONFIG['solver_option'], 'highs', {})
+
+
+def greedy(api_data):
+    processed_data = Preprocessing(api_data)
+    tactical_model = TacticalMatrixModel(processed_data).model
+    ModelSolver(tactical_model, solver_type='highs')
+    operational_model = OperationalMatrixModel(tactical_model, processed_data).model
+    return GreedyWarmStart(tactical_model, processed_data), operational_model
+
+
+def test_feasible_incumbent_is_loaded():
+    warm_start, model = greedy(SyntheticInstance(300, n_clusters=3, n_products=3, seed=6).to_api_json())
+    assert warm_start.quotas_filled and warm_start.feasible
+    warm_start.load(model)
+    np.testing.assert_array_equal(model.x.values, warm_start.selected)
+    assert model.customer_cost.values @ model.x.values <= warm_start.budget
+
+
+def test_quotas_are_filled_past_the_budget_and_the_incumbent_not_loaded():
+    warm_start, model = greedy(dict(EXAMPLE_JSON['OptimiseModelInput']))
+    assert warm_start.quotas_filled
+    assert not warm_start.feasible and warm_start.cost > warm_start.budget
+    warm_start.load(model)
+    assert np.isnan(model.x.values).all()